@@ -3,9 +3,10 @@ Django Admin Configuration for SPCM
 """
 from django.contrib import admin
 from .models import (
-    Stock, StockPrice, TechnicalIndicator, NewsArticle, 
+    Stock, StockPrice, TechnicalIndicator, IndicatorState, NewsArticle, 
     SentimentData, StockRecommendation, Portfolio, 
-    PortfolioPosition, UserProfile
+    PortfolioPosition, UserProfile, ProviderBudget, RefreshJob, StockSnapshot,
+    PriceHistoryState, MarketDailyAggregate
 )
 
 @admin.register(Stock)
@@ -29,6 +30,19 @@ class TechnicalIndicatorAdmin(admin.ModelAdmin):
     search_fields = ['stock__symbol']
     ordering = ['-date']
 
+@admin.register(IndicatorState)
+class IndicatorStateAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'last_date', 'last_close', 'bar_count', 'updated_at']
+    search_fields = ['stock__symbol']
+    ordering = ['stock__symbol']
+
+@admin.register(PriceHistoryState)
+class PriceHistoryStateAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'first_date', 'last_date', 'bar_count', 'last_outputsize', 'last_fetched_at']
+    list_filter = ['last_outputsize']
+    search_fields = ['stock__symbol']
+    ordering = ['stock__symbol']
+
 @admin.register(NewsArticle)
 class NewsArticleAdmin(admin.ModelAdmin):
     list_display = ['stock', 'title', 'source', 'sentiment_score', 'impact_score', 'published_at']
@@ -50,6 +64,19 @@ class StockRecommendationAdmin(admin.ModelAdmin):
     search_fields = ['stock__symbol']
     ordering = ['-date']
 
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'price_date', 'close_price', 'change_percent', 'rsi', 'overall_sentiment', 'recommendation']
+    list_filter = ['recommendation']
+    search_fields = ['stock__symbol']
+
+@admin.register(MarketDailyAggregate)
+class MarketDailyAggregateAdmin(admin.ModelAdmin):
+    list_display = ['date', 'sector', 'avg_sentiment', 'weighted_sentiment', 'total_mentions',
+                    'buy_count', 'hold_count', 'sell_count', 'advancers', 'decliners']
+    list_filter = ['sector']
+    ordering = ['-date', 'sector']
+
 class PortfolioPositionInline(admin.TabularInline):
     model = PortfolioPosition
     extra = 0
@@ -66,3 +93,15 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'risk_tolerance', 'investment_experience']
     list_filter = ['risk_tolerance', 'investment_experience']
     search_fields = ['user__username']
+
+@admin.register(ProviderBudget)
+class ProviderBudgetAdmin(admin.ModelAdmin):
+    list_display = ['provider', 'day', 'day_calls', 'tokens', 'blocked_until']
+    search_fields = ['provider']
+
+@admin.register(RefreshJob)
+class RefreshJobAdmin(admin.ModelAdmin):
+    list_display = ['symbol', 'status', 'attempts', 'requested_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['symbol']
+    ordering = ['-requested_at']
@@ -0,0 +1,295 @@
+"""
+SPCM Market Aggregates - per-day market and sector rollups kept up to date on write
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+import logging
+
+from django.db.models import Count, F, FloatField, Max, Min, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from .models import StockPrice, SentimentData, StockRecommendation, MarketDailyAggregate
+from .db import increment_values, serialized_write, upsert_rows
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_PARTS = ('sentiment', 'recommendations', 'moves')
+
+PART_FIELDS = {
+    'sentiment': ['sentiment_stocks', 'avg_sentiment', 'weighted_sentiment', 'total_mentions'],
+    'recommendations': ['buy_count', 'hold_count', 'sell_count'],
+    'moves': ['advancers', 'decliners', 'unchanged', 'total_volume'],
+}
+
+# Integer counters, the columns a delta update adds to
+COUNTER_FIELDS = [
+    'sentiment_stocks', 'total_mentions', 'buy_count', 'hold_count', 'sell_count',
+    'advancers', 'decliners', 'unchanged', 'total_volume',
+]
+
+# Days recomputed per set of queries by range refreshes and rebuilds
+AGGREGATE_WINDOW_DAYS = 90
+
+# A price written on one day also moves the next bar's advance/decline; looking
+# this many days ahead covers weekends and market holidays
+NEXT_BAR_DAYS = 5
+
+SENTIMENT_PLACES = Decimal('0.0001')
+
+
+def _sector(value):
+    return value or MarketDailyAggregate.UNCLASSIFIED
+
+
+def _sentiment_values(start, end):
+    totals = defaultdict(lambda: {'stocks': 0, 'sum': 0.0, 'weighted': 0.0, 'mentions': 0})
+    rows = SentimentData.objects.filter(date__range=(start, end)).order_by().values(
+        'date', 'stock__sector'
+    ).annotate(
+        stocks=Count('id'),
+        total=Sum('overall_sentiment', output_field=FloatField()),
+        weighted=Sum(F('overall_sentiment') * F('news_mentions'), output_field=FloatField()),
+        mentions=Sum('news_mentions'),
+    )
+    for row in rows:
+        for key in ((row['date'], _sector(row['stock__sector'])), (row['date'], MarketDailyAggregate.MARKET)):
+            total = totals[key]
+            total['stocks'] += row['stocks']
+            total['sum'] += row['total'] or 0.0
+            total['weighted'] += row['weighted'] or 0.0
+            total['mentions'] += row['mentions'] or 0
+
+    values = {}
+    for key, total in totals.items():
+        average = total['sum'] / total['stocks']
+        # Days without mentions fall back to the plain average
+        weighted = total['weighted'] / total['mentions'] if total['mentions'] else average
+        values[key] = {
+            'sentiment_stocks': total['stocks'],
+            'avg_sentiment': Decimal(str(average)).quantize(SENTIMENT_PLACES),
+            'weighted_sentiment': Decimal(str(weighted)).quantize(SENTIMENT_PLACES),
+            'total_mentions': total['mentions'],
+        }
+    return values
+
+
+def _recommendation_values(start, end):
+    values = defaultdict(lambda: {'buy_count': 0, 'hold_count': 0, 'sell_count': 0})
+    rows = StockRecommendation.objects.filter(date__range=(start, end)).order_by().values(
+        'date', 'stock__sector', 'recommendation'
+    ).annotate(count=Count('id'))
+    for row in rows:
+        field = f"{row['recommendation'].lower()}_count"
+        if field not in PART_FIELDS['recommendations']:
+            continue
+        for key in ((row['date'], _sector(row['stock__sector'])), (row['date'], MarketDailyAggregate.MARKET)):
+            values[key][field] += row['count']
+    return values
+
+
+def _move_values(start, end):
+    previous_close = StockPrice.objects.filter(
+        stock=OuterRef('stock'), date__lt=OuterRef('date')
+    ).order_by('-date').values('close_price')[:1]
+
+    values = defaultdict(lambda: {'advancers': 0, 'decliners': 0, 'unchanged': 0, 'total_volume': 0})
+    rows = StockPrice.objects.filter(date__range=(start, end)).order_by().annotate(
+        previous_close=Subquery(previous_close)
+    ).values('date', 'stock__sector').annotate(
+        advancers=Count('id', filter=Q(close_price__gt=F('previous_close'))),
+        decliners=Count('id', filter=Q(close_price__lt=F('previous_close'))),
+        unchanged=Count('id', filter=Q(close_price=F('previous_close'))),
+        total_volume=Sum('volume'),
+    )
+    for row in rows:
+        for key in ((row['date'], _sector(row['stock__sector'])), (row['date'], MarketDailyAggregate.MARKET)):
+            for field in PART_FIELDS['moves']:
+                values[key][field] += row[field] or 0
+    return values
+
+
+_PART_LOADERS = {
+    'sentiment': _sentiment_values,
+    'recommendations': _recommendation_values,
+    'moves': _move_values,
+}
+
+_EMPTY = {
+    'sentiment_stocks': 0, 'avg_sentiment': None, 'weighted_sentiment': None, 'total_mentions': 0,
+    'buy_count': 0, 'hold_count': 0, 'sell_count': 0,
+    'advancers': 0, 'decliners': 0, 'unchanged': 0, 'total_volume': 0,
+}
+
+
+def _refresh_window(start, end, parts):
+    loaded = {part: _PART_LOADERS[part](start, end) for part in parts}
+    keys = set(
+        MarketDailyAggregate.objects.filter(date__range=(start, end)).values_list('date', 'sector')
+    )
+    for values in loaded.values():
+        keys.update(values)
+    if not keys:
+        return 0
+
+    fields = [field for part in parts for field in PART_FIELDS[part]]
+    now = timezone.now()
+    rows = []
+    for date, sector in sorted(keys):
+        row = MarketDailyAggregate(date=date, sector=sector, updated_at=now)
+        for part in parts:
+            values = loaded[part].get((date, sector))
+            for field in PART_FIELDS[part]:
+                setattr(row, field, values[field] if values else _EMPTY[field])
+        rows.append(row)
+
+    upsert_rows(MarketDailyAggregate, rows, ['date', 'sector'], fields + ['updated_at'])
+    return len(rows)
+
+
+def refresh_market_aggregates(start, end=None, parts=AGGREGATE_PARTS):
+    """
+    Recompute the ``parts`` of the market and sector rows for ``start``..``end``.
+
+    Called by the services right after they write per-stock sentiment or
+    recommendations for a day, and by price imports and rebuilds, so only
+    the touched days are aggregated again and the overview pages read one
+    row. Each day is rebuilt from its source rows rather than adjusted by
+    deltas, so repeated or concurrent refreshes always converge.
+    """
+    end = end or start
+    written = 0
+    while start <= end:
+        window_end = min(end, start + timedelta(days=AGGREGATE_WINDOW_DAYS - 1))
+        written += _refresh_window(start, window_end, parts)
+        start = window_end + timedelta(days=1)
+    return written
+
+
+def refresh_price_moves(first_date, last_date):
+    """
+    Recompute advancers/decliners of every stock for the days from ``first_date``
+    to a few days past ``last_date``; for bulk imports and repairs
+    """
+    return refresh_market_aggregates(
+        first_date, last_date + timedelta(days=NEXT_BAR_DAYS), ['moves']
+    )
+
+
+def _bar_moves(bars):
+    """(date, moves field or None, volume) of each (date, close, volume) bar against the one before it"""
+    previous_close = None
+    for date, close, volume in bars:
+        if previous_close is None:
+            field = None
+        elif close > previous_close:
+            field = 'advancers'
+        elif close < previous_close:
+            field = 'decliners'
+        else:
+            field = 'unchanged'
+        previous_close = close
+        yield date, field, volume
+
+
+def apply_price_changes(stock, previous):
+    """
+    Add the advance/decline and volume changes of one stock's written bars to its days.
+
+    ``previous`` maps the date of each bar just inserted or updated to its
+    (close, volume) before the write, or None for inserted bars. Only those
+    bars and the bar after each of them can change category, so the
+    stock's bars around them are read once, the moves before and after the
+    write are compared, and the differences are added to the market and
+    sector counters. Unlike ``refresh_price_moves`` no other stock is read,
+    except for days without a market or sector row yet: those are
+    aggregated from all of their bars, since a row started from one stock's
+    deltas would stand for the whole day.
+    """
+    if not previous:
+        return 0
+
+    first, last = min(previous), max(previous)
+    bars = StockPrice.objects.filter(stock=stock).values_list('date', 'close_price', 'volume')
+    after = (
+        list(bars.filter(date__lt=first).order_by('-date')[:1])
+        + list(bars.filter(date__range=(first, last)).order_by('date'))
+        + list(bars.filter(date__gt=last).order_by('date')[:1])
+    )
+    before = []
+    for date, close, volume in after:
+        if date in previous:
+            if previous[date] is None:
+                continue
+            close, volume = previous[date]
+        before.append((date, close, volume))
+
+    deltas = defaultdict(lambda: dict.fromkeys(PART_FIELDS['moves'], 0))
+    for sign, sequence in ((-1, before), (1, after)):
+        for date, field, volume in _bar_moves(sequence):
+            if field is not None:
+                deltas[date][field] += sign
+            deltas[date]['total_volume'] += sign * volume
+
+    deltas = {date: delta for date, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return 0
+
+    sectors = (_sector(stock.sector), MarketDailyAggregate.MARKET)
+    existing = set(MarketDailyAggregate.objects.filter(
+        date__in=list(deltas), sector__in=sectors
+    ).values_list('date', 'sector'))
+
+    now = timezone.now()
+    rows = []
+    written = 0
+    for date, delta in sorted(deltas.items()):
+        if any((date, sector) not in existing for sector in sectors):
+            written += refresh_market_aggregates(date, date, ['moves'])
+            continue
+        counters = [delta.get(field, 0) for field in COUNTER_FIELDS]
+        for sector in sectors:
+            rows.append([date, sector, now, *counters])
+
+    increment_values(MarketDailyAggregate, rows, ['date', 'sector'], ['updated_at'], COUNTER_FIELDS)
+    return written + len(rows)
+
+
+def rebuild_market_aggregates(start=None, end=None):
+    """Drop and recompute every aggregate row between ``start`` and ``end`` (default: all data)"""
+    if start is None or end is None:
+        bounds = [
+            model.objects.aggregate(first=Min('date'), last=Max('date'))
+            for model in (StockPrice, SentimentData, StockRecommendation)
+        ]
+        firsts = [bound['first'] for bound in bounds if bound['first']]
+        lasts = [bound['last'] for bound in bounds if bound['last']]
+        if not firsts:
+            return 0
+        start = start or min(firsts)
+        end = end or max(lasts)
+
+    with serialized_write():
+        MarketDailyAggregate.objects.filter(date__range=(start, end)).delete()
+    written = refresh_market_aggregates(start, end)
+    logger.info(f"Rebuilt {written} market aggregate rows from {start} to {end}")
+    return written
+
+
+def latest_market_aggregate(on_or_before=None):
+    """
+    The whole-market row of the latest aggregated day up to ``on_or_before``
+    (default today) with its sector rows, or None when nothing is aggregated.
+    """
+    on_or_before = on_or_before or timezone.now().date()
+    market = MarketDailyAggregate.objects.filter(
+        sector=MarketDailyAggregate.MARKET, date__lte=on_or_before
+    ).order_by('-date').first()
+    if market is None:
+        return None
+    market.sectors = list(
+        MarketDailyAggregate.objects.filter(date=market.date).exclude(
+            sector=MarketDailyAggregate.MARKET
+        ).order_by('sector')
+    )
+    return market
@@ -6,5 +6,9 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path('cache/stats/', views.api_cache_stats, name='api_cache_stats'),
+    path('quotes/', views.api_quotes, name='api_quotes'),
+    path('stream/quotes/', views.api_quote_stream, name='api_quote_stream'),
     path('stock/<str:symbol>/', views.api_stock_data, name='api_stock_data'),
+    path('stock/<str:symbol>/refresh-status/', views.api_refresh_status, name='api_refresh_status'),
 ]
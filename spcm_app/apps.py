@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class SpcmAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'spcm_app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import configure_connection
+        from .fragments import connect_invalidation
+
+        connection_created.connect(configure_connection, dispatch_uid='spcm_configure_connection')
+        connect_invalidation()
@@ -0,0 +1,200 @@
+"""
+SPCM Database Tuning - connection pragmas, serialized batch writes and bulk upserts
+"""
+from contextlib import contextmanager, nullcontext
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+from .signals import bulk_rows_written
+
+logger = logging.getLogger(__name__)
+
+# Serializes batch writers inside one process so they queue here instead of
+# spinning on SQLite's busy handler; other processes wait on busy_timeout
+_write_lock = threading.Lock()
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Apply ``SQLITE_PRAGMAS`` to every new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+
+
+def write_batch_size():
+    """Rows written per transaction by batch ingestion"""
+    return getattr(settings, 'DB_WRITE_BATCH_SIZE', 500)
+
+
+@contextmanager
+def serialized_write(using=DEFAULT_DB_ALIAS):
+    """
+    Run a short write transaction behind the process-wide write queue.
+
+    Batch ingestion opens one of these per chunk rather than one around the
+    whole load, so the database write lock is released between chunks and
+    request-path writes (leases, rate-limit budgets) can get in. Only SQLite
+    has a single database-wide writer, so other backends skip the queue.
+    """
+    queue = _write_lock if connections[using].vendor == 'sqlite' else nullcontext()
+    with queue:
+        with transaction.atomic(using=using):
+            yield
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most ``size`` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _upsert_sql(connection, model, unique_fields, update_fields, source, increment_fields=()):
+    """
+    ``INSERT ... ON CONFLICT DO UPDATE`` of ``source`` (a VALUES list or SELECT) and its column list.
+
+    ``increment_fields`` are added to the stored values on conflict instead of replacing them.
+    """
+    quote = connection.ops.quote_name
+    meta = model._meta
+    table = quote(meta.db_table)
+
+    columns = ', '.join(
+        quote(meta.get_field(name).column)
+        for name in list(unique_fields) + list(update_fields) + list(increment_fields)
+    )
+    conflict = ', '.join(quote(meta.get_field(name).column) for name in unique_fields)
+    updates = ', '.join(
+        [f'{quote(meta.get_field(name).column)} = EXCLUDED.{quote(meta.get_field(name).column)}'
+         for name in update_fields]
+        + [f'{quote(meta.get_field(name).column)} = {table}.{quote(meta.get_field(name).column)}'
+           f' + EXCLUDED.{quote(meta.get_field(name).column)}'
+           for name in increment_fields]
+    )
+    sql = (
+        f'INSERT INTO {table} ({columns}) {source} '
+        f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}'
+    )
+    return sql, columns
+
+
+def copy_upsert(model, instances, unique_fields, update_fields, using=DEFAULT_DB_ALIAS):
+    """
+    Upsert model instances on PostgreSQL through COPY.
+
+    Rows are streamed into a temporary table with ``COPY ... FROM STDIN`` and
+    merged with one ``INSERT ... SELECT ... ON CONFLICT DO UPDATE``, which is
+    far cheaper than binding every value of a multi-row INSERT. Must run
+    inside a transaction; the temporary table is dropped on commit.
+    """
+    fields = [model._meta.get_field(name) for name in list(unique_fields) + list(update_fields)]
+    rows = ([getattr(obj, field.attname) for field in fields] for obj in instances)
+    copy_upsert_values(model, rows, unique_fields, update_fields, using=using)
+
+
+def copy_upsert_values(model, rows, unique_fields, update_fields, using=DEFAULT_DB_ALIAS):
+    """``copy_upsert`` for value tuples ordered as ``unique_fields`` then ``update_fields``"""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    staging = quote(f'{model._meta.db_table}_staging')
+    _, columns = _upsert_sql(connection, model, unique_fields, update_fields, '')
+    sql, _ = _upsert_sql(connection, model, unique_fields, update_fields, f'SELECT {columns} FROM {staging}')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS '
+            f'SELECT {columns} FROM {table} WITH NO DATA'
+        )
+        with cursor.cursor.copy(f'COPY {staging} ({columns}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row(row)
+        cursor.execute(sql)
+
+
+def upsert_rows(model, instances, unique_fields, update_fields, batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Insert or update ``instances`` on ``unique_fields`` with the fastest path for the backend.
+
+    Large loads on PostgreSQL go through ``copy_upsert`` in one transaction;
+    everything else uses ``bulk_create(update_conflicts=True)``, which emits
+    ``ON CONFLICT`` upserts, in short serialized transactions of
+    ``batch_size`` rows.
+    """
+    if not instances:
+        return
+
+    if (connections[using].vendor == 'postgresql'
+            and len(instances) >= getattr(settings, 'DB_COPY_THRESHOLD', 2000)):
+        with serialized_write(using):
+            copy_upsert(model, instances, unique_fields, update_fields, using=using)
+    else:
+        for batch in chunked(instances, batch_size or write_batch_size()):
+            with serialized_write(using):
+                model.objects.using(using).bulk_create(
+                    batch,
+                    update_conflicts=True,
+                    unique_fields=unique_fields,
+                    update_fields=update_fields,
+                )
+    bulk_rows_written.send(sender=model, using=using, rows=len(instances))
+
+
+def upsert_values(model, rows, unique_fields, update_fields, batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Upsert raw value tuples without building model instances.
+
+    ``rows`` is a list of database-ready values ordered as ``unique_fields``
+    then ``update_fields``. For bulk loads where compiling a
+    ``bulk_create`` per batch costs more than the write itself: large loads
+    on PostgreSQL go through COPY, everything else runs one ``executemany``
+    of ``INSERT ... ON CONFLICT DO UPDATE`` per serialized batch.
+    """
+    if not rows:
+        return
+
+    connection = connections[using]
+    if (connection.vendor == 'postgresql'
+            and len(rows) >= getattr(settings, 'DB_COPY_THRESHOLD', 2000)):
+        with serialized_write(using):
+            copy_upsert_values(model, rows, unique_fields, update_fields, using=using)
+    else:
+        placeholders = ', '.join(['%s'] * (len(unique_fields) + len(update_fields)))
+        sql, _ = _upsert_sql(connection, model, unique_fields, update_fields, f'VALUES ({placeholders})')
+        for batch in chunked(rows, batch_size or write_batch_size()):
+            with serialized_write(using):
+                with connection.cursor() as cursor:
+                    cursor.executemany(sql, batch)
+    bulk_rows_written.send(sender=model, using=using, rows=len(rows))
+
+
+def increment_values(model, rows, unique_fields, update_fields, increment_fields,
+                     batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Upsert value tuples that add ``increment_fields`` to the stored counters.
+
+    ``rows`` are ordered as ``unique_fields``, ``update_fields`` then
+    ``increment_fields``. Missing rows are inserted with the given values;
+    existing rows get ``update_fields`` replaced and ``increment_fields``
+    added in the same statement, so concurrent writers never lose an
+    increment.
+    """
+    if not rows:
+        return
+
+    connection = connections[using]
+    placeholders = ', '.join(['%s'] * (len(unique_fields) + len(update_fields) + len(increment_fields)))
+    sql, _ = _upsert_sql(
+        connection, model, unique_fields, update_fields, f'VALUES ({placeholders})', increment_fields
+    )
+    for batch in chunked(rows, batch_size or write_batch_size()):
+        with serialized_write(using):
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+    bulk_rows_written.send(sender=model, using=using, rows=len(rows))
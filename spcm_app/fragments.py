@@ -0,0 +1,170 @@
+"""
+SPCM Fragment Cache - shared view fragments invalidated when their source tables change
+"""
+from collections import defaultdict
+import logging
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Stock, StockPrice, StockRecommendation, StockSnapshot, MarketDailyAggregate
+from .aggregates import latest_market_aggregate
+from .signals import bulk_rows_written
+
+logger = logging.getLogger(__name__)
+
+# Models whose writes make each fragment stale
+FRAGMENT_DEPENDENCIES = {
+    'top_stocks': (Stock, StockPrice, StockSnapshot),
+    'recent_recommendations': (Stock, StockRecommendation),
+    'market_aggregate': (MarketDailyAggregate,),
+}
+
+WATCHED_MODELS = {model for models_ in FRAGMENT_DEPENDENCIES.values() for model in models_}
+
+# Rows kept in the top_stocks fragment; views slice what they show
+TOP_STOCKS_LIMIT = 20
+
+_MISSING = object()
+
+
+def version_key(model):
+    return f'fragments:version:{model._meta.label_lower}'
+
+
+class FragmentCache:
+    """
+    Cache of the non-user-specific parts of the dashboard and market pages.
+
+    Every watched model has a version token in the cache and a fragment's
+    key embeds the versions of the models it reads, so a write replaces the
+    token and the next request rebuilds the fragment under a new key;
+    stale entries are never read again and age out of the backend.
+    The timeout is only a backstop for writers that share no cache with
+    the web processes.
+    """
+
+    def __init__(self, alias='views', timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.counters = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self.invalidations = defaultdict(int)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _versions(self, dependencies):
+        keys = [version_key(model) for model in dependencies]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # A fresh token, so a version lost to eviction never comes
+                # back as one that older entries were stored under
+                self.cache.add(key, uuid.uuid4().hex, timeout=None)
+                versions[key] = self.cache.get(key, '')
+        return '.'.join(str(versions[key]) for key in keys)
+
+    def get_or_build(self, name, build, *key_parts):
+        """Return fragment ``name`` for ``key_parts``, calling ``build`` on a miss"""
+        timeout = self.timeout if self.timeout is not None else getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 86400)
+        try:
+            key = ':'.join(
+                ['fragments', name, *(str(part) for part in key_parts),
+                 self._versions(FRAGMENT_DEPENDENCIES[name])]
+            )
+            value = self.cache.get(key, _MISSING)
+        except Exception as e:
+            logger.warning(f"Fragment cache unavailable for {name}: {e}")
+            return build()
+
+        if value is not _MISSING:
+            self._count(name, 'hits')
+            return value
+
+        self._count(name, 'misses')
+        value = build()
+        try:
+            self.cache.set(key, value, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Could not cache fragment {name}: {e}")
+        return value
+
+    def invalidate(self, model):
+        """Make every fragment that reads ``model`` stale"""
+        key = version_key(model)
+        try:
+            # A new random token instead of incr(): incr is a read-modify-write
+            # on the file and database backends, so concurrent bumps could collide
+            self.cache.set(key, uuid.uuid4().hex, timeout=None)
+        except Exception as e:
+            logger.warning(f"Fragment invalidation failed for {model._meta.label}: {e}")
+            return
+        with self._lock:
+            self.invalidations[model._meta.label] += 1
+
+    def _count(self, name, outcome):
+        with self._lock:
+            self.counters[name][outcome] += 1
+
+    def stats(self):
+        """Hit and miss counters per fragment for this process"""
+        with self._lock:
+            fragments = {name: dict(counts) for name, counts in self.counters.items()}
+            invalidations = dict(self.invalidations)
+
+        hits = misses = 0
+        for counts in fragments.values():
+            lookups = counts['hits'] + counts['misses']
+            counts['hit_rate'] = counts['hits'] / lookups if lookups else 0.0
+            hits += counts['hits']
+            misses += counts['misses']
+        return {
+            'backend': self.cache.__class__.__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'fragments': fragments,
+            'invalidations': invalidations,
+        }
+
+
+fragment_cache = FragmentCache()
+
+
+def _invalidate_on_commit(sender, using=None, **kwargs):
+    # Bump after commit so no reader rebuilds from the old rows under the new version
+    transaction.on_commit(lambda: fragment_cache.invalidate(sender), using=using)
+
+
+def connect_invalidation():
+    """Invalidate fragments on saves, deletes and bulk writes of the watched models"""
+    for model in WATCHED_MODELS:
+        uid = f'spcm_fragments_{model._meta.label_lower}'
+        post_save.connect(_invalidate_on_commit, sender=model, dispatch_uid=f'{uid}_save')
+        post_delete.connect(_invalidate_on_commit, sender=model, dispatch_uid=f'{uid}_delete')
+        bulk_rows_written.connect(_invalidate_on_commit, sender=model, dispatch_uid=f'{uid}_bulk')
+
+
+def top_stocks():
+    return fragment_cache.get_or_build('top_stocks', lambda: list(
+        Stock.objects.filter(is_active=True).select_related('snapshot').order_by('-market_cap')[:TOP_STOCKS_LIMIT]
+    ))
+
+
+def recent_recommendations():
+    return fragment_cache.get_or_build('recent_recommendations', lambda: list(
+        StockRecommendation.objects.select_related('stock')[:5]
+    ))
+
+
+def market_aggregate():
+    """The latest whole-market aggregate row (with ``sectors``) up to today, or None"""
+    today = timezone.now().date()
+    return fragment_cache.get_or_build('market_aggregate', lambda: latest_market_aggregate(today), today)
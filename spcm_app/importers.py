@@ -0,0 +1,298 @@
+"""
+SPCM Price Importer - streams vendor OHLCV dumps into StockPrice in bounded chunks
+"""
+from pathlib import Path
+import json
+import logging
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Count, Max, Min
+
+from .models import Stock, StockPrice, IndicatorState, PriceHistoryState
+from .db import upsert_values
+from .services import PRICE_FIELDS
+from .snapshots import refresh_snapshot
+from .aggregates import refresh_price_moves
+from . import pricestore
+
+logger = logging.getLogger(__name__)
+
+# Canonical import columns mapped to the file's column names by default
+DEFAULT_COLUMNS = {
+    'symbol': 'symbol',
+    'date': 'date',
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'close',
+    'volume': 'volume',
+}
+REQUIRED_COLUMNS = tuple(DEFAULT_COLUMNS)
+
+# Canonical columns that may also be mapped; adjusted_close defaults to close
+OPTIONAL_COLUMNS = ('adjusted_close', 'name')
+
+PRICE_COLUMNS = {
+    'open_price': 'open',
+    'high_price': 'high',
+    'low_price': 'low',
+    'close_price': 'close',
+    'adjusted_close': 'adjusted_close',
+}
+
+
+def load_import_config(path=None):
+    """
+    Read a JSON import config.
+
+    ``columns`` maps canonical names (symbol, date, open, high, low,
+    close, volume and optionally adjusted_close and name) to the file's
+    headers. ``date_format`` is a strptime format (parsed leniently when
+    omitted), ``delimiter`` the CSV separator and ``price_scale`` a factor
+    applied to prices quoted in e.g. cents.
+    """
+    config = {}
+    if path:
+        with open(path) as handle:
+            config = json.load(handle)
+
+    columns = dict(DEFAULT_COLUMNS)
+    columns.update(config.get('columns', {}))
+    unknown = set(columns) - set(REQUIRED_COLUMNS) - set(OPTIONAL_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown import columns: {', '.join(sorted(unknown))}")
+
+    return {
+        'columns': columns,
+        'date_format': config.get('date_format'),
+        'delimiter': config.get('delimiter', ','),
+        'price_scale': float(config.get('price_scale', 1)),
+    }
+
+
+def file_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in ('.parquet', '.pq'):
+        return 'parquet'
+    if suffix in ('.csv', '.txt', '.gz', '.bz2', '.zip', '.xz'):
+        return 'csv'
+    raise ValueError(f"Unsupported file type: {path}")
+
+
+def iter_chunks(path, config, chunk_size):
+    """
+    Yield DataFrames of at most ``chunk_size`` rows holding only the mapped columns.
+
+    CSV files are read with ``pandas.read_csv(chunksize=...)`` and Parquet
+    files batch by batch with pyarrow, so memory stays bounded by the
+    chunk size whatever the file size.
+    """
+    source_columns = list(dict.fromkeys(config['columns'].values()))
+
+    if file_format(path) == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow)")
+
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=source_columns):
+            yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(
+        path,
+        sep=config['delimiter'],
+        usecols=source_columns,
+        dtype={config['columns']['symbol']: str},
+        chunksize=chunk_size,
+    )
+
+
+def normalize_chunk(chunk, config):
+    """
+    Rename mapped columns to canonical names and clean one chunk.
+
+    Symbols are upper-cased, dates parsed, prices scaled and rounded to
+    the StockPrice precision. Rows with a missing or unparsable value are
+    dropped, and the last row wins for a repeated (symbol, date).
+    Returns the cleaned frame and the number of rows dropped.
+    """
+    columns = config['columns']
+    frame = pd.DataFrame({
+        name: chunk[source] for name, source in columns.items() if name != 'adjusted_close'
+    })
+    frame['symbol'] = frame['symbol'].astype(str).str.strip().str.upper()
+    frame['date'] = pd.to_datetime(
+        frame['date'], format=config['date_format'], errors='coerce'
+    ).dt.date
+
+    for name in ('open', 'high', 'low', 'close', 'volume'):
+        frame[name] = pd.to_numeric(frame[name], errors='coerce')
+    adjusted = chunk[columns['adjusted_close']] if 'adjusted_close' in columns else frame['close']
+    frame['adjusted_close'] = pd.to_numeric(adjusted, errors='coerce').fillna(frame['close'])
+
+    for name in PRICE_COLUMNS.values():
+        frame[name] = (frame[name] * config['price_scale']).round(2)
+
+    rows = len(frame)
+    frame = frame.replace([np.inf, -np.inf], np.nan).dropna(
+        subset=['symbol', 'date', 'open', 'high', 'low', 'close', 'volume']
+    )
+    frame = frame[frame['symbol'] != '']
+    frame = frame.drop_duplicates(subset=['symbol', 'date'], keep='last')
+    return frame, rows - len(frame)
+
+
+class PriceImporter:
+    """
+    Load normalized price chunks into StockPrice.
+
+    Missing stocks are created in bulk as symbols first appear, and every
+    chunk is written as plain tuples through ``upsert_values`` (COPY on
+    PostgreSQL, batched ``ON CONFLICT`` inserts otherwise), skipping model
+    instances entirely, so re-importing a file is safe.
+    The per-stock date range loaded is kept so ``finish`` can move the
+    high-water marks and refresh derived data once at the end.
+    """
+
+    def __init__(self, create_missing=True, batch_size=None):
+        self.create_missing = create_missing
+        self.batch_size = batch_size
+        self.stock_ids = {}
+        self.unknown = set()
+        self.ranges = {}
+        self.created = 0
+
+    def import_chunk(self, frame):
+        """Write one normalized chunk; returns the number of rows written"""
+        self._resolve_stocks(frame)
+        frame = frame[frame['symbol'].isin(self.stock_ids)]
+        if frame.empty:
+            return 0
+
+        stock_ids = frame['symbol'].map(self.stock_ids).tolist()
+        dates = frame['date'].tolist()
+
+        # Plain tuples in PRICE_FIELDS order; prices are already rounded to the
+        # column precision, so floats store exactly as their Decimal would
+        adapt_date = connections[DEFAULT_DB_ALIAS].ops.adapt_datefield_value
+        columns = [
+            frame[name].astype(np.int64 if name == 'volume' else np.float64).tolist()
+            for name in (PRICE_COLUMNS.get(field, field) for field in PRICE_FIELDS)
+        ]
+        rows = [
+            (stock_id, adapt_date(date), *values)
+            for stock_id, date, *values in zip(stock_ids, dates, *columns)
+        ]
+        upsert_values(StockPrice, rows, ['stock', 'date'], PRICE_FIELDS, batch_size=self.batch_size)
+
+        bounds = pd.DataFrame({'stock_id': stock_ids, 'date': dates}).groupby('stock_id')['date'].agg(['min', 'max'])
+        for stock_id, first, last in bounds.itertuples():
+            current = self.ranges.get(stock_id)
+            self.ranges[stock_id] = (first, last) if current is None else (
+                min(current[0], first), max(current[1], last)
+            )
+        return len(rows)
+
+    def _resolve_stocks(self, frame):
+        """Look up, and optionally create, the stocks of symbols not seen yet"""
+        symbols = set(frame['symbol'].unique()) - set(self.stock_ids) - self.unknown
+        if not symbols:
+            return
+
+        self.stock_ids.update(
+            Stock.objects.filter(symbol__in=symbols).values_list('symbol', 'id')
+        )
+        missing = symbols - set(self.stock_ids)
+        if not missing:
+            return
+        if not self.create_missing:
+            self.unknown |= missing
+            return
+
+        names = {}
+        if 'name' in frame:
+            firsts = frame[frame['symbol'].isin(missing)].drop_duplicates('symbol')
+            names = dict(zip(firsts['symbol'], firsts['name']))
+        Stock.objects.bulk_create(
+            [
+                Stock(symbol=symbol, name=str(names.get(symbol) or symbol)[:200])
+                for symbol in sorted(missing)
+                if len(symbol) <= Stock._meta.get_field('symbol').max_length
+            ],
+            ignore_conflicts=True,
+        )
+        created = dict(Stock.objects.filter(symbol__in=missing).values_list('symbol', 'id'))
+        self.created += len(created)
+        self.stock_ids.update(created)
+        self.unknown |= missing - set(created)
+
+    def finish(self, sync=True):
+        """
+        Bring derived data in line with the imported bars.
+
+        Extends each stock's PriceHistoryState, drops indicator state that
+        the import may have revised, and (with ``sync``) rewrites the price
+        store files and price snapshots of the touched stocks and the
+        market advance/decline counts of the imported days.
+        """
+        if not self.ranges:
+            return
+
+        histories = PriceHistoryState.objects.in_bulk(
+            self.ranges.keys(), field_name='stock_id'
+        )
+        # Ranges and bar counts come from the stored bars, which also covers
+        # stocks loaded before ranges were tracked
+        stored = {
+            row['stock_id']: (row['first'], row['last'], row['count'])
+            for row in StockPrice.objects.filter(stock_id__in=self.ranges.keys()).values(
+                'stock_id'
+            ).annotate(first=Min('date'), last=Max('date'), count=Count('id'))
+        }
+
+        new, changed = [], []
+        for stock_id, (first, last) in self.ranges.items():
+            first, last, count = stored.get(stock_id, (first, last, 0))
+            history = histories.get(stock_id)
+            if history is None:
+                new.append(PriceHistoryState(
+                    stock_id=stock_id, first_date=first, last_date=last, bar_count=count,
+                    bars_version=uuid.uuid4().hex,
+                ))
+            else:
+                history.first_date = min(history.first_date, first)
+                history.last_date = max(history.last_date, last)
+                history.bar_count = count
+                history.bars_version = uuid.uuid4().hex
+                changed.append(history)
+        PriceHistoryState.objects.bulk_create(new, ignore_conflicts=True)
+        PriceHistoryState.objects.bulk_update(changed, ['first_date', 'last_date', 'bar_count', 'bars_version'])
+
+        stale = [
+            pk for pk, stock_id, last_date in IndicatorState.objects.filter(
+                stock_id__in=self.ranges.keys()
+            ).values_list('pk', 'stock_id', 'last_date')
+            if last_date >= self.ranges[stock_id][0]
+        ]
+        IndicatorState.objects.filter(pk__in=stale).delete()
+
+        if not sync:
+            return
+        for stock in Stock.objects.filter(id__in=self.ranges.keys()).iterator():
+            if pricestore.store_enabled():
+                try:
+                    pricestore.sync_stock(stock)
+                except Exception as e:
+                    logger.warning(f"Price store sync failed for {stock.symbol}: {e}")
+                    pricestore.invalidate(stock.symbol)
+            refresh_snapshot(stock, ['price'])
+
+        refresh_price_moves(
+            min(first for first, _ in self.ranges.values()),
+            max(last for _, last in self.ranges.values()),
+        )
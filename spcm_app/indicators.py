@@ -0,0 +1,313 @@
+"""
+SPCM Technical Indicator Engine - registry of vectorized kernels plus O(1) recursive state
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+RSI_PERIOD = 14
+BOLLINGER_WINDOW = 20
+BOLLINGER_WIDTH = 2
+EMA_SPANS = (12, 26)
+SIGNAL_SPAN = 9
+ATR_PERIOD = 14
+STOCH_PERIOD = 14
+STOCH_SMOOTHING = 3
+VWAP_WINDOW = 20
+
+# Bars before this index are not persisted; recursive indicators are still warming up
+WARMUP_BARS = RSI_PERIOD
+
+PRICE_INPUTS = ('open', 'high', 'low', 'close', 'volume')
+
+# Keys of the rolling state carried between incremental runs
+STATE_KEYS = ('close', 'ema_12', 'ema_26', 'ema_9', 'avg_gain', 'avg_loss', 'obv')
+
+
+class Indicator:
+    """
+    A registered indicator.
+
+    ``columns`` are the TechnicalIndicator fields the kernel returns and
+    ``inputs`` the price columns it reads. ``lookback`` is the number of
+    bars, up to and including the current one, that fully determine its
+    value; None marks a recursive indicator whose value depends on the
+    whole history and is carried forward by ``advance_state`` instead.
+    Kernels take a dict of (bars x symbols) DataFrames and return a dict
+    of equally shaped arrays.
+    """
+
+    def __init__(self, name, columns, inputs, lookback, kernel):
+        self.name = name
+        self.columns = tuple(columns)
+        self.inputs = tuple(inputs)
+        self.lookback = lookback
+        self.kernel = kernel
+
+    @property
+    def recursive(self):
+        return self.lookback is None
+
+
+INDICATORS = {}
+
+
+def register(name, columns, inputs=('close',), lookback=None):
+    """Decorator adding a kernel to the indicator registry"""
+    def decorator(kernel):
+        INDICATORS[name] = Indicator(name, columns, inputs, lookback, kernel)
+        return kernel
+    return decorator
+
+
+def resolve_indicators(names=None):
+    """Registered indicators for ``names`` (all when None), in registry order"""
+    if names is None:
+        return list(INDICATORS.values())
+    unknown = set(names) - set(INDICATORS)
+    if unknown:
+        raise ValueError(f"Unknown indicators: {', '.join(sorted(unknown))}")
+    return [indicator for name, indicator in INDICATORS.items() if name in names]
+
+
+def indicator_columns(indicators):
+    return [column for indicator in indicators for column in indicator.columns]
+
+
+def covers_state(indicators):
+    """True when ``indicators`` include every recursive indicator, so the rolling state can move forward"""
+    names = {indicator.name for indicator in indicators}
+    return all(name in names for name, indicator in INDICATORS.items() if indicator.recursive)
+
+
+def max_lookback(indicators):
+    """Bars needed up to the first new bar to compute the windowed ``indicators`` exactly"""
+    return max((indicator.lookback for indicator in indicators if not indicator.recursive), default=0)
+
+
+def _ema(series, span):
+    return series.ewm(span=span, adjust=False).mean()
+
+
+def _wilder_averages(close):
+    delta = close.diff()
+    alpha = 1.0 / RSI_PERIOD
+    avg_gain = delta.clip(lower=0).ewm(alpha=alpha, adjust=False).mean()
+    avg_loss = (-delta).clip(lower=0).ewm(alpha=alpha, adjust=False).mean()
+    return avg_gain, avg_loss
+
+
+def _obv(close, volume):
+    return (np.sign(close.diff()) * volume).fillna(0).cumsum()
+
+
+# Recursive indicators (whole history, carried in the rolling state)
+
+@register('rsi', ['rsi'])
+def rsi_kernel(bars):
+    avg_gain, avg_loss = _wilder_averages(bars['close'])
+    rsi = (100 - (100 / (1 + avg_gain / avg_loss))).to_numpy(copy=True)
+    rsi[:RSI_PERIOD] = np.nan
+    return {'rsi': rsi}
+
+
+@register('ema', ['ema_12', 'ema_26'])
+def ema_kernel(bars):
+    return {f'ema_{span}': _ema(bars['close'], span) for span in EMA_SPANS}
+
+
+@register('macd', ['macd', 'macd_signal'])
+def macd_kernel(bars):
+    macd = _ema(bars['close'], EMA_SPANS[0]) - _ema(bars['close'], EMA_SPANS[1])
+    return {'macd': macd, 'macd_signal': _ema(macd, SIGNAL_SPAN)}
+
+
+@register('obv', ['obv'], inputs=('close', 'volume'))
+def obv_kernel(bars):
+    return {'obv': _obv(bars['close'], bars['volume'])}
+
+
+# Windowed indicators (recomputed from the last ``lookback`` bars)
+
+def _sma_kernel(window):
+    def kernel(bars):
+        return {f'sma_{window}': bars['close'].rolling(window=window).mean()}
+    return kernel
+
+
+for _window in (20, 50, 200):
+    register(f'sma_{_window}', [f'sma_{_window}'], lookback=_window)(_sma_kernel(_window))
+
+
+@register('bollinger', ['bollinger_upper', 'bollinger_lower'], lookback=BOLLINGER_WINDOW)
+def bollinger_kernel(bars):
+    close = bars['close']
+    middle = close.rolling(window=BOLLINGER_WINDOW).mean()
+    std = close.rolling(window=BOLLINGER_WINDOW).std()
+    return {
+        'bollinger_upper': middle + (std * BOLLINGER_WIDTH),
+        'bollinger_lower': middle - (std * BOLLINGER_WIDTH),
+    }
+
+
+@register('atr', ['atr'], inputs=('high', 'low', 'close'), lookback=ATR_PERIOD + 1)
+def atr_kernel(bars):
+    # Simple average of the true range; the first bar has no previous close
+    previous = bars['close'].shift(1)
+    true_range = np.maximum(
+        bars['high'] - bars['low'],
+        np.maximum((bars['high'] - previous).abs(), (bars['low'] - previous).abs()),
+    )
+    return {'atr': true_range.rolling(window=ATR_PERIOD).mean()}
+
+
+@register('stochastic', ['stoch_k', 'stoch_d'], inputs=('high', 'low', 'close'),
+          lookback=STOCH_PERIOD + STOCH_SMOOTHING - 1)
+def stochastic_kernel(bars):
+    lowest = bars['low'].rolling(window=STOCH_PERIOD).min()
+    highest = bars['high'].rolling(window=STOCH_PERIOD).max()
+    stoch_k = 100 * (bars['close'] - lowest) / (highest - lowest).replace(0, np.nan)
+    return {'stoch_k': stoch_k, 'stoch_d': stoch_k.rolling(window=STOCH_SMOOTHING).mean()}
+
+
+@register('vwap', ['vwap'], inputs=('high', 'low', 'close', 'volume'), lookback=VWAP_WINDOW)
+def vwap_kernel(bars):
+    typical = (bars['high'] + bars['low'] + bars['close']) / 3
+    traded = (typical * bars['volume']).rolling(window=VWAP_WINDOW).sum()
+    volume = bars['volume'].rolling(window=VWAP_WINDOW).sum()
+    return {'vwap': traded / volume.replace(0, np.nan)}
+
+
+def _frames(bars, inputs):
+    return {name: pd.DataFrame(bars[name]) for name in inputs}
+
+
+def compute_indicators(bars, indicators=None):
+    """
+    Run the kernels of ``indicators`` (all registered by default) in one vectorized pass.
+
+    ``bars`` maps price columns to 2-D float arrays with one column per
+    symbol. Each column holds that symbol's bars from row 0, padded with
+    NaN after its last bar; aligning on bar index rather than calendar date
+    keeps every column identical to computing the symbol on its own.
+    Returns a dict of 2-D arrays keyed by TechnicalIndicator field.
+    """
+    indicators = resolve_indicators() if indicators is None else indicators
+    inputs = {name for indicator in indicators for name in indicator.inputs}
+    frames = _frames(bars, inputs)
+
+    columns = {}
+    for indicator in indicators:
+        for name, values in indicator.kernel(frames).items():
+            columns[name] = np.asarray(values, dtype=np.float64)
+    return columns
+
+
+def rolling_states(bars, lengths):
+    """Rolling state after the last bar of each column, for ``advance_state``"""
+    frames = _frames(bars, ('close', 'volume'))
+    close = frames['close']
+    avg_gain, avg_loss = _wilder_averages(close)
+    ema_fast = _ema(close, EMA_SPANS[0])
+    ema_slow = _ema(close, EMA_SPANS[1])
+    signal = _ema(ema_fast - ema_slow, SIGNAL_SPAN)
+    obv = _obv(close, frames['volume'])
+
+    states = []
+    for j, length in enumerate(lengths):
+        last = length - 1
+        states.append({
+            'close': float(close.iat[last, j]),
+            'ema_12': float(ema_fast.iat[last, j]),
+            'ema_26': float(ema_slow.iat[last, j]),
+            'ema_9': float(signal.iat[last, j]),
+            'avg_gain': float(avg_gain.iat[last, j]),
+            'avg_loss': float(avg_loss.iat[last, j]),
+            'obv': float(obv.iat[last, j]),
+        })
+    return states
+
+
+def _column_bars(prices, inputs):
+    return {name: np.asarray(prices[name], dtype=np.float64).reshape(-1, 1) for name in inputs}
+
+
+def compute_indicator_frame(prices, indicators=None):
+    """
+    Calculate indicators over one symbol's bars.
+
+    ``prices`` maps ``date`` and price columns to 1-D arrays in date order,
+    as returned by ``pricestore.load_prices``. Returns a DataFrame with
+    ``date`` and one column per indicator field.
+    """
+    indicators = resolve_indicators() if indicators is None else indicators
+    inputs = {name for indicator in indicators for name in indicator.inputs}
+    columns = compute_indicators(_column_bars(prices, inputs), indicators)
+
+    frame = pd.DataFrame({'date': np.asarray(prices['date']).astype(object)})
+    for name, values in columns.items():
+        frame[name] = values[:, 0]
+    return frame
+
+
+def initial_state(prices):
+    """Rolling state after the last bar of one symbol's full history"""
+    bars = _column_bars(prices, ('close', 'volume'))
+    return rolling_states(bars, [len(bars['close'])])[0]
+
+
+def advance_state(state, bar_count, close, volume):
+    """
+    Apply one new bar to the rolling state in O(1).
+
+    ``bar_count`` is the number of bars already folded into ``state``.
+    The state dict is updated in place; returns the values of the
+    recursive indicators for the new bar.
+    """
+    delta = close - state['close']
+    state['close'] = close
+
+    # Wilder averages
+    alpha = 1.0 / RSI_PERIOD
+    state['avg_gain'] = (1 - alpha) * state['avg_gain'] + alpha * max(delta, 0.0)
+    state['avg_loss'] = (1 - alpha) * state['avg_loss'] + alpha * max(-delta, 0.0)
+
+    # EMAs and MACD
+    state['ema_12'] += 2.0 / (EMA_SPANS[0] + 1) * (close - state['ema_12'])
+    state['ema_26'] += 2.0 / (EMA_SPANS[1] + 1) * (close - state['ema_26'])
+    macd = state['ema_12'] - state['ema_26']
+    state['ema_9'] += 2.0 / (SIGNAL_SPAN + 1) * (macd - state['ema_9'])
+
+    # On-balance volume
+    if delta:
+        state['obv'] += math.copysign(volume, delta)
+
+    rsi = None
+    if bar_count + 1 > RSI_PERIOD:
+        if state['avg_loss'] > 0:
+            rsi = 100 - (100 / (1 + state['avg_gain'] / state['avg_loss']))
+        elif state['avg_gain'] > 0:
+            rsi = 100.0
+
+    return {
+        'rsi': rsi,
+        'ema_12': state['ema_12'],
+        'ema_26': state['ema_26'],
+        'macd': macd,
+        'macd_signal': state['ema_9'],
+        'obv': state['obv'],
+    }
+
+
+def advance_frame(state, bar_count, prices):
+    """Fold new bars into ``state``; returns a DataFrame of recursive indicator rows"""
+    closes = np.asarray(prices['close'], dtype=np.float64).tolist()
+    volumes = np.asarray(prices['volume'], dtype=np.float64).tolist()
+    rows = [
+        advance_state(state, bar_count + offset, close, volume)
+        for offset, (close, volume) in enumerate(zip(closes, volumes))
+    ]
+    frame = pd.DataFrame(rows, columns=['rsi', 'ema_12', 'ema_26', 'macd', 'macd_signal', 'obv'])
+    frame.insert(0, 'date', np.asarray(prices['date']).astype(object))
+    return frame
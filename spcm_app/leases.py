@@ -0,0 +1,83 @@
+"""
+SPCM Single-Flight Leases - one refresh per symbol and stage across processes
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RefreshLease
+
+logger = logging.getLogger(__name__)
+
+
+def lease_key(stage, symbol):
+    return f"{stage}:{symbol}"
+
+
+def acquire_lease(key, ttl=None):
+    """Try to take the lease on ``key``; returns an owner token or None"""
+    ttl = ttl or getattr(settings, 'REFRESH_LEASE_TTL', 300)
+    owner = uuid.uuid4().hex
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+
+    try:
+        with transaction.atomic():
+            RefreshLease.objects.create(key=key, owner=owner, expires_at=expires_at)
+        return owner
+    except IntegrityError:
+        pass
+
+    # Take over a lease whose holder died without releasing it
+    taken = RefreshLease.objects.filter(key=key, expires_at__lt=now).update(
+        owner=owner, acquired_at=now, expires_at=expires_at
+    )
+    return owner if taken else None
+
+
+def release_lease(key, owner):
+    RefreshLease.objects.filter(key=key, owner=owner).delete()
+
+
+def lease_active(key):
+    return RefreshLease.objects.filter(key=key, expires_at__gte=timezone.now()).exists()
+
+
+def wait_for_release(key, timeout, poll_interval=0.25):
+    """Wait up to ``timeout`` seconds for ``key`` to be released; returns True if it was"""
+    deadline = time.monotonic() + timeout
+    while lease_active(key):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+    return True
+
+
+@contextmanager
+def single_flight(stage, symbol, wait=0, ttl=None):
+    """
+    Run a block only if no other caller is working on ``stage`` for ``symbol``.
+
+    Yields True when this caller holds the lease. Otherwise it waits up to
+    ``wait`` seconds for the current holder to finish and yields False, and
+    the caller should use the data the holder produced.
+    """
+    key = lease_key(stage, symbol)
+    owner = acquire_lease(key, ttl)
+    if owner is None:
+        logger.info(f"{key} is already being refreshed, waiting up to {wait}s")
+        if wait:
+            wait_for_release(key, wait)
+        yield False
+        return
+
+    try:
+        yield True
+    finally:
+        release_lease(key, owner)
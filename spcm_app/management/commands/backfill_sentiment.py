@@ -0,0 +1,47 @@
+"""
+Django management command to backfill daily sentiment from stored news articles
+Usage: python manage.py backfill_sentiment [AAPL TSLA ...] [--days 365] [--per-stock]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import timedelta
+import time
+
+from spcm_app.models import Stock
+from spcm_app.services import SentimentAnalysisService
+
+
+class Command(BaseCommand):
+    help = 'Compute SentimentData for every stock and day in a range with one grouped query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', type=str, help='Stock symbols to backfill (default: all)')
+        parser.add_argument('--days', type=int, default=365, help='Days back from today to backfill')
+        parser.add_argument('--per-stock', action='store_true',
+                            help='Call calculate_daily_sentiment per stock and day instead, for comparison')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be positive')
+
+        symbols = [symbol.upper() for symbol in options['symbols']]
+        end = timezone.now().date()
+        start = end - timedelta(days=options['days'] - 1)
+        service = SentimentAnalysisService()
+
+        self.stdout.write(f'🧠 Backfilling sentiment from {start} to {end}')
+        started = time.perf_counter()
+        if options['per_stock']:
+            stocks = Stock.objects.all()
+            if symbols:
+                stocks = stocks.filter(symbol__in=symbols)
+            computed = 0
+            for symbol in stocks.values_list('symbol', flat=True):
+                for offset in range(options['days']):
+                    computed += service.calculate_daily_sentiment(symbol, start + timedelta(days=offset))
+        else:
+            computed = service.calculate_sentiment_range(start, end, symbols or None)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Computed {computed:,} stock-days of sentiment in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,101 @@
+"""
+Django management command to compare per-row and bulk StockPrice ingestion
+Usage: python manage.py benchmark_price_ingest --days 2500
+"""
+from django.core.management.base import BaseCommand
+from datetime import timedelta
+from decimal import Decimal
+import random
+import time
+
+from django.utils import timezone
+
+from spcm_app.models import Stock, StockPrice
+from spcm_app.services import PRICE_FIELDS, bulk_upsert_daily_rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the bulk StockPrice upsert against the per-row update_or_create loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2500, help='Number of daily bars per run')
+        parser.add_argument('--symbol', type=str, default='ZZBENCH', help='Scratch symbol used for the benchmark')
+        parser.add_argument('--changed', type=float, default=0.01, help='Fraction of bars modified for the re-ingest run')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        symbol = options['symbol'].upper()
+
+        if Stock.objects.filter(symbol=symbol).exists():
+            self.stdout.write(self.style.ERROR(f'❌ {symbol} already exists, pick another --symbol'))
+            return
+
+        stock = Stock.objects.create(symbol=symbol, name=f'{symbol} Benchmark', is_active=False)
+        try:
+            rows = self._generate_rows(days)
+            changed = self._modify(rows, options['changed'])
+
+            self.stdout.write(f'📊 Ingesting {days} bars for {symbol}')
+            self.stdout.write('')
+
+            self._report('Per-row initial load', self._time(self._per_row, stock, rows))
+            self._report('Per-row re-ingest', self._time(self._per_row, stock, changed))
+            StockPrice.objects.filter(stock=stock).delete()
+
+            self._report('Bulk initial load', self._time(self._bulk, stock, rows))
+            self._report('Bulk re-ingest', self._time(self._bulk, stock, changed))
+        finally:
+            stock.delete()
+
+    def _generate_rows(self, days):
+        """Generate a random walk of OHLCV bars"""
+        start = timezone.now().date() - timedelta(days=days)
+        price = 100.0
+        rows = []
+        for i in range(days):
+            price = max(1.0, price * (1 + random.uniform(-0.03, 0.03)))
+            rows.append({
+                'date': start + timedelta(days=i),
+                'open_price': Decimal(str(round(price * random.uniform(0.98, 1.02), 2))),
+                'high_price': Decimal(str(round(price * 1.03, 2))),
+                'low_price': Decimal(str(round(price * 0.97, 2))),
+                'close_price': Decimal(str(round(price, 2))),
+                'volume': random.randint(1000000, 50000000),
+                'adjusted_close': Decimal(str(round(price, 2))),
+            })
+        return rows
+
+    def _modify(self, rows, fraction):
+        """Copy rows with a fraction of closes revised"""
+        revised = [dict(row) for row in rows]
+        for row in random.sample(revised, int(len(revised) * fraction)):
+            row['close_price'] += Decimal('0.01')
+        return revised
+
+    def _per_row(self, stock, rows):
+        """Legacy path: one update_or_create per bar"""
+        for row in rows:
+            defaults = {name: row[name] for name in PRICE_FIELDS}
+            StockPrice.objects.update_or_create(stock=stock, date=row['date'], defaults=defaults)
+        return None
+
+    def _bulk(self, stock, rows):
+        """Bulk path: one diff query plus batched upserts"""
+        return bulk_upsert_daily_rows(
+            StockPrice, [StockPrice(stock=stock, **row) for row in rows], PRICE_FIELDS
+        )
+
+    def _time(self, func, stock, rows):
+        started = time.perf_counter()
+        counts = func(stock, rows)
+        return time.perf_counter() - started, len(rows), counts
+
+    def _report(self, label, timing):
+        elapsed, rows, counts = timing
+        line = f'{label:<22} {elapsed:8.3f}s  {rows / elapsed:10.0f} rows/s'
+        if counts:
+            line += (
+                f"  ({counts['inserted']} inserted, {counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged)"
+            )
+        self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,86 @@
+"""
+Django management command to compare blocking and async provider calls against a slow upstream
+Usage: python manage.py benchmark_provider_io --requests 200 --workers 3 --latency 1.0
+"""
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+
+from spcm_app.providers import get_async_provider_client
+from spcm_app.services import StockDataService
+from spcm_app.management.commands.provider_stub import start_stub_server
+
+
+class Command(BaseCommand):
+    help = 'Measure quote requests served per second by sync workers versus one event loop, using the provider stub'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Quote requests per run')
+        parser.add_argument('--workers', type=int, default=3, help='Sync workers, like gunicorn --workers')
+        parser.add_argument('--latency', type=float, default=1.0, help='Stub upstream latency in seconds')
+        parser.add_argument('--pool-size', type=int, default=100, help='Connection pool of the async client')
+
+    def handle(self, *args, **options):
+        server = start_stub_server(latency=options['latency'])
+        self.base_url = f'http://127.0.0.1:{server.server_port}/query'
+        count = options['requests']
+        symbols = [f'SYM{i % 50}' for i in range(count)]
+
+        self.stdout.write(
+            f'🧪 {count} quote requests against a stub with {options["latency"]}s latency'
+        )
+        try:
+            sync_elapsed, sync_ok = self._run_sync(symbols, options['workers'])
+            # Async provider clients are only handed out under ASGI, which this run stands in for
+            with override_settings(SERVER_INTERFACE='asgi'):
+                async_elapsed, async_ok = asyncio.run(self._run_async(symbols, options['pool_size']))
+        finally:
+            server.shutdown()
+
+        self.stdout.write('')
+        self._report(f'Sync, {options["workers"]} workers', sync_elapsed, sync_ok, count)
+        self._report('Async, 1 event loop', async_elapsed, async_ok, count)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ One async worker served {sync_elapsed / async_elapsed:.1f}x the requests per second'
+        ))
+
+    def _service(self):
+        service = StockDataService()
+        service.api_key = 'benchmark'
+        service.use_api = True
+        return service
+
+    def _point_at_stub(self, client):
+        """Send every call to the stub, uncached and outside the shared rate budget"""
+        client.base_url = self.base_url
+        client.rate_limiter = None
+        client.cache = None
+
+    def _run_sync(self, symbols, workers):
+        service = self._service()
+        self._point_at_stub(service.client)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            quotes = list(pool.map(service._fetch_quote_from_api, symbols))
+        return time.perf_counter() - started, sum(quote is not None for quote in quotes)
+
+    async def _run_async(self, symbols, pool_size):
+        service = self._service()
+        client = get_async_provider_client('alpha_vantage')
+        self._point_at_stub(client)
+        await client.session.aclose()
+        client.session = client._create_session(pool_size)
+
+        started = time.perf_counter()
+        quotes = await asyncio.gather(*(service.afetch_realtime_quote(symbol) for symbol in symbols))
+        elapsed = time.perf_counter() - started
+        await client.session.aclose()
+        return elapsed, sum(quote is not None for quote in quotes)
+
+    def _report(self, label, elapsed, ok, count):
+        self.stdout.write(
+            f'{label:<22} {elapsed:7.2f}s  {count / elapsed:8.1f} req/s  ({ok}/{count} ok)'
+        )
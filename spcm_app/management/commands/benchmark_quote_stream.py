@@ -0,0 +1,161 @@
+"""
+Django management command to load-test the live quote stream with many concurrent subscribers
+Usage: python manage.py benchmark_quote_stream --subscribers 1000 --symbols 10 [--slow 0.05] [--url http://127.0.0.1:8000]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from urllib.parse import urlsplit
+import asyncio
+import json
+import random
+import resource
+import statistics
+import threading
+import time
+
+from spcm_app.streaming import QuoteHub
+
+
+class Command(BaseCommand):
+    help = 'Fan quote updates out to many SSE subscribers and report upstream polls, latency and slow-client handling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=1000, help='Concurrent stream subscribers')
+        parser.add_argument('--symbols', type=int, default=10, help='Distinct symbols the subscribers spread over')
+        parser.add_argument('--seconds', type=float, default=10, help='How long to run')
+        parser.add_argument('--interval', type=float, default=0.25, help='Upstream poll interval per symbol (in-process mode)')
+        parser.add_argument('--upstream-latency', type=float, default=0.05, help='Simulated provider latency in seconds (in-process mode)')
+        parser.add_argument('--slow', type=float, default=0.0, help='Fraction of subscribers that read slowly')
+        parser.add_argument('--stall-timeout', type=float, default=2.0, help='Seconds a non-reading subscriber is kept (in-process mode)')
+        parser.add_argument('--url', type=str, help='Base URL of a running ASGI server; streams real HTTP connections instead of the in-process hub')
+        parser.add_argument('--stream-symbols', type=str, default='AAPL,MSFT,GOOGL,TSLA,AMZN', help='Symbols requested in --url mode')
+
+    def handle(self, *args, **options):
+        if options['subscribers'] < 1 or options['seconds'] <= 0:
+            raise CommandError('--subscribers and --seconds must be positive')
+
+        if options['url']:
+            asyncio.run(self._run_http(options))
+        else:
+            asyncio.run(self._run_hub(options))
+
+    async def _run_hub(self, options):
+        """Drive the real QuoteHub with a synthetic upstream"""
+        symbols = [f'SYM{i}' for i in range(max(1, options['symbols']))]
+        prices = {symbol: 100.0 for symbol in symbols}
+        upstream_calls = {symbol: 0 for symbol in symbols}
+        lock = threading.Lock()
+        latency = options['upstream_latency']
+
+        def fetch(symbol):
+            time.sleep(latency)
+            with lock:
+                upstream_calls[symbol] += 1
+                prices[symbol] *= 1 + random.uniform(-0.001, 0.001)
+                price = prices[symbol]
+            return {'price': round(price, 4), 'sent_at': time.time()}
+
+        hub = QuoteHub(fetch=fetch, interval=options['interval'], stall_timeout=options['stall_timeout'])
+        count = options['subscribers']
+        slow = set(random.sample(range(count), int(count * options['slow'])))
+        latencies = []
+        received = [0] * count
+
+        async def consume(index, symbol):
+            delay = options['interval'] * 8 if index in slow else 0
+            async for message in hub.stream([symbol], max_seconds=options['seconds']):
+                if not message.startswith('event: quote'):
+                    continue
+                data = json.loads(message.split('data: ', 1)[1])
+                latencies.append(time.time() - data['sent_at'])
+                received[index] += 1
+                if delay:
+                    await asyncio.sleep(delay)
+
+        self.stdout.write(
+            f'📡 {count} subscribers over {len(symbols)} symbols for {options["seconds"]:.0f}s '
+            f'({len(slow)} slow, poll every {options["interval"]}s)'
+        )
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(consume(i, symbols[i % len(symbols)]))
+            for i in range(count)
+        ]
+        await asyncio.sleep(min(1.0, options['seconds'] / 2))
+        peak_subscribers = hub.stats()['subscribers']
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        stats = hub.stats()
+        polls = sum(upstream_calls.values())
+        naive_polls = count * elapsed / options['interval']
+        fast_received = [received[i] for i in range(count) if i not in slow]
+        slow_received = [received[i] for i in slow]
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'✅ Delivered {stats["delivered"]:,} events in {elapsed:.1f}s'))
+        self.stdout.write(f'   Upstream polls:      {polls:,} (one poller per symbol; ~{naive_polls:,.0f} with a poll per subscriber)')
+        self.stdout.write(f'   Peak subscribers:    {peak_subscribers:,}')
+        if latencies:
+            ordered = sorted(latencies)
+            self.stdout.write(
+                f'   Fetch-to-client:     median {statistics.median(ordered) * 1000:.1f}ms, '
+                f'p99 {ordered[int(len(ordered) * 0.99) - 1] * 1000:.1f}ms'
+            )
+        if fast_received:
+            self.stdout.write(f'   Events per reader:   {statistics.mean(fast_received):.1f}')
+        if slow_received:
+            self.stdout.write(f'   Events per slow one: {statistics.mean(slow_received):.1f} (intermediate ticks conflated)')
+        self.stdout.write(f'   Stalled and dropped: {stats["dropped_subscribers"]}')
+        self.stdout.write(f'   Pollers left:        {stats["symbols"]}')
+        self.stdout.write(f'   Peak RSS:            {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB')
+
+    async def _run_http(self, options):
+        """Open many SSE connections to a running server and count the events each receives"""
+        parts = urlsplit(options['url'])
+        host, port = parts.hostname, parts.port or 80
+        symbols = [symbol.strip().upper() for symbol in options['stream_symbols'].split(',') if symbol.strip()]
+        count = options['subscribers']
+        received = [0] * count
+        failures = []
+
+        async def subscribe(index):
+            path = f'/api/stream/quotes/?symbols={symbols[index % len(symbols)]}'
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError as e:
+                failures.append(str(e))
+                return
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            try:
+                status = await reader.readline()
+                if b' 200 ' not in status:
+                    failures.append(status.decode().strip())
+                    return
+                deadline = time.monotonic() + options['seconds']
+                while time.monotonic() < deadline:
+                    line = await asyncio.wait_for(reader.readline(), timeout=deadline - time.monotonic())
+                    if not line:
+                        break
+                    if line.startswith(b'event: quote'):
+                        received[index] += 1
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                writer.close()
+
+        self.stdout.write(f'📡 Opening {count} streams to {options["url"]} for {options["seconds"]:.0f}s')
+        started = time.perf_counter()
+        await asyncio.gather(*(subscribe(i) for i in range(count)))
+        elapsed = time.perf_counter() - started
+
+        connected = count - len(failures)
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'✅ {connected}/{count} streams held for {elapsed:.1f}s'))
+        self.stdout.write(f'   Events received:     {sum(received):,}')
+        if connected:
+            self.stdout.write(f'   Events per stream:   {sum(received) / connected:.1f}')
+        if failures:
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(failures)} streams failed, e.g. {failures[0]}'))
@@ -0,0 +1,131 @@
+"""
+Django management command to measure read throughput while a bulk price ingest runs
+Usage: python manage.py benchmark_read_under_ingest --readers 4 --days 20000
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, OperationalError
+from datetime import timedelta
+from decimal import Decimal
+import random
+import threading
+import time
+
+from django.utils import timezone
+
+from spcm_app.models import Stock, StockPrice
+from spcm_app.services import PRICE_FIELDS, bulk_upsert_daily_rows
+
+
+class Command(BaseCommand):
+    help = 'Load-test hot reads with and without a concurrent bulk StockPrice ingest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads')
+        parser.add_argument('--days', type=int, default=20000, help='Bars written by the ingest')
+        parser.add_argument('--baseline', type=float, default=3.0, help='Seconds of reads before the ingest starts')
+        parser.add_argument('--symbol', type=str, default='ZZLOAD', help='Scratch symbol used for the ingest')
+
+    def handle(self, *args, **options):
+        symbol = options['symbol'].upper()
+        if Stock.objects.filter(symbol=symbol).exists():
+            self.stdout.write(self.style.ERROR(f'❌ {symbol} already exists, pick another --symbol'))
+            return
+        
+        symbols = list(Stock.objects.filter(is_active=True).values_list('symbol', flat=True))
+        if not symbols:
+            self.stdout.write(self.style.ERROR('❌ No active stocks to read, load demo data first'))
+            return
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.stdout.write(f'🗄️  SQLite journal_mode={cursor.fetchone()[0]}')
+
+        stock = Stock.objects.create(symbol=symbol, name=f'{symbol} Load Test', is_active=False)
+        try:
+            self._run(stock, symbols, options)
+        finally:
+            stock.delete()
+
+    def _run(self, stock, symbols, options):
+        phase = {'name': 'baseline'}
+        stop = threading.Event()
+        results = {'baseline': [0, 0, 0.0], 'ingest': [0, 0, 0.0]}
+        results_lock = threading.Lock()
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    name = phase['name']
+                    started = time.perf_counter()
+                    try:
+                        self._read(random.choice(symbols))
+                        failed = 0
+                    except OperationalError:
+                        failed = 1
+                    elapsed = time.perf_counter() - started
+                    with results_lock:
+                        results[name][0] += 1
+                        results[name][1] += failed
+                        results[name][2] = max(results[name][2], elapsed)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=reader, daemon=True) for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+
+        self.stdout.write(f"📖 {options['readers']} readers, {options['baseline']:.0f}s baseline")
+        time.sleep(options['baseline'])
+        baseline_elapsed = options['baseline']
+
+        phase['name'] = 'ingest'
+        rows = self._generate_rows(stock, options['days'])
+        self.stdout.write(f"📥 Ingesting {len(rows)} bars for {stock.symbol}")
+        started = time.perf_counter()
+        counts = bulk_upsert_daily_rows(StockPrice, rows, PRICE_FIELDS)
+        ingest_elapsed = time.perf_counter() - started
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Ingest: {counts['inserted']} rows in {ingest_elapsed:.2f}s "
+            f"({counts['inserted'] / ingest_elapsed:.0f} rows/s)"
+        ))
+        for name, elapsed in (('baseline', baseline_elapsed), ('ingest', ingest_elapsed)):
+            reads, errors, worst = results[name]
+            style = self.style.SUCCESS if not errors else self.style.ERROR
+            self.stdout.write(style(
+                f"{name:<10} {reads / elapsed:8.0f} reads/s  worst {worst * 1000:7.1f}ms  "
+                f"{errors} locked errors"
+            ))
+
+    def _read(self, symbol):
+        """The reads behind a stock_analysis page"""
+        stock = Stock.objects.select_related('snapshot').get(symbol=symbol)
+        list(stock.prices.all()[:30])
+        list(stock.technical_indicators.all()[:1])
+        list(stock.news_articles.all()[:5])
+
+    def _generate_rows(self, stock, days):
+        """Random walk of daily bars ending today"""
+        start = timezone.now().date() - timedelta(days=days)
+        price = 100.0
+        rows = []
+        for i in range(days):
+            price = max(1.0, price * (1 + random.uniform(-0.03, 0.03)))
+            close = Decimal(str(round(price, 2)))
+            rows.append(StockPrice(
+                stock=stock,
+                date=start + timedelta(days=i),
+                open_price=close,
+                high_price=Decimal(str(round(price * 1.02, 2))),
+                low_price=Decimal(str(round(price * 0.98, 2))),
+                close_price=close,
+                volume=random.randint(1000000, 50000000),
+                adjusted_close=close,
+            ))
+        return rows
@@ -0,0 +1,46 @@
+"""
+Django management command to check a database's plans for the hot time-series queries
+Usage: python manage.py explain_hot_queries [--symbol AAPL] [--show-plans]
+
+The same checks run in the test suite (spcm_app.tests); this command runs
+them against a deployed database and its real statistics.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from spcm_app.models import Stock
+from spcm_app.queryplans import check_plan, hot_queries
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the latest-N-per-stock queries used by views and services and fail if any misses its index or sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbol', type=str, help='Stock to run the queries against (default: first stock)')
+        parser.add_argument('--show-plans', action='store_true', help='Print the full query plans')
+
+    def handle(self, *args, **options):
+        stock = Stock.objects.filter(symbol=options['symbol'].upper()) if options['symbol'] else Stock.objects
+        stock = stock.first()
+        if stock is None:
+            raise CommandError('No stocks in the database, load data before explaining queries')
+
+        self.stdout.write(f'🔍 Explaining hot queries for {stock.symbol} on {connection.vendor}')
+        self.stdout.write('')
+
+        failures = []
+        for label, queryset, expected in hot_queries(stock):
+            index, problem, plan = check_plan(queryset, expected)
+            if problem:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'❌ {label}: {problem}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ {label}: {index}, index order'))
+            if options['show_plans'] or problem:
+                for line in plan.splitlines():
+                    self.stdout.write(f'     {line}')
+
+        self.stdout.write('')
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries are not served by their index: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('🎉 All hot queries are served by their indexes in index order'))
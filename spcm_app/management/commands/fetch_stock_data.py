@@ -1,131 +1,288 @@
 """
 Django management command to fetch stock data with enhanced error handling
-Usage: python manage.py fetch_stock_data AAPL TSLA GOOGL
+Usage: python manage.py fetch_stock_data AAPL TSLA GOOGL [--workers 8]
 """
 from django.core.management.base import BaseCommand
 from spcm_app.services import StockDataService, NewsService, SentimentAnalysisService, RecommendationService
 from spcm_app.models import Stock
+from django.db import connection
+from spcm_app.providers import all_latency_stats, response_cache
+from spcm_app.leases import acquire_lease, release_lease, lease_key
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+class StageTimer:
+    """Thread-safe accumulator of per-stage wall times"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = defaultdict(list)
+    
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.durations[name].append(elapsed)
+
 class Command(BaseCommand):
     help = 'Fetch stock data, news, and generate recommendations with fallback to demo data'
 
     def add_arguments(self, parser):
         parser.add_argument('symbols', nargs='+', type=str, help='Stock symbols to fetch')
         parser.add_argument('--days', type=int, default=30, help='Number of days of historical data')
+        parser.add_argument('--full-history', action='store_true', help='Backfill the full price history available from the provider')
         parser.add_argument('--news-days', type=int, default=7, help='Number of days of news data')
         parser.add_argument('--force-demo', action='store_true', help='Force use of demo data even if API keys are available')
+        parser.add_argument('--rebuild-indicators', action='store_true', help='Recompute indicators from full history instead of appending new bars')
+        parser.add_argument('--workers', type=int, default=1, help='Number of threads fetching provider data concurrently')
 
     def handle(self, *args, **options):
-        symbols = options['symbols']
-        days = options['days']
-        news_days = options['news_days']
+        symbols = [symbol.upper() for symbol in options['symbols']]
+        self.period = 'full' if options['full_history'] else f"{options['days']}d"
+        self.news_days = options['news_days']
+        self.rebuild_indicators = options['rebuild_indicators']
         force_demo = options['force_demo']
+        workers = max(1, options['workers'])
         
         if force_demo:
             self.stdout.write(
                 self.style.WARNING('🔧 Force demo mode enabled - using demo data regardless of API keys')
             )
         
-        stock_service = StockDataService()
-        news_service = NewsService()
-        sentiment_service = SentimentAnalysisService()
-        recommendation_service = RecommendationService()
+        self.stock_service = StockDataService()
+        self.news_service = NewsService()
+        self.sentiment_service = SentimentAnalysisService()
+        self.recommendation_service = RecommendationService()
+        self.timer = StageTimer()
         
         # Check API availability
-        api_status = self._check_api_status(stock_service, news_service)
+        api_status = self._check_api_status(self.stock_service, self.news_service)
         
-        for symbol in symbols:
-            symbol = symbol.upper()
-            self.stdout.write(f"🔄 Processing {symbol}...")
-            
-            try:
-                # Temporarily disable API if force demo
-                if force_demo:
-                    stock_service.use_api = False
-                    news_service.use_api = False
-                
-                # Fetch basic stock info
-                stock = stock_service.fetch_stock_info(symbol)
-                if not stock:
-                    self.stdout.write(
-                        self.style.ERROR(f'❌ Failed to fetch stock info for {symbol}')
-                    )
-                    continue
-                
+        # Disable API if force demo
+        if force_demo:
+            self.stock_service.use_api = False
+            self.news_service.use_api = False
+        
+        started = time.perf_counter()
+        if workers > 1:
+            self._run_concurrent(symbols, workers)
+        else:
+            for symbol in symbols:
+                self._process_symbol(symbol)
+        elapsed = time.perf_counter() - started
+        
+        self.stdout.write('')
+        self.stdout.write(
+            self.style.SUCCESS(f'🏁 Finished processing {len(symbols)} stocks in {elapsed:.1f}s')
+        )
+        
+        self._show_timing_summary(elapsed)
+        
+        # Show final status
+        self._show_final_status(api_status)
+    
+    def _run_concurrent(self, symbols, workers):
+        """
+        Overlap provider requests across symbols in a thread pool.
+
+        Worker threads perform the HTTP requests; the only database work
+        they do is the rate limiter's shared budget and the response cache,
+        and each closes its connection when its symbol is done. Price,
+        news and analysis writes happen on this thread as payloads complete,
+        so SQLite sees a single bulk writer.
+        """
+        known_names = dict(Stock.objects.filter(symbol__in=symbols).values_list('symbol', 'name'))
+        outputsizes = self.stock_service.history_outputsizes(symbols, self.period)
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch') as pool:
+            futures = {
+                pool.submit(self._prefetch, symbol, known_names.get(symbol), outputsizes[symbol]): symbol
+                for symbol in symbols
+            }
+            for future in as_completed(futures):
+                self._process_symbol(futures[future], future.result())
+    
+    def _prefetch(self, symbol, known_name, outputsize):
+        """Fetch every provider payload for a symbol; runs in a worker thread"""
+        try:
+            return self._fetch_payloads(symbol, known_name, outputsize)
+        finally:
+            # The rate limiter opened this thread's connection; pool threads outlive the request cycle
+            connection.close()
+    
+    def _fetch_payloads(self, symbol, known_name, outputsize):
+        payloads = {}
+        
+        def request(key, stage, func, *args):
+            with self.timer.stage(stage):
+                try:
+                    payloads[key] = func(*args)
+                except Exception as e:
+                    payloads[key] = e
+        
+        if self.stock_service.use_api:
+            if known_name is None:
+                request('info', 'fetch: overview', self.stock_service.request_stock_info, symbol)
+            request('history', 'fetch: history', self.stock_service.request_historical_data,
+                    symbol, outputsize)
+        
+        if self.news_service.use_api:
+            name = known_name
+            if name is None:
+                info = payloads.get('info')
+                name = info.get('Name') if isinstance(info, dict) else None
+            request('news', 'fetch: news', self.news_service.request_stock_news,
+                    symbol, name or f'{symbol} Corporation', self.news_days)
+        
+        return payloads
+    
+    def _process_symbol(self, symbol, payloads=None):
+        """Run the ingestion pipeline for one symbol, using prefetched payloads when given"""
+        payloads = payloads or {}
+        self.stdout.write(f"🔄 Processing {symbol}...")
+        
+        try:
+            # Fetch basic stock info
+            with self.timer.stage('stock info'):
+                stock = self.stock_service.fetch_stock_info(symbol, payload=payloads.get('info'))
+            if not stock:
                 self.stdout.write(
-                    self.style.SUCCESS(f'✅ Stock info: {stock.name}')
+                    self.style.ERROR(f'❌ Failed to fetch stock info for {symbol}')
                 )
-                
-                # Fetch historical price data
-                if stock_service.fetch_historical_data(symbol, period=f'{days}d'):
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✅ Historical data for {symbol}')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f'⚠️  Historical data limited for {symbol}')
-                    )
-                
-                # Calculate technical indicators
-                if stock_service.calculate_technical_indicators(symbol):
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✅ Technical indicators for {symbol}')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f'⚠️  Technical indicators limited for {symbol}')
-                    )
-                
-                # Fetch news data
-                if news_service.fetch_stock_news(symbol, days=news_days):
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✅ News data for {symbol}')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f'⚠️  News data limited for {symbol}')
-                    )
-                
-                # Calculate sentiment
-                if sentiment_service.calculate_daily_sentiment(symbol):
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✅ Sentiment analysis for {symbol}')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f'⚠️  Sentiment analysis limited for {symbol}')
-                    )
-                
-                # Generate recommendation
-                if recommendation_service.generate_recommendation(symbol):
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✅ AI recommendation for {symbol}')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f'⚠️  Recommendation limited for {symbol}')
-                    )
-                
+                return
+            
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ Stock info: {stock.name}')
+            )
+            
+            # Skip symbols a web request or refresh worker is already refreshing
+            key = lease_key('refresh', symbol)
+            owner = acquire_lease(key)
+            if owner is None:
                 self.stdout.write(
-                    self.style.SUCCESS(f'🎉 Completed processing {symbol}')
+                    self.style.WARNING(f'⏭️  {symbol} is being refreshed by another process, skipping')
                 )
-                
-            except Exception as e:
+                return
+            try:
+                self._run_pipeline(symbol, stock, payloads)
+            finally:
+                release_lease(key, owner)
+            
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'💥 Error processing {symbol}: {str(e)}')
+            )
+            logger.error(f"Error processing {symbol}: {e}")
+    
+    def _run_pipeline(self, symbol, stock, payloads):
+        """Run the history, indicator, news, sentiment and recommendation steps"""
+        stock_service = self.stock_service
+        news_service = self.news_service
+        
+        # Fetch historical price data
+        with self.timer.stage('history'):
+            ok = stock_service.fetch_historical_data(
+                symbol, period=self.period, payload=payloads.get('history')
+            )
+        if ok:
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ Historical data for {symbol}')
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  Historical data limited for {symbol}')
+            )
+        
+        # Calculate technical indicators
+        with self.timer.stage('indicators'):
+            ok = stock_service.calculate_technical_indicators(symbol, rebuild=self.rebuild_indicators)
+        if ok:
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ Technical indicators for {symbol}')
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  Technical indicators limited for {symbol}')
+            )
+        
+        # Fetch news data
+        with self.timer.stage('news'):
+            ok = news_service.fetch_stock_news(symbol, days=self.news_days, payload=payloads.get('news'))
+        if ok:
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ News data for {symbol}')
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  News data limited for {symbol}')
+            )
+        
+        # Calculate sentiment
+        with self.timer.stage('sentiment'):
+            ok = self.sentiment_service.calculate_daily_sentiment(symbol)
+        if ok:
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ Sentiment analysis for {symbol}')
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  Sentiment analysis limited for {symbol}')
+            )
+        
+        # Generate recommendation
+        with self.timer.stage('recommendation'):
+            ok = self.recommendation_service.generate_recommendation(symbol)
+        if ok:
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ AI recommendation for {symbol}')
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  Recommendation limited for {symbol}')
+            )
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'🎉 Completed processing {symbol}')
+        )
+    
+    def _show_timing_summary(self, elapsed):
+        """Show per-stage timing totals"""
+        self.stdout.write('')
+        self.stdout.write('⏱️  Stage timings:')
+        self.stdout.write(f"   {'stage':<18}{'calls':>7}{'total':>10}{'avg':>10}{'max':>10}")
+        for name, durations in self.timer.durations.items():
+            self.stdout.write(
+                f"   {name:<18}{len(durations):>7}{sum(durations):>9.2f}s"
+                f"{sum(durations) / len(durations):>9.3f}s{max(durations):>9.3f}s"
+            )
+        self.stdout.write(f"   {'wall time':<18}{'':>7}{elapsed:>9.2f}s")
+        
+        for provider, endpoints in all_latency_stats().items():
+            for endpoint, stats in endpoints.items():
+                if not stats['count']:
+                    continue
+                buckets = ', '.join(f'{label}: {count}' for label, count in stats['histogram'].items() if count)
                 self.stdout.write(
-                    self.style.ERROR(f'💥 Error processing {symbol}: {str(e)}')
+                    f"   {provider} {endpoint}: {stats['count']} calls, {stats['errors']} errors, "
+                    f"avg {stats['avg_seconds']:.3f}s ({buckets})"
                 )
-                logger.error(f"Error processing {symbol}: {e}")
         
-        self.stdout.write('')
+        cache_stats = response_cache.stats()
         self.stdout.write(
-            self.style.SUCCESS(f'🏁 Finished processing {len(symbols)} stocks')
+            f"   response cache: {cache_stats['memory_hits']} memory hits, "
+            f"{cache_stats['shared_hits']} shared hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate)"
         )
-        
-        # Show final status
-        self._show_final_status(api_status)
     
     def _check_api_status(self, stock_service, news_service):
         """Check API availability status"""
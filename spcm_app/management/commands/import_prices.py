@@ -0,0 +1,76 @@
+"""
+Django management command to bulk-load historical OHLCV from CSV or Parquet dumps
+Usage: python manage.py import_prices dump.csv [more.parquet ...] [--config mapping.json] [--chunk-size 200000] [--batch-size 5000]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from pathlib import Path
+import resource
+import time
+
+from spcm_app.importers import PriceImporter, file_format, iter_chunks, load_import_config, normalize_chunk
+
+
+class Command(BaseCommand):
+    help = 'Stream vendor end-of-day CSV/Parquet files into StockPrice with batched upserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', type=str, help='CSV or Parquet files to import')
+        parser.add_argument('--config', type=str, help='JSON file mapping import columns to file headers')
+        parser.add_argument('--chunk-size', type=int, default=200000, help='Rows read and written per chunk')
+        parser.add_argument('--batch-size', type=int, help='Rows per upsert transaction (default: DB_WRITE_BATCH_SIZE)')
+        parser.add_argument('--no-create', action='store_true', help='Skip rows of symbols without a Stock instead of creating it')
+        parser.add_argument('--no-sync', action='store_true', help='Skip the price store and snapshot refresh after loading')
+
+    def handle(self, *args, **options):
+        paths = [Path(name) for name in options['files']]
+        try:
+            config = load_import_config(options['config'])
+            for path in paths:
+                if not path.exists():
+                    raise ValueError(f'{path} does not exist')
+                file_format(path)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        importer = PriceImporter(create_missing=not options['no_create'], batch_size=options['batch_size'])
+        chunk_size = max(1, options['chunk_size'])
+        self.read = self.written = self.dropped = 0
+        self.started = time.perf_counter()
+
+        for path in paths:
+            self.stdout.write(f'📥 Importing {path}')
+            try:
+                for chunk in iter_chunks(path, config, chunk_size):
+                    frame, dropped = normalize_chunk(chunk, config)
+                    self.read += len(chunk)
+                    self.dropped += dropped
+                    self.written += importer.import_chunk(frame)
+                    self._progress()
+            except (ImportError, KeyError, ValueError) as e:
+                raise CommandError(f'Import of {path} failed: {e}')
+
+        load_seconds = time.perf_counter() - self.started
+        self.stdout.write('')
+        self.stdout.write(f'🔧 Updating price ranges and derived data for {len(importer.ranges)} stocks...')
+        importer.finish(sync=not options['no_sync'])
+        total = time.perf_counter() - self.started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Imported {self.written:,} price rows for {len(importer.ranges)} stocks in {total:.1f}s'
+        ))
+        self.stdout.write(f'   Load:             {load_seconds:.1f}s  ({self.written / max(load_seconds, 1e-9):,.0f} rows/s)')
+        self.stdout.write(f'   Stocks created:   {importer.created}')
+        self.stdout.write(f'   Rows dropped:     {self.dropped:,} invalid or duplicate')
+        if importer.unknown:
+            sample = ', '.join(sorted(importer.unknown)[:10])
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  Skipped {len(importer.unknown)} unknown symbols: {sample}'
+            ))
+
+    def _progress(self):
+        elapsed = time.perf_counter() - self.started
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            f'   {self.read:>12,} read  {self.written:>12,} written  '
+            f'{self.written / max(elapsed, 1e-9):>9,.0f} rows/s  peak RSS {peak_mb:,.0f} MB'
+        )
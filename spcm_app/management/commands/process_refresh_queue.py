@@ -0,0 +1,30 @@
+"""
+Django management command to run queued background stock refreshes
+Usage: python manage.py process_refresh_queue [--once]
+"""
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+
+from spcm_app.refresh import process_queue
+
+
+class Command(BaseCommand):
+    help = 'Process queued stock refresh jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Refresh worker started')
+        
+        while True:
+            close_old_connections()
+            processed = process_queue()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'✅ Processed {processed} refresh jobs'))
+            
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
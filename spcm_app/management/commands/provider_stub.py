@@ -0,0 +1,133 @@
+"""
+Django management command to run a local stand-in for Alpha Vantage and NewsAPI
+Usage: python manage.py provider_stub --port 8765 --latency 1.0
+Then: ALPHA_VANTAGE_BASE_URL=http://127.0.0.1:8765/query NEWS_API_BASE_URL=http://127.0.0.1:8765/v2/everything
+"""
+from django.core.management.base import BaseCommand
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import json
+import random
+import threading
+import time
+
+
+def _global_quote(symbol):
+    price = round(random.uniform(50, 500), 2)
+    change = round(price * random.uniform(-0.03, 0.03), 2)
+    return {'Global Quote': {
+        '01. symbol': symbol,
+        '05. price': f'{price:.4f}',
+        '06. volume': str(random.randint(10 ** 6, 10 ** 8)),
+        '07. latest trading day': date.today().isoformat(),
+        '09. change': f'{change:.4f}',
+        '10. change percent': f'{change / price * 100:.4f}%',
+    }}
+
+
+def _time_series(symbol, outputsize):
+    bars = 100 if outputsize == 'compact' else 1000
+    series = {}
+    day = date.today()
+    price = random.uniform(50, 500)
+    while len(series) < bars:
+        if day.weekday() < 5:
+            price *= 1 + random.uniform(-0.02, 0.02)
+            series[day.isoformat()] = {
+                '1. open': f'{price * 0.99:.4f}',
+                '2. high': f'{price * 1.01:.4f}',
+                '3. low': f'{price * 0.98:.4f}',
+                '4. close': f'{price:.4f}',
+                '5. volume': str(random.randint(10 ** 6, 10 ** 8)),
+            }
+        day -= timedelta(days=1)
+    size = 'Compact' if outputsize == 'compact' else 'Full size'
+    return {'Meta Data': {'2. Symbol': symbol, '4. Output Size': size}, 'Time Series (Daily)': series}
+
+
+def _overview(symbol):
+    return {'Symbol': symbol, 'Name': f'{symbol} Stub Corp', 'Sector': 'Technology',
+            'Industry': 'Software', 'MarketCapitalization': '1000000000'}
+
+
+def _news(query):
+    symbol = query.split(' ')[0]
+    now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    return {'status': 'ok', 'totalResults': 3, 'articles': [
+        {
+            'title': f'{symbol} stub headline {i}',
+            'description': 'Shares moved on strong results and upbeat guidance.',
+            'content': 'Stub article body.',
+            'url': f'https://stub.invalid/{symbol}/{i}',
+            'author': 'Stub',
+            'source': {'name': 'Reuters'},
+            'publishedAt': now,
+        }
+        for i in range(3)
+    ]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers provider requests with generated payloads after ``server.latency`` seconds"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        time.sleep(self.server.latency)
+
+        if url.path.endswith('/everything'):
+            body = _news(params.get('q', 'STUB'))
+        else:
+            symbol = params.get('symbol', 'STUB').upper()
+            function = params.get('function')
+            if function == 'GLOBAL_QUOTE':
+                body = _global_quote(symbol)
+            elif function == 'TIME_SERIES_DAILY':
+                body = _time_series(symbol, params.get('outputsize', 'compact'))
+            elif function == 'OVERVIEW':
+                body = _overview(symbol)
+            else:
+                body = {'Error Message': f'Unknown function {function}'}
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, latency=1.0):
+    """Serve the stub from a daemon thread; returns the server (``server.server_port`` has the port)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, name='provider-stub', daemon=True).start()
+    return server
+
+
+class Command(BaseCommand):
+    help = 'Serve fake Alpha Vantage and NewsAPI responses with a fixed latency for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+        parser.add_argument('--latency', type=float, default=1.0, help='Seconds every response is delayed')
+
+    def handle(self, *args, **options):
+        server = start_stub_server(options['port'], options['latency'])
+        base = f'http://127.0.0.1:{server.server_port}'
+        self.stdout.write(self.style.SUCCESS(f'🧪 Provider stub on {base} ({options["latency"]}s latency)'))
+        self.stdout.write(f'   ALPHA_VANTAGE_BASE_URL={base}/query')
+        self.stdout.write(f'   NEWS_API_BASE_URL={base}/v2/everything')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+            self.stdout.write('👋 Stub stopped')
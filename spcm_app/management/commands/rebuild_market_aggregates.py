@@ -0,0 +1,38 @@
+"""
+Django management command to rebuild the per-day market and sector aggregates
+Usage: python manage.py rebuild_market_aggregates [--days 365 | --start 2024-01-01 --end 2024-12-31]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import date, timedelta
+import time
+
+from spcm_app.aggregates import rebuild_market_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute MarketDailyAggregate rows from sentiment, recommendation and price data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Rebuild only the last N days')
+        parser.add_argument('--start', type=str, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        if options['days']:
+            end = end or timezone.now().date()
+            start = end - timedelta(days=options['days'] - 1)
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end')
+
+        started = time.perf_counter()
+        rows = rebuild_market_aggregates(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt {rows} market aggregate rows in {time.perf_counter() - started:.2f}s'
+        ))
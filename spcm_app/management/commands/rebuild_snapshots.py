@@ -0,0 +1,19 @@
+"""
+Django management command to rebuild the denormalized stock snapshots
+Usage: python manage.py rebuild_snapshots [AAPL TSLA ...]
+"""
+from django.core.management.base import BaseCommand
+
+from spcm_app.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Recompute StockSnapshot rows from the latest price, indicator, sentiment and recommendation data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', type=str, help='Stock symbols to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        symbols = [symbol.upper() for symbol in options['symbols']]
+        count = rebuild_snapshots(symbols or None)
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {count} stock snapshots'))
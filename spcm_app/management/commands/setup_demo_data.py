@@ -12,6 +12,7 @@ from spcm_app.models import (
     Stock, StockPrice, TechnicalIndicator, NewsArticle, 
     SentimentData, StockRecommendation
 )
+from spcm_app.aggregates import rebuild_market_aggregates
 
 class Command(BaseCommand):
     help = 'Set up demo data for SPCM without requiring external APIs'
@@ -66,6 +67,9 @@ class Command(BaseCommand):
         for stock_data in demo_stocks:
             self.create_stock_data(stock_data)
         
+        rows = rebuild_market_aggregates()
+        self.stdout.write(f"Aggregated {rows} market/sector day rows")
+        
         self.stdout.write(
             self.style.SUCCESS('✅ Demo data setup completed successfully!')
         )
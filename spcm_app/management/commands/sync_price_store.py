@@ -0,0 +1,28 @@
+"""
+Django management command to rebuild the columnar price store from StockPrice
+Usage: python manage.py sync_price_store [AAPL TSLA ...]
+"""
+from django.core.management.base import BaseCommand
+import time
+
+from spcm_app import pricestore
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the per-symbol .npy price files from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', type=str, help='Stock symbols to sync (default: all)')
+
+    def handle(self, *args, **options):
+        if not pricestore.store_enabled():
+            self.stdout.write(self.style.WARNING('⚠️  PRICE_STORE_ENABLED is off, nothing to sync'))
+            return
+
+        symbols = [symbol.upper() for symbol in options['symbols']]
+        started = time.perf_counter()
+        count = pricestore.sync_all(symbols or None)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Synced {count} price files to {pricestore.store_dir()} in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0002_indicatorstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderBudget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=50, unique=True)),
+                ('tokens', models.FloatField(default=0)),
+                ('refilled_at', models.DateTimeField()),
+                ('day', models.DateField()),
+                ('day_calls', models.IntegerField(default=0)),
+                ('blocked_until', models.DateTimeField(blank=True, null=True)),
+                ('version', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+from decimal import Decimal
+
+
+def backfill_snapshots(apps, schema_editor):
+    """Build a snapshot for every existing stock from its latest rows"""
+    Stock = apps.get_model('spcm_app', 'Stock')
+    StockPrice = apps.get_model('spcm_app', 'StockPrice')
+    TechnicalIndicator = apps.get_model('spcm_app', 'TechnicalIndicator')
+    SentimentData = apps.get_model('spcm_app', 'SentimentData')
+    StockRecommendation = apps.get_model('spcm_app', 'StockRecommendation')
+    StockSnapshot = apps.get_model('spcm_app', 'StockSnapshot')
+
+    for stock in Stock.objects.all().iterator():
+        snapshot = StockSnapshot(stock=stock)
+
+        prices = list(StockPrice.objects.filter(stock=stock).order_by('-date')[:2])
+        if prices:
+            previous = prices[1].close_price if len(prices) > 1 else prices[0].close_price
+            snapshot.price_date = prices[0].date
+            snapshot.close_price = prices[0].close_price
+            snapshot.previous_close = previous
+            snapshot.change = prices[0].close_price - previous
+            snapshot.change_percent = (
+                (snapshot.change / previous * 100) if previous else Decimal('0')
+            ).quantize(Decimal('0.01'))
+            snapshot.volume = prices[0].volume
+
+        indicator = TechnicalIndicator.objects.filter(stock=stock).order_by('-date').first()
+        if indicator:
+            snapshot.indicator_date = indicator.date
+            snapshot.rsi = indicator.rsi
+            snapshot.sma_20 = indicator.sma_20
+            snapshot.sma_50 = indicator.sma_50
+            snapshot.macd = indicator.macd
+
+        sentiment = SentimentData.objects.filter(stock=stock).order_by('-date').first()
+        if sentiment:
+            snapshot.sentiment_date = sentiment.date
+            snapshot.overall_sentiment = sentiment.overall_sentiment
+            snapshot.news_sentiment = sentiment.news_sentiment
+
+        recommendation = StockRecommendation.objects.filter(stock=stock).order_by('-date').first()
+        if recommendation:
+            snapshot.recommendation_date = recommendation.date
+            snapshot.recommendation = recommendation.recommendation
+            snapshot.confidence_score = recommendation.confidence_score
+            snapshot.risk_level = recommendation.risk_level
+            snapshot.target_price = recommendation.target_price
+
+        snapshot.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0005_refreshlease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_date', models.DateField(blank=True, null=True)),
+                ('close_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('previous_close', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('change', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('change_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('volume', models.BigIntegerField(blank=True, null=True)),
+                ('indicator_date', models.DateField(blank=True, null=True)),
+                ('rsi', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('sma_20', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('sma_50', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('macd', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True)),
+                ('sentiment_date', models.DateField(blank=True, null=True)),
+                ('overall_sentiment', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('news_sentiment', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('recommendation_date', models.DateField(blank=True, null=True)),
+                ('recommendation', models.CharField(blank=True, max_length=4)),
+                ('confidence_score', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('risk_level', models.CharField(blank=True, max_length=10)),
+                ('target_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='spcm_app.stock')),
+            ],
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
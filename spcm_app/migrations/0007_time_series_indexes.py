@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0006_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newsarticle',
+            index=models.Index(fields=['stock', '-published_at'], name='news_stock_published_desc'),
+        ),
+        migrations.AddIndex(
+            model_name='sentimentdata',
+            index=models.Index(fields=['stock', '-date'], name='sentiment_stock_date_desc'),
+        ),
+        migrations.AddIndex(
+            model_name='stockprice',
+            index=models.Index(fields=['stock', '-date', 'close_price', 'volume'], name='price_stock_date_close_vol'),
+        ),
+        migrations.AddIndex(
+            model_name='stockrecommendation',
+            index=models.Index(fields=['stock', '-date'], name='recommendation_stock_date_desc'),
+        ),
+        migrations.AddIndex(
+            model_name='technicalindicator',
+            index=models.Index(fields=['stock', '-date'], name='indicator_stock_date_desc'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0007_time_series_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='technicalindicator',
+            name='atr',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='technicalindicator',
+            name='obv',
+            field=models.DecimalField(blank=True, decimal_places=0, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='technicalindicator',
+            name='stoch_d',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='technicalindicator',
+            name='stoch_k',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='technicalindicator',
+            name='vwap',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:31
+
+from django.db import migrations, models
+from django.db.models import Max, Min
+import django.db.models.deletion
+
+
+def backfill_price_history(apps, schema_editor):
+    """Record the stored price range of every stock that already has bars"""
+    StockPrice = apps.get_model('spcm_app', 'StockPrice')
+    PriceHistoryState = apps.get_model('spcm_app', 'PriceHistoryState')
+
+    ranges = StockPrice.objects.values('stock_id').annotate(first=Min('date'), last=Max('date'))
+    PriceHistoryState.objects.bulk_create([
+        PriceHistoryState(stock_id=row['stock_id'], first_date=row['first'], last_date=row['last'])
+        for row in ranges
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0008_indicator_range_volume_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistoryState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_date', models.DateField()),
+                ('last_date', models.DateField()),
+                ('complete', models.BooleanField(default=False)),
+                ('last_fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('last_outputsize', models.CharField(blank=True, choices=[('compact', 'Compact'), ('full', 'Full')], max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='spcm_app.stock')),
+            ],
+        ),
+        migrations.RunPython(backfill_price_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0009_pricehistorystate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketDailyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sector', models.CharField(blank=True, max_length=100)),
+                ('sentiment_stocks', models.IntegerField(default=0)),
+                ('avg_sentiment', models.DecimalField(blank=True, decimal_places=4, max_digits=5, null=True)),
+                ('weighted_sentiment', models.DecimalField(blank=True, decimal_places=4, max_digits=5, null=True)),
+                ('total_mentions', models.IntegerField(default=0)),
+                ('buy_count', models.IntegerField(default=0)),
+                ('hold_count', models.IntegerField(default=0)),
+                ('sell_count', models.IntegerField(default=0)),
+                ('advancers', models.IntegerField(default=0)),
+                ('decliners', models.IntegerField(default=0)),
+                ('unchanged', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date', 'sector'],
+                'unique_together': {('date', 'sector')},
+            },
+        ),
+    ]
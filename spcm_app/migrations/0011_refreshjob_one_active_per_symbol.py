@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:07
+
+from django.db import migrations, models
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    """Keep the oldest pending/running job per symbol; earlier races may have queued more"""
+    RefreshJob = apps.get_model('spcm_app', 'RefreshJob')
+    seen = set()
+    duplicates = []
+    for pk, symbol in RefreshJob.objects.filter(
+        status__in=['PENDING', 'RUNNING']
+    ).order_by('requested_at').values_list('pk', 'symbol'):
+        if symbol in seen:
+            duplicates.append(pk)
+        seen.add(symbol)
+    RefreshJob.objects.filter(pk__in=duplicates).update(status='FAILED', error='Duplicate of an active job')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0010_marketdailyaggregate'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='refreshjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['PENDING', 'RUNNING'])), fields=('symbol',), name='refreshjob_one_active_per_symbol'),
+        ),
+    ]
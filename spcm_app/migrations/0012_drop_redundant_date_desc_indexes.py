@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0011_refreshjob_one_active_per_symbol'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='sentimentdata',
+            name='sentiment_stock_date_desc',
+        ),
+        migrations.RemoveIndex(
+            model_name='stockrecommendation',
+            name='recommendation_stock_date_desc',
+        ),
+        migrations.RemoveIndex(
+            model_name='technicalindicator',
+            name='indicator_stock_date_desc',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+def count_stored_bars(apps, schema_editor):
+    PriceHistoryState = apps.get_model('spcm_app', 'PriceHistoryState')
+    StockPrice = apps.get_model('spcm_app', 'StockPrice')
+    counts = dict(
+        StockPrice.objects.order_by().values('stock_id').annotate(
+            count=models.Count('id')
+        ).values_list('stock_id', 'count')
+    )
+    histories = list(PriceHistoryState.objects.all())
+    for history in histories:
+        history.bar_count = counts.get(history.stock_id, 0)
+    PriceHistoryState.objects.bulk_update(histories, ['bar_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0012_drop_redundant_date_desc_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricehistorystate',
+            name='bar_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_stored_bars, migrations.RunPython.noop),
+    ]
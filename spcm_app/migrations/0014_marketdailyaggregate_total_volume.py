@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:12
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def sum_stored_volume(apps, schema_editor):
+    """Fill total_volume of the aggregate rows that already exist"""
+    MarketDailyAggregate = apps.get_model('spcm_app', 'MarketDailyAggregate')
+    StockPrice = apps.get_model('spcm_app', 'StockPrice')
+    volumes = defaultdict(int)
+    for row in StockPrice.objects.order_by().values('date', 'stock__sector').annotate(
+        volume=models.Sum('volume')
+    ):
+        volumes[(row['date'], row['stock__sector'] or 'Unclassified')] += row['volume'] or 0
+        volumes[(row['date'], '')] += row['volume'] or 0
+
+    aggregates = list(MarketDailyAggregate.objects.all())
+    for aggregate in aggregates:
+        aggregate.total_volume = volumes.get((aggregate.date, aggregate.sector), 0)
+    MarketDailyAggregate.objects.bulk_update(aggregates, ['total_volume'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0013_pricehistorystate_bar_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketdailyaggregate',
+            name='total_volume',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(sum_stored_volume, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def backfill_market_aggregates(apps, schema_editor):
+    """
+    Aggregate the data stored before MarketDailyAggregate existed.
+
+    Price writes adjust existing rows by deltas, so every day with data
+    needs a complete row to start from.
+    """
+    from spcm_app.aggregates import rebuild_market_aggregates
+
+    rebuild_market_aggregates()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0014_marketdailyaggregate_total_volume'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_market_aggregates, migrations.RunPython.noop),
+    ]
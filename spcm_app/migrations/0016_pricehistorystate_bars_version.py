@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spcm_app', '0015_backfill_marketdailyaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricehistorystate',
+            name='bars_version',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
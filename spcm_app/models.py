@@ -38,6 +38,11 @@ class StockPrice(models.Model):
     class Meta:
         unique_together = ['stock', 'date']
         ordering = ['-date']
+        indexes = [
+            # Latest-N reads for one stock; close and volume ride along so
+            # chart and quote reads are answered from the index alone
+            models.Index(fields=['stock', '-date', 'close_price', 'volume'], name='price_stock_date_close_vol'),
+        ]
 
     def __str__(self):
         return f"{self.stock.symbol} - {self.date}"
@@ -56,11 +61,59 @@ class TechnicalIndicator(models.Model):
     macd_signal = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
     bollinger_upper = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     bollinger_lower = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    # Range and volume based indicators
+    atr = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    obv = models.DecimalField(max_digits=20, decimal_places=0, null=True, blank=True)
+    stoch_k = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    stoch_d = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    vwap = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
     class Meta:
+        # The unique (stock, date) index also serves latest-first reads by scanning backwards
         unique_together = ['stock', 'date']
         ordering = ['-date']
 
+class IndicatorState(models.Model):
+    """Rolling indicator state used to append new bars without a full recompute"""
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, related_name='indicator_state')
+    last_date = models.DateField()
+    last_close = models.DecimalField(max_digits=10, decimal_places=2)
+    bar_count = models.IntegerField(default=0)
+    
+    # Recursive indicator values keyed by indicators.STATE_KEYS: last close, EMA 12/26,
+    # the MACD signal EMA, Wilder RSI averages and OBV; window indicators re-read bars
+    state = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.symbol} - through {self.last_date}"
+
+class PriceHistoryState(models.Model):
+    """Stored price range of a stock, used to fetch and write only missing bars"""
+    COMPACT = 'compact'
+    FULL = 'full'
+    OUTPUTSIZE_CHOICES = [
+        (COMPACT, 'Compact'),
+        (FULL, 'Full'),
+    ]
+
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, related_name='price_history')
+    first_date = models.DateField()
+    last_date = models.DateField()
+    # Stored bars and a token replaced on every bar write; the price store
+    # checks both before serving a node's local file
+    bar_count = models.PositiveIntegerField(default=0)
+    bars_version = models.CharField(max_length=32, blank=True)
+    # True once a full-history fetch was stored, so first_date is the provider's earliest bar
+    complete = models.BooleanField(default=False)
+    last_fetched_at = models.DateTimeField(null=True, blank=True)
+    last_outputsize = models.CharField(max_length=10, choices=OUTPUTSIZE_CHOICES, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.symbol} - {self.first_date} to {self.last_date}"
+
 class NewsArticle(models.Model):
     """News articles related to stocks"""
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='news_articles')
@@ -86,6 +139,9 @@ class NewsArticle(models.Model):
     class Meta:
         ordering = ['-published_at']
         unique_together = ['url', 'stock']
+        indexes = [
+            models.Index(fields=['stock', '-published_at'], name='news_stock_published_desc'),
+        ]
 
     def __str__(self):
         return f"{self.stock.symbol} - {self.title[:50]}"
@@ -119,6 +175,7 @@ class SentimentData(models.Model):
     trending_keywords = models.JSONField(default=list)
 
     class Meta:
+        # The unique (stock, date) index also serves latest-first reads by scanning backwards
         unique_together = ['stock', 'date']
         ordering = ['-date']
 
@@ -161,12 +218,147 @@ class StockRecommendation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        # The unique (stock, date) index also serves latest-first reads by scanning backwards
         unique_together = ['stock', 'date']
         ordering = ['-date']
 
     def __str__(self):
         return f"{self.stock.symbol} - {self.recommendation} ({self.confidence_score}%)"
 
+class StockSnapshot(models.Model):
+    """Latest price, indicator, sentiment and recommendation values for a stock"""
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, related_name='snapshot')
+    
+    # Price
+    price_date = models.DateField(null=True, blank=True)
+    close_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    previous_close = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    change = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    change_percent = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    volume = models.BigIntegerField(null=True, blank=True)
+    
+    # Technical indicators
+    indicator_date = models.DateField(null=True, blank=True)
+    rsi = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    sma_20 = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    sma_50 = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    macd = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    
+    # Sentiment
+    sentiment_date = models.DateField(null=True, blank=True)
+    overall_sentiment = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+    news_sentiment = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+    
+    # Recommendation
+    recommendation_date = models.DateField(null=True, blank=True)
+    recommendation = models.CharField(max_length=4, blank=True)
+    confidence_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    risk_level = models.CharField(max_length=10, blank=True)
+    target_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.symbol} - as of {self.price_date}"
+
+class MarketDailyAggregate(models.Model):
+    """Per-day market rollup of sentiment, recommendations and price moves, overall and per sector"""
+    # Sector value of the whole-market row
+    MARKET = ''
+    # Sector of stocks without one
+    UNCLASSIFIED = 'Unclassified'
+
+    date = models.DateField()
+    sector = models.CharField(max_length=100, blank=True)
+
+    # Sentiment; weighted_sentiment weights each stock by its news mentions
+    sentiment_stocks = models.IntegerField(default=0)
+    avg_sentiment = models.DecimalField(max_digits=5, decimal_places=4, null=True, blank=True)
+    weighted_sentiment = models.DecimalField(max_digits=5, decimal_places=4, null=True, blank=True)
+    total_mentions = models.IntegerField(default=0)
+
+    # Recommendations
+    buy_count = models.IntegerField(default=0)
+    hold_count = models.IntegerField(default=0)
+    sell_count = models.IntegerField(default=0)
+
+    # Close against the stock's previous bar
+    advancers = models.IntegerField(default=0)
+    decliners = models.IntegerField(default=0)
+    unchanged = models.IntegerField(default=0)
+    total_volume = models.BigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['date', 'sector']
+        ordering = ['-date', 'sector']
+
+    def __str__(self):
+        return f"{self.sector or 'Market'} - {self.date}"
+
+class ProviderBudget(models.Model):
+    """Shared call budget for an external data provider"""
+    provider = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField(default=0)
+    refilled_at = models.DateTimeField()
+    day = models.DateField()
+    day_calls = models.IntegerField(default=0)
+    blocked_until = models.DateTimeField(null=True, blank=True)
+    version = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.provider} - {self.day_calls} calls on {self.day}"
+
+class RefreshJob(models.Model):
+    """Queued background refresh of a stock's data pipeline"""
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    symbol = models.CharField(max_length=10, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-requested_at']
+        constraints = [
+            # At most one pending or running job per symbol
+            models.UniqueConstraint(
+                fields=['symbol'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING']),
+                name='refreshjob_one_active_per_symbol',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} - {self.status}"
+
+    @property
+    def is_active(self):
+        return self.status in (self.PENDING, self.RUNNING)
+
+class RefreshLease(models.Model):
+    """Short-lived lease giving one caller exclusive rights to refresh a stock stage"""
+    key = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=32)
+    acquired_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} until {self.expires_at}"
+
 class Portfolio(models.Model):
     """User portfolio model"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='portfolios')
@@ -176,6 +368,9 @@ class Portfolio(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Filled in by PortfolioValuationService to avoid per-portfolio queries
+    valuation = None
+
     class Meta:
         ordering = ['-created_at']
 
@@ -185,13 +380,24 @@ class Portfolio(models.Model):
     @property
     def total_value(self):
         """Calculate total portfolio value"""
+        if self.valuation is not None:
+            return self.valuation['total_value']
         return sum(position.current_value for position in self.positions.all())
 
     @property
     def total_gain_loss(self):
         """Calculate total gain/loss"""
+        if self.valuation is not None:
+            return self.valuation['total_gain_loss']
         return sum(position.gain_loss for position in self.positions.all())
 
+    @property
+    def position_count(self):
+        """Number of positions in the portfolio"""
+        if self.valuation is not None:
+            return self.valuation['position_count']
+        return self.positions.count()
+
 class PortfolioPosition(models.Model):
     """Individual stock positions in a portfolio"""
     portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='positions')
@@ -211,6 +417,9 @@ class PortfolioPosition(models.Model):
     @property
     def current_price(self):
         """Get current stock price"""
+        # Annotated by PortfolioValuationService
+        if 'latest_close' in self.__dict__:
+            return self.latest_close
         latest_price = self.stock.prices.first()
         return latest_price.close_price if latest_price else self.average_price
 
@@ -0,0 +1,196 @@
+"""
+SPCM Columnar Price Store - per-symbol NumPy files kept in sync with StockPrice
+"""
+from pathlib import Path
+import logging
+import os
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .models import Stock, StockPrice, PriceHistoryState
+
+logger = logging.getLogger(__name__)
+
+# Row order of the per-symbol array; dates are stored as days since 1970-01-01
+COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+_SOURCE_FIELDS = {
+    'open': 'open_price',
+    'high': 'high_price',
+    'low': 'low_price',
+    'close': 'close_price',
+    'volume': 'volume',
+}
+
+
+def store_enabled():
+    return getattr(settings, 'PRICE_STORE_ENABLED', True)
+
+
+def store_dir():
+    return Path(settings.PRICE_STORE_DIR)
+
+
+def store_path(symbol):
+    return store_dir() / f'{symbol.upper()}.npy'
+
+
+def version_path(symbol):
+    """Sidecar holding the PriceHistoryState.bars_version the price file was built from"""
+    return store_dir() / f'{symbol.upper()}.version'
+
+
+def _replace_file(path, write, suffix):
+    """Write a file next to ``path`` and swap it in, so readers never see a partial file"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.stem}-', suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            write(handle)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def price_rows(stock):
+    """A stock's bars in date order as (date, open, high, low, close, volume) floats, cast in SQL"""
+    return StockPrice.objects.filter(stock=stock).order_by('date').annotate(
+        **{f'{name}_f': Cast(field, FloatField()) for name, field in _SOURCE_FIELDS.items()}
+    ).values_list('date', *(f'{name}_f' for name in _SOURCE_FIELDS))
+
+
+def _read_from_db(stock):
+    """Read a stock's full history as one float64 array, cast in SQL rather than via Decimal"""
+    rows = list(price_rows(stock))
+
+    data = np.empty((len(COLUMNS), len(rows)), dtype=np.float64)
+    if rows:
+        dates, *values = zip(*rows)
+        data[0] = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+        data[1:] = np.array(values, dtype=np.float64)
+    return data
+
+
+def sync_stock(stock):
+    """
+    Rewrite a stock's price file and its version sidecar from the database.
+
+    The file is written next to the old one and swapped in with
+    ``os.replace`` so concurrent readers see either the old or the new
+    history, never a partial file. The version is read before the bars and
+    its sidecar is replaced after the file, so a sidecar never claims a
+    newer version than the file it sits next to.
+    """
+    path = store_path(stock.symbol)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    version = PriceHistoryState.objects.filter(stock=stock).values_list('bars_version', flat=True).first()
+    data = _read_from_db(stock)
+
+    _replace_file(path, lambda handle: np.save(handle, data), '.npy')
+    _replace_file(version_path(stock.symbol), lambda handle: handle.write((version or '').encode()), '.version')
+    logger.info(f"Price store for {stock.symbol} synced with {data.shape[1]} bars")
+    return data.shape[1]
+
+
+def invalidate(symbol):
+    """Drop a symbol's price file so the next read rebuilds it from the database"""
+    version_path(symbol).unlink(missing_ok=True)
+    store_path(symbol).unlink(missing_ok=True)
+
+
+def sync_all(symbols=None):
+    """Rebuild the store for all (or the given) stocks; returns the number of files written"""
+    stocks = Stock.objects.all()
+    if symbols:
+        stocks = stocks.filter(symbol__in=symbols)
+    count = 0
+    for stock in stocks.iterator():
+        sync_stock(stock)
+        count += 1
+    return count
+
+
+def _file_version(symbol):
+    try:
+        return version_path(symbol).read_text()
+    except OSError:
+        return None
+
+
+def _is_current(data, version, history):
+    """
+    Whether a price file holds the history the database has.
+
+    Each node keeps its own files, so one written before another node
+    stored or revised bars is still on disk here. Every bar write gives
+    PriceHistoryState a new ``bars_version``; the file is current when its
+    sidecar carries that version and its shape the stored bar count.
+    """
+    if version is None or version != history.bars_version:
+        return False
+    return data.ndim == 2 and data.shape == (len(COLUMNS), history.bar_count)
+
+
+def _open(path):
+    try:
+        return np.load(path, mmap_mode='r')
+    except (OSError, ValueError) as e:
+        if path.exists():
+            logger.warning(f"Unreadable price file {path}: {e}")
+        return None
+
+
+def _load_array(symbol):
+    history = PriceHistoryState.objects.filter(
+        stock__symbol=symbol.upper()
+    ).select_related('stock').first()
+    if history is None:
+        # Bars written without a tracked history cannot be checked, so read them directly
+        stock = Stock.objects.filter(symbol=symbol.upper()).first()
+        return _read_from_db(stock) if stock else None
+    if not store_enabled():
+        return _read_from_db(history.stock)
+
+    path = store_path(symbol)
+    # Sidecar before the file: the file is then at least as new as the version read
+    version = _file_version(symbol)
+    data = _open(path)
+    if data is not None and _is_current(data, version, history):
+        return data
+
+    logger.info(f"Price store for {symbol.upper()} is missing or stale, rebuilding")
+    try:
+        sync_stock(history.stock)
+    except Exception as e:
+        logger.warning(f"Price store rebuild failed for {symbol.upper()}: {e}")
+        return _read_from_db(history.stock)
+    data = _open(path)
+    return data if data is not None else _read_from_db(history.stock)
+
+
+def load_prices(symbol, start=None, end=None):
+    """
+    Return a symbol's daily bars between ``start`` and ``end`` (inclusive) as NumPy arrays.
+
+    The result maps each name in ``COLUMNS`` to a 1-D array in date order.
+    ``date`` is ``datetime64[D]``; the price and volume columns are float64
+    views into the memory-mapped file, so no data is copied or converted
+    until it is touched. Files that are missing or disagree with the stock's
+    PriceHistoryState are rebuilt from the database first. Returns None for
+    unknown symbols.
+    """
+    data = _load_array(symbol)
+    if data is None:
+        return None
+
+    days = data[0]
+    lo = 0 if start is None else np.searchsorted(days, np.datetime64(start, 'D').astype(np.int64), side='left')
+    hi = len(days) if end is None else np.searchsorted(days, np.datetime64(end, 'D').astype(np.int64), side='right')
+
+    arrays = {name: data[row, lo:hi] for row, name in enumerate(COLUMNS)}
+    arrays['date'] = arrays['date'].astype(np.int64).astype('datetime64[D]')
+    return arrays
@@ -0,0 +1,449 @@
+"""
+SPCM Provider Clients - pooled sync and async HTTP sessions with retries, caching and latency tracking
+"""
+from bisect import bisect_left
+from collections import OrderedDict
+from urllib.parse import urlencode
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from .ratelimit import RateLimitExceeded, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Query parameters that carry credentials and must not end up in cache keys
+CREDENTIAL_PARAMS = {'apikey', 'apiKey'}
+
+REQUEST_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+    'User-Agent': 'spcm/1.0',
+}
+
+PROVIDER_URLS = {
+    'alpha_vantage': 'https://www.alphavantage.co/query',
+    'newsapi': 'https://newsapi.org/v2/everything',
+}
+
+
+class ProviderError(Exception):
+    """Raised when a provider request still fails after retries"""
+
+
+class ResponseCache:
+    """
+    Two-tier TTL cache for decoded provider responses.
+
+    A small LRU dict serves repeat lookups inside one process; the Django
+    cache named by ``alias`` (file-based by default) is shared by every
+    worker on the host. Entries carry their absolute expiry so a value
+    promoted from the shared tier never outlives its original TTL.
+    """
+
+    def __init__(self, alias='provider', max_entries=1024):
+        self.alias = alias
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @property
+    def shared(self):
+        try:
+            return caches[self.alias]
+        except InvalidCacheBackendError:
+            return None
+
+    def get(self, key, count_miss=True):
+        """Return a cached value or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        entry = self.shared.get(key) if self.shared is not None else None
+        if entry is not None and entry[0] > now:
+            self._remember(key, entry)
+            with self._lock:
+                self.counters['shared_hits'] += 1
+            return entry[1]
+
+        if count_miss:
+            with self._lock:
+                self.counters['misses'] += 1
+        return None
+
+    def peek(self, key):
+        """
+        ``get`` for a pre-check that falls through to ``ProviderClient.get_json``
+        on a miss: hits are counted, the miss is left for that lookup to count.
+        """
+        return self.get(key, count_miss=False)
+
+    def set(self, key, value, ttl):
+        entry = (time.time() + ttl, value)
+        self._remember(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry, timeout=ttl)
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self):
+        """Hit and miss counters for this process"""
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = sum(counters.values())
+        hits = counters['memory_hits'] + counters['shared_hits']
+        counters['hit_rate'] = hits / lookups if lookups else 0.0
+        return counters
+
+
+class ProviderClient:
+    """
+    Long-lived HTTP client for one data provider.
+
+    Keeps a ``requests.Session`` with a sized keep-alive pool, asks for
+    gzip, retries timeouts, connection errors and 5xx responses with
+    jittered exponential backoff, takes a rate-limit token before every
+    attempt, and records a latency histogram per endpoint. Responses are
+    cached per endpoint for the TTL given in ``cache_ttls``.
+    """
+
+    def __init__(self, name, base_url, rate_limiter=None, pool_size=10,
+                 max_retries=3, backoff=0.5, cache=None, cache_ttls=None):
+        self.name = name
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.cache_ttls = cache_ttls or {}
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = self._create_session(pool_size)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def _create_session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(REQUEST_HEADERS)
+        return session
+
+    def get_json(self, params, timeout=10, endpoint='default', max_wait=None, validate=None):
+        """
+        GET ``base_url`` with ``params`` and return the decoded JSON body.
+
+        ``validate`` is called with the body before it is cached and may
+        raise to reject error payloads.
+        """
+        ttl = self.cache_ttls.get(endpoint)
+        cache_key = None
+        if self.cache is not None and ttl:
+            cache_key = self._cache_key(endpoint, params)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        data = self._request(params, timeout, endpoint, max_wait)
+        if validate is not None:
+            validate(data)
+        if cache_key is not None:
+            self.cache.set(cache_key, data, ttl)
+        return data
+
+    def cached_json(self, params, endpoint='default'):
+        """
+        Return the cached response for a request without calling the provider, or None.
+
+        A miss is not counted, since callers then request it through ``get_json``.
+        """
+        if self.cache is None or not self.cache_ttls.get(endpoint):
+            return None
+        return self.cache.peek(self._cache_key(endpoint, params))
+
+    def _cache_key(self, endpoint, params):
+        query = urlencode(sorted(
+            (key, value) for key, value in params.items() if key not in CREDENTIAL_PARAMS
+        ))
+        return f"{self.name}:{endpoint}:{hashlib.sha1(query.encode()).hexdigest()}"
+
+    def _request(self, params, timeout, endpoint, max_wait):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                logger.info(f"Retrying {self.name} {endpoint} in {delay:.2f}s after: {error}")
+                time.sleep(delay)
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(max_wait=max_wait)
+
+            started = time.perf_counter()
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=timeout)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                self._record(endpoint, time.perf_counter() - started, failed=True)
+                error = e
+                continue
+
+            failed = response.status_code >= 500
+            self._record(endpoint, time.perf_counter() - started, failed=failed)
+            if failed:
+                error = ProviderError(f"{self.name} returned HTTP {response.status_code}")
+                continue
+
+            return response.json()
+
+        raise ProviderError(f"{self.name} {endpoint} failed after {self.max_retries + 1} attempts: {error}")
+
+    def _record(self, endpoint, elapsed, failed=False):
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, {
+                'count': 0,
+                'errors': 0,
+                'total_seconds': 0.0,
+                'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            })
+            stats['count'] += 1
+            stats['errors'] += int(failed)
+            stats['total_seconds'] += elapsed
+            stats['buckets'][bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    def latency_stats(self):
+        """Return a snapshot of the per-endpoint latency histograms"""
+        labels = [f'<={bound}s' for bound in LATENCY_BUCKETS] + [f'>{LATENCY_BUCKETS[-1]}s']
+        with self._stats_lock:
+            return {
+                endpoint: {
+                    'count': stats['count'],
+                    'errors': stats['errors'],
+                    'avg_seconds': stats['total_seconds'] / stats['count'],
+                    'histogram': dict(zip(labels, stats['buckets'])),
+                }
+                for endpoint, stats in self._stats.items()
+            }
+
+
+class AsyncProviderClient(ProviderClient):
+    """
+    Non-blocking counterpart of ``ProviderClient`` on ``httpx.AsyncClient``.
+
+    Same retry policy, rate limiter, response cache and latency histograms;
+    the rate limiter, cache and payload validation touch the database or
+    disk, so they run through ``sync_to_async``. httpx connection pools are
+    bound to the event loop that opened them, so get instances from
+    ``get_async_provider_client`` rather than sharing one across loops;
+    it only hands them out under ASGI.
+    """
+
+    def _create_session(self, pool_size):
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            headers=REQUEST_HEADERS,
+        )
+
+    async def get_json(self, params, timeout=10, endpoint='default', max_wait=None, validate=None):
+        ttl = self.cache_ttls.get(endpoint)
+        cache_key = None
+        if self.cache is not None and ttl:
+            cache_key = self._cache_key(endpoint, params)
+            cached = await sync_to_async(self.cache.get)(cache_key)
+            if cached is not None:
+                return cached
+
+        data = await self._request(params, timeout, endpoint, max_wait)
+        if validate is not None:
+            await sync_to_async(validate)(data)
+        if cache_key is not None:
+            await sync_to_async(self.cache.set)(cache_key, data, ttl)
+        return data
+
+    async def _acquire_budget(self, max_wait):
+        """
+        ``RateLimiter.acquire`` that waits on the event loop.
+
+        Only the token check runs in the sync executor; sleeping there would
+        hold the thread-sensitive executor and stall every other
+        ``sync_to_async`` call in the process.
+        """
+        limiter = self.rate_limiter
+        max_wait = limiter.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = await sync_to_async(limiter.try_acquire)()
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(f"{limiter.provider} budget exhausted, next call in {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    async def _request(self, params, timeout, endpoint, max_wait):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                logger.info(f"Retrying {self.name} {endpoint} in {delay:.2f}s after: {error}")
+                await asyncio.sleep(delay)
+
+            if self.rate_limiter is not None:
+                await self._acquire_budget(max_wait)
+
+            started = time.perf_counter()
+            try:
+                response = await self.session.get(self.base_url, params=params, timeout=timeout)
+            except httpx.TransportError as e:
+                self._record(endpoint, time.perf_counter() - started, failed=True)
+                error = e
+                continue
+
+            failed = response.status_code >= 500
+            self._record(endpoint, time.perf_counter() - started, failed=failed)
+            if failed:
+                error = ProviderError(f"{self.name} returned HTTP {response.status_code}")
+                continue
+
+            return response.json()
+
+        raise ProviderError(f"{self.name} {endpoint} failed after {self.max_retries + 1} attempts: {error}")
+
+
+response_cache = ResponseCache(
+    alias='provider',
+    max_entries=getattr(settings, 'PROVIDER_CACHE_MAX_ENTRIES', 1024),
+)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _create_client(cls, provider):
+    options = getattr(settings, 'PROVIDER_HTTP', {})
+    return cls(
+        provider,
+        getattr(settings, 'PROVIDER_BASE_URLS', {}).get(provider) or PROVIDER_URLS[provider],
+        rate_limiter=get_rate_limiter(provider),
+        pool_size=options.get('pool_size', 10),
+        max_retries=options.get('max_retries', 3),
+        backoff=options.get('backoff', 0.5),
+        cache=response_cache,
+        cache_ttls=getattr(settings, 'PROVIDER_CACHE_TTLS', {}),
+    )
+
+
+def get_provider_client(provider):
+    """Return the process-wide client for ``provider``, creating it on first use"""
+    with _clients_lock:
+        if provider not in _clients:
+            _clients[provider] = _create_client(ProviderClient, provider)
+        return _clients[provider]
+
+
+# Async clients per event loop, dropped with their loop
+_async_clients = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+class ThreadedProviderClient:
+    """
+    Awaitable ``get_json`` on the process-wide sync client.
+
+    Under WSGI every async view runs on a fresh event loop, so a per-loop
+    httpx client would be opened for each request and never closed; async
+    code there reuses the sync client's pooled session through
+    ``sync_to_async`` instead.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.name = client.name
+
+    async def get_json(self, params, **kwargs):
+        return await sync_to_async(self.client.get_json)(params, **kwargs)
+
+
+def async_clients_enabled():
+    """Whether this process serves ASGI, where one event loop outlives the requests it runs"""
+    return getattr(settings, 'SERVER_INTERFACE', 'wsgi') == 'asgi'
+
+
+def get_async_provider_client(provider):
+    """
+    Return a client with an awaitable ``get_json`` for ``provider``.
+
+    Under ASGI this is the running event loop's ``AsyncProviderClient``,
+    created on first use; otherwise a ``ThreadedProviderClient`` on the
+    process-wide sync client.
+    """
+    if not async_clients_enabled():
+        return ThreadedProviderClient(get_provider_client(provider))
+
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        if provider not in clients:
+            clients[provider] = _create_client(AsyncProviderClient, provider)
+        return clients[provider]
+
+
+def all_latency_stats():
+    """Latency histograms of every sync client and live async client in this process"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    with _async_clients_lock:
+        async_clients = [client for clients_ in _async_clients.values() for client in clients_.values()]
+
+    stats = {client.name: client.latency_stats() for client in clients}
+    for client in async_clients:
+        name = f'{client.name} (async)'
+        # One async client per loop; a process normally runs one loop, otherwise merge
+        stats[name] = _merge_latency_stats(stats.get(name, {}), client.latency_stats())
+    return stats
+
+
+def _merge_latency_stats(merged, stats):
+    for endpoint, current in stats.items():
+        previous = merged.get(endpoint)
+        if previous is None:
+            merged[endpoint] = current
+            continue
+        count = previous['count'] + current['count']
+        merged[endpoint] = {
+            'count': count,
+            'errors': previous['errors'] + current['errors'],
+            'avg_seconds': (
+                previous['avg_seconds'] * previous['count'] + current['avg_seconds'] * current['count']
+            ) / count,
+            'histogram': {
+                label: previous['histogram'][label] + current['histogram'][label]
+                for label in current['histogram']
+            },
+        }
+    return merged
@@ -0,0 +1,80 @@
+"""
+SPCM Query Plans - EXPLAIN checks that the hot time-series queries use their indexes
+"""
+from django.db import connection
+
+from .models import StockPrice, TechnicalIndicator, NewsArticle, SentimentData, StockRecommendation
+from . import pricestore
+
+# Plan fragments that mean the database sorted rows instead of reading them in index order
+SORT_MARKERS = {
+    'sqlite': ['USE TEMP B-TREE FOR ORDER BY'],
+    'postgresql': ['Sort  (', 'Sort Key:'],
+    'mysql': ['Using filesort'],
+}
+
+BY_STOCK_DATE = ('stock_id', 'date')
+
+
+def hot_queries(stock):
+    """
+    The latest-N-per-stock lookups issued by views.py, services.py,
+    snapshots.py and pricestore.py, as (label, queryset, expected index).
+
+    The expected index is either an index name, or a tuple of leading
+    columns matched against every index of the table (e.g. the unnamed
+    index behind ``unique_together``).
+    """
+    last_date = StockPrice.objects.filter(stock=stock).values_list('date', flat=True).first()
+    return [
+        ('latest price', StockPrice.objects.filter(stock=stock)[:1], BY_STOCK_DATE),
+        ('price history', StockPrice.objects.filter(stock=stock)[:30], BY_STOCK_DATE),
+        ('snapshot price pair', StockPrice.objects.filter(stock=stock).order_by('-date')
+            .values('date', 'close_price', 'volume')[:2], 'price_stock_date_close_vol'),
+        # pricestore rebuilds and the store-disabled fallback feed every indicator run
+        ('indicator input series', pricestore.price_rows(stock), BY_STOCK_DATE),
+        # IndicatorState check before an incremental run: bar count and last close
+        ('indicator state bars', StockPrice.objects.filter(stock=stock, date__lte=last_date)
+            .values_list('date'), BY_STOCK_DATE),
+        ('indicator state close', StockPrice.objects.filter(stock=stock, date=last_date)
+            .values_list('close_price', flat=True)[:1], BY_STOCK_DATE),
+        ('latest indicators', TechnicalIndicator.objects.filter(stock=stock)[:1], BY_STOCK_DATE),
+        ('latest sentiment', SentimentData.objects.filter(stock=stock)[:1], BY_STOCK_DATE),
+        ('latest recommendation', StockRecommendation.objects.filter(stock=stock)[:1], BY_STOCK_DATE),
+        ('recent news', NewsArticle.objects.filter(stock=stock)[:5], 'news_stock_published_desc'),
+    ]
+
+
+def index_names(model, expected):
+    """Names of the indexes of ``model`` that match ``expected`` (a name or leading columns)"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    if isinstance(expected, str):
+        return {expected} if expected in constraints else set()
+    return {
+        name for name, info in constraints.items()
+        if info['index'] and tuple(info['columns'][:len(expected)]) == expected
+    }
+
+
+def check_plan(queryset, expected):
+    """
+    EXPLAIN ``queryset`` and return (index used, problem, plan).
+
+    ``problem`` is None when the plan reads through an expected index
+    without sorting rows, otherwise a short description of what is wrong.
+    """
+    plan = queryset.explain()
+    indexes = index_names(queryset.model, expected)
+    used = [name for name in sorted(indexes) if name in plan]
+    sorted_rows = [marker for marker in SORT_MARKERS.get(connection.vendor, []) if marker in plan]
+
+    if not indexes:
+        problem = f'no index on {", ".join(expected) if isinstance(expected, tuple) else expected}'
+    elif not used:
+        problem = f'does not use {" or ".join(sorted(indexes))}'
+    elif sorted_rows:
+        problem = f'sorts rows ({sorted_rows[0]})'
+    else:
+        problem = None
+    return (used[0] if used else None), problem, plan
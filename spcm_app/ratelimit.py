@@ -0,0 +1,133 @@
+"""
+SPCM Provider Rate Limiting - token buckets shared through the database
+"""
+from datetime import timedelta
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ProviderBudget
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a provider budget cannot serve a call in time"""
+
+
+class RateLimiter:
+    """
+    Token bucket for one provider, persisted in ``ProviderBudget``.
+
+    Every process (gunicorn workers, management commands) reads and updates
+    the same row, so they share one per-minute and per-day budget. Updates
+    use a compare-and-swap on ``version`` rather than row locks, which keeps
+    it working on SQLite as well as PostgreSQL. Callers in one process wait
+    their turn behind a lock and are paced so the bucket is drained at
+    exactly the configured rate.
+    """
+
+    def __init__(self, provider, per_minute, per_day=None, burst=1, max_wait=60):
+        self.provider = provider
+        self.rate = per_minute / 60.0
+        self.per_day = per_day
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait=None):
+        """Block until one call is allowed, or raise RateLimitExceeded"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+
+        with self._lock:
+            while True:
+                wait = self.try_acquire()
+                if wait <= 0:
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise RateLimitExceeded(
+                        f"{self.provider} budget exhausted, next call in {wait:.1f}s"
+                    )
+                time.sleep(wait)
+
+    def penalize(self, seconds=60):
+        """Empty the bucket after the provider itself reported a rate limit"""
+        now = timezone.now()
+        self._get_budget(now)
+        ProviderBudget.objects.filter(provider=self.provider).update(
+            tokens=0,
+            refilled_at=now,
+            blocked_until=now + timedelta(seconds=seconds),
+            version=F('version') + 1,
+        )
+        logger.warning(f"{self.provider} reported a rate limit, pausing calls for {seconds}s")
+
+    def try_acquire(self):
+        """
+        Take a token if one is available without blocking; returns 0 on
+        success, otherwise the seconds to wait before trying again.
+        Raises RateLimitExceeded once the daily budget is spent.
+        """
+        now = timezone.now()
+        budget = self._get_budget(now)
+
+        today = now.date()
+        day_calls = budget.day_calls if budget.day == today else 0
+        if self.per_day and day_calls >= self.per_day:
+            raise RateLimitExceeded(f"{self.provider} daily budget of {self.per_day} calls spent")
+
+        if budget.blocked_until and now < budget.blocked_until:
+            return (budget.blocked_until - now).total_seconds()
+
+        elapsed = max((now - budget.refilled_at).total_seconds(), 0.0)
+        tokens = min(float(self.burst), budget.tokens + elapsed * self.rate)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+
+        updated = ProviderBudget.objects.filter(
+            pk=budget.pk, version=budget.version
+        ).update(
+            tokens=tokens - 1,
+            refilled_at=now,
+            day=today,
+            day_calls=day_calls + 1,
+            blocked_until=None,
+            version=F('version') + 1,
+        )
+        if updated:
+            return 0
+
+        # Another process took a token first, retry shortly
+        return random.uniform(0.01, 0.05)
+
+    def _get_budget(self, now):
+        budget, _ = ProviderBudget.objects.get_or_create(
+            provider=self.provider,
+            defaults={'tokens': float(self.burst), 'refilled_at': now, 'day': now.date()},
+        )
+        return budget
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider):
+    """Return the process-wide limiter configured in ``PROVIDER_RATE_LIMITS``"""
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = getattr(settings, 'PROVIDER_RATE_LIMITS', {}).get(provider, {})
+            _limiters[provider] = RateLimiter(
+                provider,
+                per_minute=limits.get('per_minute', 5),
+                per_day=limits.get('per_day'),
+                burst=limits.get('burst', 1),
+                max_wait=getattr(settings, 'RATE_LIMIT_MAX_WAIT', 60),
+            )
+        return _limiters[provider]
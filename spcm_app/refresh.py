@@ -0,0 +1,149 @@
+"""
+SPCM Background Refresh Queue - database-backed jobs drained by a worker
+"""
+from datetime import timedelta
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import RefreshJob
+from .services import StockRefreshService
+
+logger = logging.getLogger(__name__)
+
+_local_worker = None
+_local_worker_lock = threading.Lock()
+# Set under the lock when a job is queued while the worker is running, so a
+# worker that just found the queue empty drains again instead of exiting
+_local_worker_wakeup = False
+
+
+def active_refresh_job(symbol):
+    """Return the pending or running job for ``symbol``, if any"""
+    return RefreshJob.objects.filter(
+        symbol=symbol, status__in=[RefreshJob.PENDING, RefreshJob.RUNNING]
+    ).order_by('requested_at').first()
+
+
+def latest_refresh_job(symbol):
+    return RefreshJob.objects.filter(symbol=symbol).order_by('-requested_at').first()
+
+
+def enqueue_refresh(symbol):
+    """Queue a refresh for ``symbol`` unless one is already pending or running"""
+    job = active_refresh_job(symbol)
+    if job is None:
+        try:
+            with transaction.atomic():
+                job = RefreshJob.objects.create(symbol=symbol)
+            logger.info(f"Queued refresh for {symbol}")
+        except IntegrityError:
+            # A concurrent request queued it first
+            job = active_refresh_job(symbol) or latest_refresh_job(symbol)
+
+    if getattr(settings, 'REFRESH_QUEUE_MODE', 'thread') == 'thread':
+        start_local_worker()
+    return job
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest runnable job to RUNNING and return it.
+
+    RUNNING jobs whose worker has been silent for longer than
+    ``REFRESH_JOB_TIMEOUT`` seconds are treated as abandoned and re-claimed.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'REFRESH_JOB_TIMEOUT', 600))
+    candidates = RefreshJob.objects.filter(
+        Q(status=RefreshJob.PENDING) |
+        Q(status=RefreshJob.RUNNING, started_at__lt=stale_before)
+    ).order_by('requested_at')[:10]
+
+    for job in candidates:
+        claimed = RefreshJob.objects.filter(
+            pk=job.pk, status=job.status, started_at=job.started_at
+        ).update(status=RefreshJob.RUNNING, started_at=now, attempts=F('attempts') + 1)
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_job(job):
+    """
+    Run the refresh pipeline for a claimed job and record the outcome.
+
+    A refresh in which no step succeeded counts as a failure; failed jobs
+    go back to PENDING until they have been claimed
+    ``REFRESH_JOB_MAX_ATTEMPTS`` times and are then marked FAILED.
+    """
+    try:
+        # Waits for (and reuses) a refresh of the same symbol started elsewhere
+        results = StockRefreshService().refresh(job.symbol, wait=settings.REFRESH_LEASE_WAIT)
+        if results is not None and not any(results.values()):
+            raise RuntimeError(f"every refresh step failed: {', '.join(results)}")
+        job.status = RefreshJob.DONE
+        job.error = ''
+    except Exception as e:
+        logger.error(f"Background refresh failed for {job.symbol} (attempt {job.attempts}): {e}")
+        retry = job.attempts < getattr(settings, 'REFRESH_JOB_MAX_ATTEMPTS', 3)
+        job.status = RefreshJob.PENDING if retry else RefreshJob.FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def process_queue(max_jobs=None):
+    """Drain runnable jobs; returns the number processed"""
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def start_local_worker():
+    """
+    Drain the queue on a daemon thread in this process.
+
+    Used when no dedicated ``process_refresh_queue`` worker is deployed
+    (``REFRESH_QUEUE_MODE = 'thread'``). At most one thread runs per process.
+    """
+    global _local_worker, _local_worker_wakeup
+    with _local_worker_lock:
+        if _local_worker is not None:
+            _local_worker_wakeup = True
+            return
+        _local_worker = threading.Thread(target=_drain_in_thread, name='refresh-worker', daemon=True)
+        _local_worker.start()
+
+
+def _drain_in_thread():
+    global _local_worker, _local_worker_wakeup
+    close_old_connections()
+    try:
+        while True:
+            with _local_worker_lock:
+                _local_worker_wakeup = False
+            process_queue()
+            # Exit only if nothing was queued since the pass started; clearing
+            # _local_worker under the same lock lets the next enqueue start a thread
+            with _local_worker_lock:
+                if not _local_worker_wakeup:
+                    _local_worker = None
+                    return
+    except Exception as e:
+        logger.error(f"Local refresh worker stopped: {e}")
+        with _local_worker_lock:
+            _local_worker = None
+    finally:
+        connection.close()
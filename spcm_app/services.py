@@ -1,36 +1,293 @@
 """
 SPCM Business Logic Services - Enhanced with Fallback System
 """
-import requests
 from textblob import TextBlob
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from decimal import Decimal
+import asyncio
 import json
+import re
 import time
 import random
+import uuid
 
 from .models import (
-    Stock, StockPrice, TechnicalIndicator, NewsArticle, 
-    SentimentData, StockRecommendation
+    Stock, StockPrice, TechnicalIndicator, IndicatorState, PriceHistoryState, NewsArticle, 
+    SentimentData, StockRecommendation, StockSnapshot, PortfolioPosition
 )
+from .indicators import (
+    STATE_KEYS, WARMUP_BARS, advance_frame, compute_indicator_frame, compute_indicators, covers_state,
+    indicator_columns, initial_state, max_lookback, resolve_indicators, rolling_states
+)
+from .providers import get_async_provider_client, get_provider_client
+from .leases import acquire_lease, lease_key, release_lease, single_flight, wait_for_release
+from .snapshots import refresh_snapshot
+from .aggregates import apply_price_changes, refresh_market_aggregates
+from .db import upsert_rows
+from . import pricestore
 
 logger = logging.getLogger(__name__)
 
+PRICE_FIELDS = [
+    'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'adjusted_close'
+]
+
+# TIME_SERIES_DAILY ``compact`` returns the last 100 trading days; leave a margin for holidays
+COMPACT_HISTORY_DAYS = 130
+
+PERIOD_UNIT_DAYS = {'d': 1, 'day': 1, 'w': 7, 'week': 7, 'mo': 30, 'month': 30, 'y': 365, 'year': 365}
+
+SENTIMENT_FIELDS = [
+    'news_sentiment', 'social_sentiment', 'overall_sentiment',
+    'news_mentions', 'social_mentions', 'trending_keywords',
+]
+
+# Daily sentiment covers articles published this many days before the day and the day itself
+SENTIMENT_WINDOW_DAYS = 3
+
+IMPACT_WEIGHTS = {'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}
+
+TRENDING_KEYWORDS = [
+    'earnings', 'revenue', 'profit', 'growth', 'market', 'stock',
+    'investment', 'analyst', 'upgrade', 'downgrade', 'buy', 'sell',
+    'target', 'price', 'forecast', 'outlook', 'performance'
+]
+
+
+def period_start(period, today=None):
+    """
+    First date covered by a history ``period`` such as ``30d``, ``3month`` or ``1year``.
+
+    Returns None for ``full`` or ``max`` (all available history); raises
+    ValueError for anything else.
+    """
+    today = today or timezone.now().date()
+    period = str(period).strip().lower()
+    if period in ('full', 'max'):
+        return None
+    
+    match = re.fullmatch(r'(\d+)\s*([a-z]+?)s?', period)
+    if not match or match.group(2) not in PERIOD_UNIT_DAYS:
+        raise ValueError(f"Unknown history period: {period}")
+    return today - timedelta(days=int(match.group(1)) * PERIOD_UNIT_DAYS[match.group(2)])
+
+
+def plan_history_fetch(history, start, today=None):
+    """
+    Choose the TIME_SERIES_DAILY ``outputsize`` for a stock.
+
+    ``history`` is the stock's PriceHistoryState (None before the first
+    load) and ``start`` the first wanted date (None for all history).
+    ``compact`` is enough when everything missing - bars after the
+    high-water mark plus any backfill before the first stored bar - lies
+    within the last ~100 trading days; first loads of long periods, gaps
+    and backfills need ``full``.
+    """
+    today = today or timezone.now().date()
+    if history is None:
+        oldest_needed = start
+    elif start is None:
+        oldest_needed = history.last_date if history.complete else None
+    elif history.complete or start >= history.first_date:
+        # A complete history already holds every bar the provider has before first_date
+        oldest_needed = history.last_date
+    else:
+        oldest_needed = min(start, history.last_date)
+
+    if oldest_needed is None or oldest_needed < today - timedelta(days=COMPACT_HISTORY_DAYS):
+        return PriceHistoryState.FULL
+    return PriceHistoryState.COMPACT
+
+
+def select_new_bars(prices, history, start):
+    """
+    Keep only the bars that are not stored yet.
+
+    Bars from the high-water mark on are kept (the last stored bar is
+    rewritten in case it was an intraday partial), as are bars inside the
+    requested window before the first stored bar.
+    """
+    if history is None:
+        return [price for price in prices if start is None or price.date >= start]
+    return [
+        price for price in prices
+        if price.date >= history.last_date
+        or (price.date < history.first_date and (start is None or price.date >= start))
+    ]
+
+
+def _quantize_decimals(model, instances, fields):
+    """Round Decimal values to the precision the column stores"""
+    decimal_places = {
+        name: model._meta.get_field(name).decimal_places
+        for name in fields
+        if getattr(model._meta.get_field(name), 'decimal_places', None) is not None
+    }
+    for instance in instances:
+        for name, places in decimal_places.items():
+            value = getattr(instance, name)
+            if value is not None:
+                setattr(instance, name, Decimal(value).quantize(Decimal(1).scaleb(-places)))
+
+
+def _resolve_payload(payload):
+    """Return a prefetched provider response, re-raising a failed prefetch"""
+    if isinstance(payload, Exception):
+        raise payload
+    return payload
+
+
+def frame_to_instances(model, stock, df, columns):
+    """
+    Convert a DataFrame with a ``date`` column into unsaved model instances.
+
+    ``columns`` maps model field names to DataFrame columns. Values are
+    rounded column by column to the field's decimal places and NaN becomes
+    None, so no per-row pandas access is needed.
+    """
+    values = {}
+    for field_name, column in columns.items():
+        places = model._meta.get_field(field_name).decimal_places
+        series = df[column].astype(float).round(places)
+        values[field_name] = [
+            None if pd.isna(value) else Decimal(repr(value)) for value in series.tolist()
+        ]
+
+    dates = df['date'].tolist()
+    return [
+        model(stock=stock, date=date, **{name: values[name][i] for name in values})
+        for i, date in enumerate(dates)
+    ]
+
+
+def bulk_upsert_daily_rows(model, instances, fields, batch_size=None):
+    """
+    Insert or update per-day rows keyed by (stock, date).
+
+    Existing rows are read back in one query and compared field by field so
+    that only new or changed rows are written, through ``upsert_rows``
+    (COPY on PostgreSQL for large loads, otherwise batched ``ON CONFLICT``
+    inserts in short serialized transactions).
+    Returns a dict with ``inserted``, ``updated`` and ``unchanged`` counts,
+    ``changed_from``, the earliest date of an updated row (or None), and
+    ``previous``, the stored values of ``fields`` for every written
+    (stock_id, date) key (None for inserted rows).
+    """
+    result = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'changed_from': None, 'previous': {}}
+    if not instances:
+        return result
+
+    _quantize_decimals(model, instances, fields)
+
+    # Last row wins when the same (stock, date) appears twice
+    by_key = {(obj.stock_id, obj.date): obj for obj in instances}
+    stock_ids = {key[0] for key in by_key}
+    dates = [key[1] for key in by_key]
+
+    existing = {
+        (row[0], row[1]): row[2:]
+        for row in model.objects.filter(
+            stock_id__in=stock_ids,
+            date__range=(min(dates), max(dates)),
+        ).values_list('stock_id', 'date', *fields).iterator(chunk_size=2000)
+    }
+
+    to_write = []
+    for key, obj in by_key.items():
+        current = existing.get(key)
+        if current is None:
+            result['inserted'] += 1
+        elif tuple(getattr(obj, name) for name in fields) != tuple(current):
+            result['updated'] += 1
+            if result['changed_from'] is None or key[1] < result['changed_from']:
+                result['changed_from'] = key[1]
+        else:
+            result['unchanged'] += 1
+            continue
+        result['previous'][key] = current
+        to_write.append(obj)
+
+    upsert_rows(model, to_write, ['stock', 'date'], fields, batch_size=batch_size)
+
+    return result
+
+
+def compute_indicator_shard(symbols, indicators=None):
+    """
+    Compute indicators for a group of symbols in one vectorized panel pass.
+
+    Reads bars from the price store and touches no other tables, so it
+    can run in a worker process. ``indicators`` names the registry entries
+    to compute (all by default). Symbols with fewer than 20 bars are
+    skipped. Returns one dict per symbol with the indicator ``frame`` and
+    the rolling ``state`` (None unless every recursive indicator was
+    computed), ready for ``StockDataService.save_panel_results``.
+    """
+    selected = resolve_indicators(indicators)
+    loaded = []
+    for symbol in symbols:
+        prices = pricestore.load_prices(symbol)
+        if prices is not None and len(prices['close']) >= 20:
+            loaded.append((symbol, prices))
+    
+    if not loaded:
+        return []
+    
+    # Bars x symbols panels, each symbol from row 0 and NaN-padded after its last bar
+    lengths = [len(prices['close']) for _, prices in loaded]
+    inputs = {name for indicator in selected for name in indicator.inputs} | {'close', 'volume'}
+    bars = {}
+    for name in inputs:
+        panel = np.full((max(lengths), len(loaded)), np.nan)
+        for j, (_, prices) in enumerate(loaded):
+            panel[:lengths[j], j] = prices[name]
+        bars[name] = panel
+    
+    columns = compute_indicators(bars, selected)
+    states = rolling_states(bars, lengths) if covers_state(selected) else [None] * len(loaded)
+    
+    results = []
+    for j, (symbol, prices) in enumerate(loaded):
+        frame = pd.DataFrame({'date': prices['date'].astype(object)})
+        for name, values in columns.items():
+            frame[name] = values[:lengths[j], j]
+        results.append({
+            'symbol': symbol,
+            'frame': frame.iloc[WARMUP_BARS:],
+            'state': states[j],
+            'bar_count': lengths[j],
+        })
+    return results
+
+
 class StockDataService:
     """Service for fetching stock data with fallback to demo data"""
     
     def __init__(self):
         self.api_key = getattr(settings, 'ALPHA_VANTAGE_API_KEY', None)
-        self.base_url = 'https://www.alphavantage.co/query'
+        self.client = get_provider_client('alpha_vantage')
+        self.base_url = self.client.base_url
         self.use_api = bool(self.api_key and self.api_key != 'demo' and self.api_key.strip())
+        self.rate_limiter = self.client.rate_limiter
         
-    def fetch_stock_info(self, symbol):
-        """Fetch basic stock information with fallback to demo data"""
+    def fetch_stock_info(self, symbol, payload=None):
+        """
+        Fetch basic stock information with fallback to demo data.
+
+        ``payload`` may be an OVERVIEW response already fetched with
+        ``request_stock_info`` (or the exception that request raised).
+        """
         try:
             # First try to get existing stock
             try:
@@ -40,37 +297,61 @@ class StockDataService:
             except Stock.DoesNotExist:
                 pass
             
-            # Try API if available
-            if self.use_api:
-                try:
-                    return self._fetch_from_api(symbol)
-                except Exception as e:
-                    logger.warning(f"API fetch failed for {symbol}: {e}, falling back to demo data")
-            
-            # Fallback to demo data
-            return self._create_demo_stock(symbol)
+            # Only one caller creates a new stock; the others wait and reuse it
+            with single_flight('info', symbol, wait=15) as acquired:
+                # Another caller may have created it and released just before we acquired
+                stock = Stock.objects.filter(symbol=symbol).first()
+                if stock is not None or not acquired:
+                    return stock
+                
+                # Try API if available
+                if self.use_api:
+                    try:
+                        return self._fetch_from_api(symbol, payload)
+                    except Exception as e:
+                        logger.warning(f"API fetch failed for {symbol}: {e}, falling back to demo data")
+                
+                # Fallback to demo data
+                return self._create_demo_stock(symbol)
             
         except Exception as e:
             logger.error(f"Error fetching stock info for {symbol}: {e}")
             return None
     
-    def _fetch_from_api(self, symbol):
-        """Fetch from Alpha Vantage API"""
-        params = {
-            'function': 'OVERVIEW',
-            'symbol': symbol,
-            'apikey': self.api_key
-        }
-        
-        response = requests.get(self.base_url, params=params, timeout=10)
-        data = response.json()
-        
-        # Check for API errors
+    def _request_alpha_vantage(self, params, timeout, max_wait=None):
+        """Call Alpha Vantage (cached, within the shared budget) and raise on error payloads"""
+        params = dict(params, apikey=self.api_key)
+        return self.client.get_json(
+            params, timeout=timeout, endpoint=params['function'],
+            max_wait=max_wait, validate=self._check_alpha_vantage_payload,
+        )
+    
+    async def _arequest_alpha_vantage(self, params, timeout, max_wait=None):
+        """Async ``_request_alpha_vantage`` on the event loop's httpx client"""
+        params = dict(params, apikey=self.api_key)
+        client = get_async_provider_client('alpha_vantage')
+        return await client.get_json(
+            params, timeout=timeout, endpoint=params['function'],
+            max_wait=max_wait, validate=self._check_alpha_vantage_payload,
+        )
+    
+    def _check_alpha_vantage_payload(self, data):
+        """Raise on Alpha Vantage error or rate-limit payloads"""
         if 'Error Message' in data:
             raise Exception(f"Alpha Vantage error: {data['Error Message']}")
             
-        if 'Note' in data:
-            raise Exception(f"Alpha Vantage rate limit: {data['Note']}")
+        limit_message = data.get('Note') or data.get('Information')
+        if limit_message:
+            self.rate_limiter.penalize()
+            raise Exception(f"Alpha Vantage rate limit: {limit_message}")
+    
+    def request_stock_info(self, symbol):
+        """Fetch the OVERVIEW payload without touching the database"""
+        return self._request_alpha_vantage({'function': 'OVERVIEW', 'symbol': symbol}, timeout=10)
+    
+    def _fetch_from_api(self, symbol, payload=None):
+        """Fetch from Alpha Vantage API"""
+        data = _resolve_payload(payload) if payload is not None else self.request_stock_info(symbol)
         
         # Extract company information
         name = data.get('Name', f'{symbol} Corporation')
@@ -140,20 +421,29 @@ class StockDataService:
         logger.info(f"Created demo stock data for {symbol}")
         return stock
     
-    def fetch_historical_data(self, symbol, period='3month'):
-        """Fetch historical stock price data with fallback"""
+    def fetch_historical_data(self, symbol, period='3month', payload=None):
+        """
+        Fetch historical stock price data with fallback.
+
+        Only bars after the stock's high-water mark, or inside ``period``
+        before its first stored bar, are written. ``payload`` may be a
+        TIME_SERIES_DAILY response already fetched with
+        ``request_historical_data`` (or the exception that request raised).
+        """
         try:
             stock = Stock.objects.get(symbol=symbol)
+            start = period_start(period)
+            history = self.get_price_history(stock)
             
             # Try API if available
             if self.use_api:
                 try:
-                    return self._fetch_historical_from_api(stock, symbol)
+                    return self._fetch_historical_from_api(stock, symbol, history, start, payload)
                 except Exception as e:
                     logger.warning(f"API historical data fetch failed for {symbol}: {e}, using demo data")
             
             # Fallback to demo data
-            return self._generate_demo_historical_data(stock)
+            return self._generate_demo_historical_data(stock, history, start)
             
         except Stock.DoesNotExist:
             logger.error(f"Stock {symbol} not found in database")
@@ -162,23 +452,77 @@ class StockDataService:
             logger.error(f"Error fetching historical data for {symbol}: {e}")
             return False
     
-    def _fetch_historical_from_api(self, stock, symbol):
-        """Fetch historical data from Alpha Vantage"""
+    def get_price_history(self, stock):
+        """The stock's stored price range, rebuilt from its bars when untracked (None if it has none)"""
+        history = PriceHistoryState.objects.filter(stock=stock).first()
+        if history is not None:
+            return history
+        
+        bounds = StockPrice.objects.filter(stock=stock).aggregate(
+            first=Min('date'), last=Max('date'), count=Count('id')
+        )
+        if bounds['last'] is None:
+            return None
+        return PriceHistoryState.objects.create(
+            stock=stock, first_date=bounds['first'], last_date=bounds['last'], bar_count=bounds['count']
+        )
+    
+    def history_outputsizes(self, symbols, period='3month'):
+        """TIME_SERIES_DAILY ``outputsize`` for each symbol, from one query"""
+        start = period_start(period)
+        histories = {
+            history.stock.symbol: history
+            for history in PriceHistoryState.objects.filter(
+                stock__symbol__in=symbols
+            ).select_related('stock')
+        }
+        
+        # Stocks whose bars were loaded outside this service are planned from their stored range
+        untracked = [symbol for symbol in symbols if symbol not in histories]
+        if untracked:
+            for row in StockPrice.objects.filter(stock__symbol__in=untracked).values(
+                'stock__symbol'
+            ).annotate(first=Min('date'), last=Max('date')):
+                histories[row['stock__symbol']] = PriceHistoryState(
+                    first_date=row['first'], last_date=row['last']
+                )
+        return {symbol: plan_history_fetch(histories.get(symbol), start) for symbol in symbols}
+    
+    def request_historical_data(self, symbol, outputsize=PriceHistoryState.COMPACT):
+        """Fetch the TIME_SERIES_DAILY payload without touching the database"""
+        return self._request_alpha_vantage(*self._historical_request(symbol, outputsize))
+    
+    def _historical_request(self, symbol, outputsize):
         params = {
             'function': 'TIME_SERIES_DAILY',
             'symbol': symbol,
-            'outputsize': 'compact',
-            'apikey': self.api_key
+            'outputsize': outputsize,
         }
-        
-        response = requests.get(self.base_url, params=params, timeout=15)
-        data = response.json()
-        
-        if 'Error Message' in data:
-            raise Exception(f"Alpha Vantage error: {data['Error Message']}")
-            
-        if 'Note' in data:
-            raise Exception(f"Alpha Vantage rate limit: {data['Note']}")
+        return params, 30 if outputsize == PriceHistoryState.FULL else 15
+    
+    async def afetch_historical_data(self, symbol, period='3month'):
+        """
+        Async ``fetch_historical_data``.
+
+        Only the TIME_SERIES_DAILY request runs on the event loop; planning
+        and the bulk write run in a worker thread through the sync method.
+        """
+        payload = None
+        if self.use_api:
+            try:
+                outputsize = (await sync_to_async(self.history_outputsizes)([symbol], period))[symbol]
+                payload = await self._arequest_alpha_vantage(*self._historical_request(symbol, outputsize))
+            except Exception as e:
+                payload = e
+        return await sync_to_async(self.fetch_historical_data)(symbol, period, payload=payload)
+    
+    def _fetch_historical_from_api(self, stock, symbol, history, start, payload=None):
+        """Fetch historical data from Alpha Vantage"""
+        outputsize = plan_history_fetch(history, start)
+        if payload is not None:
+            data = _resolve_payload(payload)
+        else:
+            data = self.request_historical_data(symbol, outputsize)
         
         time_series = data.get('Time Series (Daily)', {})
         
@@ -186,30 +530,74 @@ class StockDataService:
             raise Exception("No time series data found")
         
         # Process and save price data
+        prices = []
         for date_str, price_data in time_series.items():
             try:
-                date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                
-                StockPrice.objects.update_or_create(
+                prices.append(StockPrice(
                     stock=stock,
-                    date=date,
-                    defaults={
-                        'open_price': Decimal(price_data['1. open']),
-                        'high_price': Decimal(price_data['2. high']),
-                        'low_price': Decimal(price_data['3. low']),
-                        'close_price': Decimal(price_data['4. close']),
-                        'volume': int(price_data['5. volume']),
-                        'adjusted_close': Decimal(price_data['4. close']),
-                    }
-                )
-            except (ValueError, KeyError) as e:
+                    date=datetime.strptime(date_str, '%Y-%m-%d').date(),
+                    open_price=Decimal(price_data['1. open']),
+                    high_price=Decimal(price_data['2. high']),
+                    low_price=Decimal(price_data['3. low']),
+                    close_price=Decimal(price_data['4. close']),
+                    volume=int(price_data['5. volume']),
+                    adjusted_close=Decimal(price_data['4. close']),
+                ))
+            except (ValueError, KeyError, ArithmeticError) as e:
                 logger.error(f"Error processing price data for {symbol} on {date_str}: {e}")
                 continue
         
+        # A full payload without a start date holds the provider's whole history
+        complete = (
+            start is None and data.get('Meta Data', {}).get('4. Output Size', '').lower().startswith('full')
+        )
+        self._store_new_bars(stock, history, start, prices, outputsize, complete)
         logger.info(f"Successfully fetched historical data from API for {symbol}")
         return True
     
-    def _generate_demo_historical_data(self, stock):
+    def _store_new_bars(self, stock, history, start, prices, outputsize, complete=False):
+        """Write the bars missing from the stored range and move the high-water mark"""
+        fresh = select_new_bars(prices, history, start)
+        counts = bulk_upsert_daily_rows(StockPrice, fresh, PRICE_FIELDS)
+        self._invalidate_indicator_state(stock, counts)
+        
+        dates = [price.date for price in fresh]
+        if history is None:
+            if dates:
+                PriceHistoryState.objects.create(
+                    stock=stock, first_date=min(dates), last_date=max(dates),
+                    bar_count=counts['inserted'], bars_version=uuid.uuid4().hex, complete=complete,
+                    last_fetched_at=timezone.now(), last_outputsize=outputsize,
+                )
+        else:
+            if dates:
+                history.first_date = min(history.first_date, min(dates))
+                history.last_date = max(history.last_date, max(dates))
+            history.bar_count += counts['inserted']
+            if counts['inserted'] or counts['updated']:
+                history.bars_version = uuid.uuid4().hex
+            history.complete = history.complete or complete
+            history.last_fetched_at = timezone.now()
+            history.last_outputsize = outputsize
+            history.save()
+        
+        # After the history moved, so the rewritten file matches what other nodes check it against
+        if counts['inserted'] or counts['updated']:
+            self._sync_price_store(stock, counts)
+            refresh_snapshot(stock, ['price'])
+            close, volume = PRICE_FIELDS.index('close_price'), PRICE_FIELDS.index('volume')
+            apply_price_changes(stock, {
+                date: (old[close], old[volume]) if old else None
+                for (_, date), old in counts['previous'].items()
+            })
+        
+        logger.info(
+            f"Price rows for {stock.symbol} ({outputsize}): {len(prices) - len(fresh)} already stored, "
+            f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged"
+        )
+        return counts
+    
+    def _generate_demo_historical_data(self, stock, history=None, start=None):
         """Generate demo historical price data"""
         base_prices = {
             'AAPL': 185.92,
@@ -222,6 +610,7 @@ class StockDataService:
         base_price = base_prices.get(stock.symbol, 100.0)
         current_date = timezone.now().date()
         
+        prices = []
         for i in range(30, 0, -1):
             date = current_date - timedelta(days=i)
             
@@ -239,22 +628,39 @@ class StockDataService:
             close_price = price
             volume = random.randint(20000000, 100000000)
             
-            StockPrice.objects.update_or_create(
+            prices.append(StockPrice(
                 stock=stock,
                 date=date,
-                defaults={
-                    'open_price': Decimal(str(round(open_price, 2))),
-                    'high_price': Decimal(str(round(high_price, 2))),
-                    'low_price': Decimal(str(round(low_price, 2))),
-                    'close_price': Decimal(str(round(close_price, 2))),
-                    'volume': volume,
-                    'adjusted_close': Decimal(str(round(close_price, 2))),
-                }
-            )
+                open_price=Decimal(str(round(open_price, 2))),
+                high_price=Decimal(str(round(high_price, 2))),
+                low_price=Decimal(str(round(low_price, 2))),
+                close_price=Decimal(str(round(close_price, 2))),
+                volume=volume,
+                adjusted_close=Decimal(str(round(close_price, 2))),
+            ))
+        
+        self._store_new_bars(stock, history, start, prices, PriceHistoryState.COMPACT)
         
         logger.info(f"Generated demo historical data for {stock.symbol}")
         return True
     
+    def _invalidate_indicator_state(self, stock, counts):
+        """Drop the incremental indicator state when already-folded bars were revised"""
+        if counts['changed_from'] is not None:
+            IndicatorState.objects.filter(
+                stock=stock, last_date__gte=counts['changed_from']
+            ).delete()
+    
+    def _sync_price_store(self, stock, counts):
+        """Rewrite the stock's columnar price file after its prices changed"""
+        if not pricestore.store_enabled() or not (counts['inserted'] or counts['updated']):
+            return
+        try:
+            pricestore.sync_stock(stock)
+        except Exception as e:
+            logger.warning(f"Price store sync failed for {stock.symbol}: {e}")
+            pricestore.invalidate(stock.symbol)
+    
     def fetch_realtime_quote(self, symbol):
         """Fetch real-time quote with fallback"""
         try:
@@ -271,23 +677,44 @@ class StockDataService:
             logger.error(f"Error fetching quote for {symbol}: {e}")
             return None
     
+    async def afetch_realtime_quote(self, symbol):
+        """Async ``fetch_realtime_quote``; a slow provider does not hold a worker"""
+        try:
+            if self.use_api:
+                try:
+                    data = await self._arequest_alpha_vantage(
+                        {'function': 'GLOBAL_QUOTE', 'symbol': symbol}, timeout=10, max_wait=2
+                    )
+                    return self._parse_global_quote(data)
+                except Exception as e:
+                    logger.warning(f"API quote fetch failed for {symbol}: {e}")
+            
+            # Fallback to latest price from database
+            return await sync_to_async(self._get_latest_quote_from_db)(symbol)
+            
+        except Exception as e:
+            logger.error(f"Error fetching quote for {symbol}: {e}")
+            return None
+    
     def _fetch_quote_from_api(self, symbol):
         """Fetch quote from Alpha Vantage API"""
-        params = {
-            'function': 'GLOBAL_QUOTE',
-            'symbol': symbol,
-            'apikey': self.api_key
-        }
-        
-        response = requests.get(self.base_url, params=params, timeout=10)
-        data = response.json()
-        
-        if 'Error Message' in data:
-            raise Exception(f"Alpha Vantage error: {data['Error Message']}")
-            
-        if 'Note' in data:
-            raise Exception(f"Alpha Vantage rate limit: {data['Note']}")
-        
+        # Quotes are requested inline by views, so don't queue long for budget
+        data = self._request_alpha_vantage(
+            {'function': 'GLOBAL_QUOTE', 'symbol': symbol}, timeout=10, max_wait=2
+        )
+        return self._parse_global_quote(data)
+    
+    def _cached_quote(self, symbol):
+        """A still-fresh GLOBAL_QUOTE from the response cache, or None"""
+        data = self.client.cached_json({'function': 'GLOBAL_QUOTE', 'symbol': symbol}, endpoint='GLOBAL_QUOTE')
+        if data is None:
+            return None
+        try:
+            return self._parse_global_quote(data)
+        except Exception:
+            return None
+    
+    def _parse_global_quote(self, data):
         quote = data.get('Global Quote', {})
         
         if not quote:
@@ -304,35 +731,40 @@ class StockDataService:
     
     def _get_latest_quote_from_db(self, symbol):
         """Get latest quote from database"""
+        snapshot = StockSnapshot.objects.filter(
+            stock__symbol=symbol, close_price__isnull=False
+        ).first()
+        
+        if snapshot:
+            return {
+                'symbol': symbol,
+                'price': float(snapshot.close_price),
+                'change': float(snapshot.change),
+                'change_percent': f"{snapshot.change_percent:.2f}%",
+                'volume': snapshot.volume,
+                'latest_trading_day': snapshot.price_date.isoformat(),
+            }
+        
+        return None
+    
+    def calculate_technical_indicators(self, symbol, rebuild=False, indicators=None):
+        """
+        Calculate technical indicators, appending new bars to the saved state when possible.
+
+        ``indicators`` names the registry entries to compute (all by default);
+        only their fields are written.
+        """
         try:
             stock = Stock.objects.get(symbol=symbol)
-            latest_price = stock.prices.first()
-            
-            if latest_price:
-                # Calculate mock change
-                previous_price = stock.prices.all()[1] if stock.prices.count() > 1 else latest_price
-                change = float(latest_price.close_price) - float(previous_price.close_price)
-                change_percent = (change / float(previous_price.close_price)) * 100 if previous_price.close_price else 0
-                
-                return {
-                    'symbol': symbol,
-                    'price': float(latest_price.close_price),
-                    'change': change,
-                    'change_percent': f"{change_percent:.2f}%",
-                    'volume': latest_price.volume,
-                    'latest_trading_day': latest_price.date.isoformat(),
-                }
+            selected = resolve_indicators(indicators)
+            state = IndicatorState.objects.filter(stock=stock).first()
             
-            return None
+            if rebuild or state is None or not self._indicator_state_is_current(stock, state):
+                self._calculate_local_indicators(stock, selected)
+            else:
+                self._advance_local_indicators(stock, state, selected)
+            refresh_snapshot(stock, ['indicators'])
             
-        except Stock.DoesNotExist:
-            return None
-    
-    def calculate_technical_indicators(self, symbol):
-        """Calculate technical indicators"""
-        try:
-            stock = Stock.objects.get(symbol=symbol)
-            self._calculate_local_indicators(stock)
             logger.info(f"Technical indicators calculated for {symbol}")
             return True
             
@@ -343,61 +775,123 @@ class StockDataService:
             logger.error(f"Error calculating technical indicators for {symbol}: {e}")
             return False
     
-    def _calculate_local_indicators(self, stock):
-        """Calculate technical indicators locally from price data"""
-        prices = StockPrice.objects.filter(stock=stock).order_by('date')
+    def _indicator_state_is_current(self, stock, state):
+        """Check that the state has every key and the history folded into it has not been rewritten"""
+        if any(key not in state.state for key in STATE_KEYS):
+            return False
+        history = StockPrice.objects.filter(stock=stock, date__lte=state.last_date)
+        if history.count() != state.bar_count:
+            return False
+        last_close = history.filter(date=state.last_date).values_list('close_price', flat=True).first()
+        return last_close == state.last_close
+    
+    def _calculate_local_indicators(self, stock, selected):
+        """Calculate technical indicators locally from the full price history"""
+        prices = pricestore.load_prices(stock.symbol)
         
-        if prices.count() < 20:
+        if prices is None or len(prices['close']) < 20:
+            IndicatorState.objects.filter(stock=stock).delete()
             return
         
-        # Convert to pandas for easier calculation
-        df = pd.DataFrame(list(prices.values('date', 'close_price', 'volume')))
-        df['close_price'] = df['close_price'].astype(float)
-        
-        # Calculate RSI
-        df['rsi'] = self._calculate_rsi(df['close_price'])
-        
-        # Calculate SMAs
-        df['sma_20'] = df['close_price'].rolling(window=20).mean()
-        df['sma_50'] = df['close_price'].rolling(window=50).mean()
-        
-        # Calculate MACD
-        ema_12 = df['close_price'].ewm(span=12).mean()
-        ema_26 = df['close_price'].ewm(span=26).mean()
-        df['macd'] = ema_12 - ema_26
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-        
-        # Calculate Bollinger Bands
-        df['bb_middle'] = df['sma_20']
-        bb_std = df['close_price'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-        
-        # Save indicators to database
-        for index, row in df.iterrows():
-            if pd.notna(row['rsi']):
-                TechnicalIndicator.objects.update_or_create(
-                    stock=stock,
-                    date=row['date'],
-                    defaults={
-                        'rsi': Decimal(str(round(row['rsi'], 2))) if pd.notna(row['rsi']) else None,
-                        'sma_20': Decimal(str(round(row['sma_20'], 2))) if pd.notna(row['sma_20']) else None,
-                        'sma_50': Decimal(str(round(row['sma_50'], 2))) if pd.notna(row['sma_50']) else None,
-                        'macd': Decimal(str(round(row['macd'], 4))) if pd.notna(row['macd']) else None,
-                        'macd_signal': Decimal(str(round(row['macd_signal'], 4))) if pd.notna(row['macd_signal']) else None,
-                        'bollinger_upper': Decimal(str(round(row['bb_upper'], 2))) if pd.notna(row['bb_upper']) else None,
-                        'bollinger_lower': Decimal(str(round(row['bb_lower'], 2))) if pd.notna(row['bb_lower']) else None,
-                    }
-                )
+        frame = compute_indicator_frame(prices, selected).iloc[WARMUP_BARS:]
+        state = initial_state(prices) if covers_state(selected) else None
+        return self._store_full_indicators(stock, frame, state, len(prices['close']))
+    
+    def _store_full_indicators(self, stock, frame, state, bar_count):
+        """
+        Save indicators computed over the full history.
+
+        The rolling state after the last bar is saved too when given; runs
+        that skipped a recursive indicator pass None and leave it alone.
+        """
+        counts = self._save_indicator_frame(stock, frame)
+        if state is not None:
+            IndicatorState.objects.update_or_create(
+                stock=stock,
+                defaults={
+                    'last_date': frame['date'].iloc[-1],
+                    'last_close': Decimal(f"{state['close']:.2f}"),
+                    'bar_count': bar_count,
+                    'state': state,
+                }
+            )
+        return counts
+    
+    def save_panel_results(self, results):
+        """
+        Persist the output of ``compute_indicator_shard``.
+
+        Runs in the calling process so the database keeps a single writer
+        while the computation is spread over worker processes.
+        """
+        stocks = Stock.objects.in_bulk([result['symbol'] for result in results], field_name='symbol')
+        saved = 0
+        for result in results:
+            stock = stocks.get(result['symbol'])
+            if stock is None:
+                continue
+            try:
+                self._store_full_indicators(stock, result['frame'], result['state'], result['bar_count'])
+                refresh_snapshot(stock, ['indicators'])
+                saved += 1
+            except Exception as e:
+                logger.error(f"Error saving panel indicators for {stock.symbol}: {e}")
+        return saved
     
-    def _calculate_rsi(self, prices, period=14):
-        """Calculate RSI indicator"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+    def _advance_local_indicators(self, stock, state, selected):
+        """
+        Compute indicators for bars newer than the saved state.
+
+        Recursive indicators are folded in O(1) per bar from the rolling
+        state; windowed ones are recomputed from just the bars their
+        lookback needs. The state is only saved when every recursive
+        indicator was selected, so no bars are skipped for the others.
+        """
+        prices = pricestore.load_prices(stock.symbol)
+        start = state.bar_count
+        if (prices is None or len(prices['date']) < start
+                or prices['date'][start - 1] != np.datetime64(state.last_date)):
+            return self._calculate_local_indicators(stock, selected)
+        
+        new_bars = len(prices['date']) - start
+        if not new_bars:
+            return {'inserted': 0, 'updated': 0, 'unchanged': 0, 'changed_from': None}
+        
+        fields = indicator_columns(selected)
+        rolling = dict(state.state)
+        recursive = advance_frame(rolling, start, {name: prices[name][start:] for name in ('date', 'close', 'volume')})
+        frame = recursive[['date'] + [column for column in recursive.columns if column in fields]].copy()
+        
+        windowed = [indicator for indicator in selected if not indicator.recursive]
+        if windowed:
+            first = max(0, start - (max_lookback(windowed) - 1))
+            window = {name: values[first:] for name, values in prices.items()}
+            values = compute_indicator_frame(window, windowed).iloc[start - first:]
+            for column in indicator_columns(windowed):
+                frame[column] = values[column].to_numpy()
+        
+        frame = frame[['date'] + fields].iloc[max(0, WARMUP_BARS - start):]
+        counts = self._save_indicator_frame(stock, frame)
+        
+        if covers_state(selected):
+            state.last_date = prices['date'][-1].astype(object)
+            state.last_close = Decimal(f"{rolling['close']:.2f}")
+            state.bar_count += new_bars
+            state.state = rolling
+            state.save()
+        return counts
+    
+    def _save_indicator_frame(self, stock, frame):
+        """Persist the indicator columns of ``frame``, skipping rows whose values did not change"""
+        fields = [column for column in frame.columns if column != 'date']
+        frame = frame[frame[fields].notna().any(axis=1)]
+        indicators = frame_to_instances(TechnicalIndicator, stock, frame, {name: name for name in fields})
+        counts = bulk_upsert_daily_rows(TechnicalIndicator, indicators, fields)
+        logger.info(
+            f"Indicator rows for {stock.symbol}: {counts['inserted']} inserted, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged"
+        )
+        return counts
     
     def _parse_market_cap(self, market_cap_str):
         """Parse market cap string to integer"""
@@ -413,18 +907,25 @@ class NewsService:
     
     def __init__(self):
         self.news_api_key = getattr(settings, 'NEWS_API_KEY', None)
-        self.news_api_url = 'https://newsapi.org/v2/everything'
+        self.client = get_provider_client('newsapi')
+        self.news_api_url = self.client.base_url
         self.use_api = bool(self.news_api_key and self.news_api_key != 'demo' and self.news_api_key.strip())
+        self.rate_limiter = self.client.rate_limiter
     
-    def fetch_stock_news(self, symbol, days=7):
-        """Fetch news articles with fallback to demo data"""
+    def fetch_stock_news(self, symbol, days=7, payload=None):
+        """
+        Fetch news articles with fallback to demo data.
+
+        ``payload`` may be a NewsAPI response already fetched with
+        ``request_stock_news`` (or the exception that request raised).
+        """
         try:
             stock = Stock.objects.get(symbol=symbol)
             
             # Try API if available
             if self.use_api:
                 try:
-                    return self._fetch_news_from_api(stock, symbol, days)
+                    return self._fetch_news_from_api(stock, symbol, days, payload)
                 except Exception as e:
                     logger.warning(f"API news fetch failed for {symbol}: {e}, using demo data")
             
@@ -438,25 +939,61 @@ class NewsService:
             logger.error(f"Error fetching news for {symbol}: {e}")
             return False
     
-    def _fetch_news_from_api(self, stock, symbol, days):
-        """Fetch news from NewsAPI"""
+    def request_stock_news(self, symbol, name, days=7):
+        """Fetch the NewsAPI payload without touching the database"""
+        return self.client.get_json(
+            self._news_params(symbol, name, days), timeout=15, endpoint='everything',
+            validate=self._check_news_payload,
+        )
+    
+    async def afetch_stock_news(self, symbol, days=7):
+        """
+        Async ``fetch_stock_news``.
+
+        The NewsAPI request runs on the event loop; storing and scoring the
+        articles runs in a worker thread through the sync method.
+        """
+        payload = None
+        if self.use_api:
+            try:
+                name = await Stock.objects.filter(symbol=symbol).values_list('name', flat=True).afirst()
+                if name is not None:
+                    client = get_async_provider_client('newsapi')
+                    payload = await client.get_json(
+                        self._news_params(symbol, name, days), timeout=15, endpoint='everything',
+                        validate=self._check_news_payload,
+                    )
+            except Exception as e:
+                payload = e
+        return await sync_to_async(self.fetch_stock_news)(symbol, days, payload=payload)
+    
+    def _news_params(self, symbol, name, days):
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=days)
         
-        params = {
-            'q': f'{symbol} OR {stock.name}',
+        return {
+            'q': f'{symbol} OR {name}',
             'from': start_date.isoformat(),
             'to': end_date.isoformat(),
             'sortBy': 'publishedAt',
             'language': 'en',
             'apiKey': self.news_api_key
         }
-        
-        response = requests.get(self.news_api_url, params=params, timeout=15)
-        data = response.json()
+    
+    def _check_news_payload(self, data):
+        """Raise on NewsAPI error payloads"""
+        if data.get('code') == 'rateLimited':
+            self.rate_limiter.penalize(seconds=3600)
         
         if data.get('status') != 'ok':
             raise Exception(f"NewsAPI error: {data.get('message', 'Unknown error')}")
+    
+    def _fetch_news_from_api(self, stock, symbol, days, payload=None):
+        """Fetch news from NewsAPI"""
+        if payload is not None:
+            data = _resolve_payload(payload)
+        else:
+            data = self.request_stock_news(symbol, stock.name, days)
         
         articles = data.get('articles', [])
         
@@ -586,46 +1123,22 @@ class SentimentAnalysisService:
             
             stock = Stock.objects.get(symbol=symbol)
             
-            # Get news articles for the date range
-            start_date = date - timedelta(days=3)
-            news_articles = NewsArticle.objects.filter(
+            # Weighted sentiment, mentions and keyword hits in one aggregate query
+            totals = NewsArticle.objects.filter(
                 stock=stock,
-                published_at__date__gte=start_date,
+                published_at__date__gte=date - timedelta(days=SENTIMENT_WINDOW_DAYS),
                 published_at__date__lte=date
-            )
-            
-            if news_articles.exists():
-                # Calculate weighted sentiment
-                total_weight = 0
-                weighted_sentiment = 0
-                
-                for article in news_articles:
-                    weight = {'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}[article.impact_score]
-                    weighted_sentiment += float(article.sentiment_score) * weight
-                    total_weight += weight
-                
-                news_sentiment = weighted_sentiment / total_weight if total_weight > 0 else 0
-                news_mentions = len(news_articles)
-            else:
-                news_sentiment = 0
-                news_mentions = 0
-            
-            overall_sentiment = news_sentiment
-            keywords = self._extract_keywords(news_articles)
+            ).aggregate(**self._sentiment_aggregates())
             
             SentimentData.objects.update_or_create(
                 stock=stock,
                 date=date,
-                defaults={
-                    'news_sentiment': Decimal(str(round(news_sentiment, 2))),
-                    'social_sentiment': Decimal(str(round(news_sentiment * 0.8, 2))),
-                    'overall_sentiment': Decimal(str(round(overall_sentiment, 2))),
-                    'news_mentions': news_mentions,
-                    'social_mentions': news_mentions * 10,
-                    'trending_keywords': keywords,
-                }
+                defaults=self._sentiment_values(totals)
             )
             
+            refresh_snapshot(stock, ['sentiment'])
+            refresh_market_aggregates(date, parts=['sentiment'])
+            
             logger.info(f"Calculated sentiment for {symbol} on {date}")
             return True
                 
@@ -636,28 +1149,91 @@ class SentimentAnalysisService:
             logger.error(f"Error calculating sentiment for {symbol}: {e}")
             return False
     
-    def _extract_keywords(self, articles):
-        """Extract trending keywords from articles"""
-        try:
-            text = ' '.join([article.title + ' ' + article.summary for article in articles])
-            
-            keywords = []
-            common_words = [
-                'earnings', 'revenue', 'profit', 'growth', 'market', 'stock',
-                'investment', 'analyst', 'upgrade', 'downgrade', 'buy', 'sell',
-                'target', 'price', 'forecast', 'outlook', 'performance'
-            ]
-            
-            text_lower = text.lower()
-            for word in common_words:
-                if word in text_lower:
-                    keywords.append(word)
-            
-            return keywords[:5]
-            
-        except Exception as e:
-            logger.error(f"Error extracting keywords: {e}")
-            return []
+    def calculate_sentiment_range(self, start, end, symbols=None):
+        """
+        Calculate daily sentiment for every stock (or ``symbols``) and day from ``start`` to ``end``.
+        
+        Articles are summed per stock and publication day in one grouped
+        query; because the totals are additive, each day's window is then
+        rolled up from the daily partials in Python. Only stock-days with
+        articles in their window are written, through one bulk upsert.
+        Returns the number of stock-days computed.
+        """
+        articles = NewsArticle.objects.filter(
+            published_at__date__gte=start - timedelta(days=SENTIMENT_WINDOW_DAYS),
+            published_at__date__lte=end
+        )
+        if symbols:
+            articles = articles.filter(stock__symbol__in=symbols)
+        
+        daily = defaultdict(dict)
+        for row in articles.annotate(day=TruncDate('published_at')).order_by().values(
+            'stock_id', 'day'
+        ).annotate(**self._sentiment_aggregates()):
+            daily[row.pop('stock_id')][row.pop('day')] = row
+        
+        days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        rows = []
+        for stock_id, partials in daily.items():
+            for date in days:
+                window = [
+                    partials[day] for day in (date - timedelta(days=back) for back in range(SENTIMENT_WINDOW_DAYS + 1))
+                    if day in partials
+                ]
+                if not window:
+                    continue
+                totals = {key: sum(partial[key] or 0 for partial in window) for key in window[0]}
+                rows.append(SentimentData(stock_id=stock_id, date=date, **self._sentiment_values(totals)))
+        
+        counts = bulk_upsert_daily_rows(SentimentData, rows, SENTIMENT_FIELDS)
+        if counts['inserted'] or counts['updated']:
+            for stock in Stock.objects.filter(id__in=daily.keys()).iterator():
+                refresh_snapshot(stock, ['sentiment'])
+            refresh_market_aggregates(start, end, parts=['sentiment'])
+        
+        logger.info(
+            f"Calculated sentiment for {len(daily)} stocks from {start} to {end}: "
+            f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged"
+        )
+        return len(rows)
+    
+    def _sentiment_aggregates(self):
+        """Aggregates over NewsArticle rows: impact-weighted score sums, mentions and keyword hits"""
+        weight = Case(
+            *[When(impact_score=level, then=Value(value)) for level, value in IMPACT_WEIGHTS.items()],
+            default=Value(IMPACT_WEIGHTS['LOW']),
+            output_field=IntegerField(),
+        )
+        scored = Q(sentiment_score__isnull=False)
+        aggregates = {
+            'mentions': Count('id'),
+            'weighted_sum': Sum(F('sentiment_score') * weight, filter=scored, output_field=FloatField()),
+            'total_weight': Sum(weight, filter=scored),
+        }
+        for word in TRENDING_KEYWORDS:
+            aggregates[f'keyword_{word}'] = Count(
+                'id', filter=Q(title__icontains=word) | Q(summary__icontains=word)
+            )
+        return aggregates
+    
+    def _sentiment_values(self, totals):
+        """SentimentData field values from ``_sentiment_aggregates`` totals"""
+        total_weight = totals['total_weight'] or 0
+        # Scores have two decimals, so the weighted sum is exact once float noise from
+        # the summation order (one query versus rolled-up daily partials) is rounded off
+        weighted_sum = round(totals['weighted_sum'] or 0, 2)
+        news_sentiment = weighted_sum / total_weight if total_weight > 0 else 0
+        news_mentions = totals['mentions'] or 0
+        overall_sentiment = news_sentiment
+        
+        return {
+            'news_sentiment': Decimal(str(round(news_sentiment, 2))),
+            'social_sentiment': Decimal(str(round(news_sentiment * 0.8, 2))),
+            'overall_sentiment': Decimal(str(round(overall_sentiment, 2))),
+            'news_mentions': news_mentions,
+            'social_mentions': news_mentions * 10,
+            'trending_keywords': [word for word in TRENDING_KEYWORDS if totals[f'keyword_{word}']][:5],
+        }
 
 class RecommendationService:
     """Service for generating AI-powered stock recommendations"""
@@ -736,6 +1312,9 @@ class RecommendationService:
                 }
             )
             
+            refresh_snapshot(stock, ['recommendation'])
+            refresh_market_aggregates(date, parts=['recommendations'])
+            
             logger.info(f"Generated recommendation for {symbol}: {recommendation} ({confidence}%)")
             return True
             
@@ -745,3 +1324,200 @@ class RecommendationService:
         except Exception as e:
             logger.error(f"Error generating recommendation for {symbol}: {e}")
             return False
+
+class StockRefreshService:
+    """Service that runs the full data refresh pipeline for a stock"""
+    
+    def __init__(self):
+        self.stock_service = StockDataService()
+        self.news_service = NewsService()
+        self.sentiment_service = SentimentAnalysisService()
+        self.recommendation_service = RecommendationService()
+    
+    def refresh(self, symbol, news_days=7, wait=0):
+        """
+        Refresh history, indicators, news, sentiment and recommendation.
+
+        Returns per-step results, or None when another caller was already
+        refreshing ``symbol``; in that case this waits up to ``wait``
+        seconds for it to finish instead of repeating the work.
+        """
+        with single_flight('refresh', symbol, wait=wait) as acquired:
+            if not acquired:
+                return None
+            
+            results = {
+                'history': self.stock_service.fetch_historical_data(symbol),
+                'indicators': self.stock_service.calculate_technical_indicators(symbol),
+                'news': self.news_service.fetch_stock_news(symbol, days=news_days),
+                'sentiment': self.sentiment_service.calculate_daily_sentiment(symbol),
+                'recommendation': self.recommendation_service.generate_recommendation(symbol),
+            }
+        
+        logger.info(f"Refreshed {symbol}: {results}")
+        return results
+    
+    async def arefresh(self, symbol, news_days=7, wait=0):
+        """
+        Async ``refresh``.
+
+        History and news are requested concurrently on the event loop;
+        the indicator, sentiment and recommendation steps then run in a
+        worker thread. Returns None when another caller holds the refresh.
+        """
+        key = lease_key('refresh', symbol)
+        owner = await sync_to_async(acquire_lease)(key)
+        if owner is None:
+            logger.info(f"{key} is already being refreshed, waiting up to {wait}s")
+            if wait:
+                await sync_to_async(wait_for_release)(key, wait)
+            return None
+        
+        try:
+            history, news = await asyncio.gather(
+                self.stock_service.afetch_historical_data(symbol),
+                self.news_service.afetch_stock_news(symbol, days=news_days),
+            )
+            results = await sync_to_async(self._analyze)(symbol)
+        finally:
+            await sync_to_async(release_lease)(key, owner)
+        
+        results = dict(history=history, news=news, **results)
+        logger.info(f"Refreshed {symbol}: {results}")
+        return results
+    
+    def _analyze(self, symbol):
+        return {
+            'indicators': self.stock_service.calculate_technical_indicators(symbol),
+            'sentiment': self.sentiment_service.calculate_daily_sentiment(symbol),
+            'recommendation': self.recommendation_service.generate_recommendation(symbol),
+        }
+
+class QuoteService:
+    """Service for quoting many symbols at once"""
+    
+    def __init__(self):
+        self.stock_service = StockDataService()
+    
+    def get_quotes(self, symbols):
+        """
+        Quote ``symbols`` with one database query plus provider calls for uncached quotes.
+
+        Snapshots of every known symbol are read in one query. With an API
+        key, quotes still in the response cache are reused and the rest
+        are requested concurrently; any symbol whose provider call fails
+        (including a spent rate budget) falls back to its snapshot.
+        Returns ``(quotes, missing)``: compact quote dicts keyed by symbol
+        and the symbols that are not tracked.
+        """
+        stocks = {
+            stock.symbol: stock
+            for stock in Stock.objects.filter(symbol__in=symbols).select_related('snapshot')
+        }
+        
+        live = {}
+        if self.stock_service.use_api and stocks:
+            uncached = []
+            for symbol in stocks:
+                quote = self.stock_service._cached_quote(symbol)
+                if quote is None:
+                    uncached.append(symbol)
+                else:
+                    live[symbol] = quote
+            live.update(self._fetch_live_quotes(uncached))
+        
+        quotes = {}
+        for symbol in symbols:
+            stock = stocks.get(symbol)
+            if stock is None:
+                continue
+            if symbol in live:
+                quotes[symbol] = self._compact_live_quote(live[symbol])
+            else:
+                quote = self._compact_snapshot_quote(getattr(stock, 'snapshot', None))
+                if quote is not None:
+                    quotes[symbol] = quote
+        
+        missing = [symbol for symbol in symbols if symbol not in stocks]
+        return quotes, missing
+    
+    def _fetch_live_quotes(self, symbols):
+        """Request GLOBAL_QUOTE for ``symbols`` in a thread pool; failed symbols are left out"""
+        if not symbols:
+            return {}
+        
+        def fetch(symbol):
+            try:
+                return self.stock_service._fetch_quote_from_api(symbol)
+            except Exception as e:
+                logger.warning(f"API quote fetch failed for {symbol}: {e}")
+                return None
+            finally:
+                # The rate limiter queried the database from this worker thread
+                connection.close()
+        
+        workers = min(len(symbols), getattr(settings, 'QUOTE_FETCH_WORKERS', 8))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quote') as pool:
+            results = dict(zip(symbols, pool.map(fetch, symbols)))
+        return {symbol: quote for symbol, quote in results.items() if quote is not None}
+    
+    def _compact_live_quote(self, quote):
+        return {
+            'price': round(quote['price'], 4),
+            'change': round(quote['change'], 4),
+            'change_percent': round(float(quote['change_percent'] or 0), 2),
+            'volume': quote['volume'],
+            'date': quote['latest_trading_day'],
+            'source': 'live',
+        }
+    
+    def _compact_snapshot_quote(self, snapshot):
+        if snapshot is None or snapshot.close_price is None:
+            return None
+        return {
+            'price': float(snapshot.close_price),
+            'change': float(snapshot.change or 0),
+            'change_percent': float(snapshot.change_percent or 0),
+            'volume': snapshot.volume,
+            'date': snapshot.price_date.isoformat() if snapshot.price_date else None,
+            'source': 'db',
+        }
+
+class PortfolioValuationService:
+    """Service for valuing many portfolios with a fixed number of queries"""
+    
+    def positions(self, portfolios):
+        """Positions of the given portfolios annotated with their stock's latest close"""
+        return PortfolioPosition.objects.filter(
+            portfolio__in=portfolios
+        ).select_related('stock').annotate(
+            latest_close=Coalesce(F('stock__snapshot__close_price'), F('average_price'))
+        ).order_by('stock__symbol')
+    
+    def value_portfolios(self, portfolios):
+        """
+        Attach value, cost basis and gain/loss to each portfolio.
+
+        Runs one query for the positions of all portfolios (plus one for
+        the portfolios if a queryset is passed), taking prices from the
+        stock snapshots, and sets ``valuation`` on every portfolio, which
+        the model properties then read.
+        """
+        portfolios = list(portfolios)
+        by_portfolio = defaultdict(list)
+        for position in self.positions(portfolios):
+            by_portfolio[position.portfolio_id].append(position)
+        
+        for portfolio in portfolios:
+            positions = by_portfolio.get(portfolio.id, [])
+            total_value = sum((position.current_value for position in positions), Decimal('0'))
+            cost_basis = sum((position.cost_basis for position in positions), Decimal('0'))
+            portfolio.valuation = {
+                'positions': positions,
+                'position_count': len(positions),
+                'total_value': total_value,
+                'cost_basis': cost_basis,
+                'total_gain_loss': total_value - cost_basis,
+            }
+        
+        return portfolios
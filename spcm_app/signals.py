@@ -0,0 +1,8 @@
+"""
+SPCM Signals
+"""
+from django.dispatch import Signal
+
+# Sent after writes that bypass model signals (bulk upserts, COPY loads) with
+# ``sender`` the model class and ``using`` the database alias
+bulk_rows_written = Signal()
@@ -0,0 +1,110 @@
+"""
+SPCM Stock Snapshots - denormalized latest values kept up to date on write
+"""
+from decimal import Decimal
+import logging
+
+from .models import (
+    Stock, StockPrice, TechnicalIndicator, SentimentData, StockRecommendation, StockSnapshot
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PARTS = ('price', 'indicators', 'sentiment', 'recommendation')
+
+
+def _price_values(stock):
+    latest = list(
+        StockPrice.objects.filter(stock=stock).order_by('-date')
+        .values('date', 'close_price', 'volume')[:2]
+    )
+    if not latest:
+        return {}
+    
+    close = latest[0]['close_price']
+    previous = latest[1]['close_price'] if len(latest) > 1 else close
+    change = close - previous
+    change_percent = (change / previous * 100) if previous else Decimal('0')
+    return {
+        'price_date': latest[0]['date'],
+        'close_price': close,
+        'previous_close': previous,
+        'change': change,
+        'change_percent': change_percent.quantize(Decimal('0.01')),
+        'volume': latest[0]['volume'],
+    }
+
+
+def _indicator_values(stock):
+    latest = TechnicalIndicator.objects.filter(stock=stock).order_by('-date').first()
+    if not latest:
+        return {}
+    return {
+        'indicator_date': latest.date,
+        'rsi': latest.rsi,
+        'sma_20': latest.sma_20,
+        'sma_50': latest.sma_50,
+        'macd': latest.macd,
+    }
+
+
+def _sentiment_values(stock):
+    latest = SentimentData.objects.filter(stock=stock).order_by('-date').first()
+    if not latest:
+        return {}
+    return {
+        'sentiment_date': latest.date,
+        'overall_sentiment': latest.overall_sentiment,
+        'news_sentiment': latest.news_sentiment,
+    }
+
+
+def _recommendation_values(stock):
+    latest = StockRecommendation.objects.filter(stock=stock).order_by('-date').first()
+    if not latest:
+        return {}
+    return {
+        'recommendation_date': latest.date,
+        'recommendation': latest.recommendation,
+        'confidence_score': latest.confidence_score,
+        'risk_level': latest.risk_level,
+        'target_price': latest.target_price,
+    }
+
+
+_PART_LOADERS = {
+    'price': _price_values,
+    'indicators': _indicator_values,
+    'sentiment': _sentiment_values,
+    'recommendation': _recommendation_values,
+}
+
+
+def refresh_snapshot(stock, parts=SNAPSHOT_PARTS):
+    """
+    Copy the latest rows of the given ``parts`` into the stock's snapshot.
+
+    Called by the services right after they write prices, indicators,
+    sentiment or recommendations, so read paths can take everything from
+    one row instead of four ordered lookups.
+    """
+    values = {}
+    for part in parts:
+        values.update(_PART_LOADERS[part](stock))
+    
+    snapshot, _ = StockSnapshot.objects.update_or_create(stock=stock, defaults=values)
+    return snapshot
+
+
+def rebuild_snapshots(symbols=None):
+    """Recompute every part of the snapshot for all (or the given) stocks"""
+    stocks = Stock.objects.all()
+    if symbols:
+        stocks = stocks.filter(symbol__in=symbols)
+    
+    count = 0
+    for stock in stocks.iterator():
+        refresh_snapshot(stock)
+        count += 1
+    logger.info(f"Rebuilt {count} stock snapshots")
+    return count
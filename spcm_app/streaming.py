@@ -0,0 +1,186 @@
+"""
+SPCM Live Quote Streaming - one upstream poller per symbol fanned out to SSE subscribers
+"""
+from collections import defaultdict
+import asyncio
+import json
+import logging
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .services import QuoteService
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds an EventSource waits before reconnecting after a stream ends
+RECONNECT_MS = 3000
+
+
+def poll_quote(symbol):
+    """Quote one symbol (response cache, provider, then snapshot); runs in a worker thread"""
+    try:
+        quotes, _ = QuoteService().get_quotes([symbol])
+        return quotes.get(symbol)
+    finally:
+        connection.close()
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    """
+    One stream's mailbox.
+
+    Holds only the latest undelivered quote per symbol, so a client that
+    reads slowly skips intermediate ticks instead of growing a queue.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = tuple(symbols)
+        self.pending = {}
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.conflated = 0
+        self.last_drained = time.monotonic()
+
+    def offer(self, symbol, quote):
+        if symbol in self.pending:
+            self.conflated += 1
+        self.pending[symbol] = quote
+        self.ready.set()
+
+    def drain(self):
+        pending, self.pending = self.pending, {}
+        self.ready.clear()
+        self.last_drained = time.monotonic()
+        return pending
+
+
+class QuoteHub:
+    """
+    In-process pub/sub for live quotes.
+
+    The first subscriber to a symbol starts one poller task for it and the
+    last one to leave cancels it, so any number of viewers of a symbol
+    cost a single upstream poll per interval. Pollers publish only when a
+    quote changes. A subscriber with undelivered quotes that has not read
+    for ``stall_timeout`` seconds is dropped.
+    """
+
+    def __init__(self, fetch=poll_quote, interval=None, stall_timeout=None):
+        self.fetch = sync_to_async(fetch, thread_sensitive=False)
+        self.interval = interval if interval is not None else getattr(settings, 'QUOTE_STREAM_INTERVAL', 5)
+        self.stall_timeout = (
+            stall_timeout if stall_timeout is not None
+            else getattr(settings, 'QUOTE_STREAM_STALL_TIMEOUT', 60)
+        )
+        self.subscribers = defaultdict(set)
+        self.pollers = {}
+        self.latest = {}
+        self.counters = {'polls': 0, 'published': 0, 'delivered': 0, 'dropped_subscribers': 0}
+
+    def subscribe(self, symbols):
+        subscriber = Subscriber(symbols)
+        for symbol in subscriber.symbols:
+            self.subscribers[symbol].add(subscriber)
+            if symbol in self.latest:
+                subscriber.offer(symbol, self.latest[symbol])
+            if symbol not in self.pollers:
+                self.pollers[symbol] = asyncio.create_task(self._poll(symbol), name=f'quote-poller-{symbol}')
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.closed = True
+        subscriber.ready.set()
+        for symbol in subscriber.symbols:
+            subscribers = self.subscribers.get(symbol)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[symbol]
+                self.pollers.pop(symbol).cancel()
+                self.latest.pop(symbol, None)
+
+    def publish(self, symbol, quote):
+        now = time.monotonic()
+        for subscriber in list(self.subscribers.get(symbol, ())):
+            if subscriber.pending and now - subscriber.last_drained > self.stall_timeout:
+                # The client stopped reading; stop holding quotes for it
+                self.counters['dropped_subscribers'] += 1
+                self.unsubscribe(subscriber)
+                continue
+            subscriber.offer(symbol, quote)
+        self.counters['published'] += 1
+
+    async def _poll(self, symbol):
+        while True:
+            try:
+                quote = await self.fetch(symbol)
+            except Exception as e:
+                logger.warning(f"Quote poll failed for {symbol}: {e}")
+                quote = None
+            self.counters['polls'] += 1
+
+            if quote is not None and quote != self.latest.get(symbol):
+                self.latest[symbol] = quote
+                self.publish(symbol, quote)
+            await asyncio.sleep(self.interval)
+
+    async def stream(self, symbols, heartbeat=None, max_seconds=None):
+        """
+        Yield Server-Sent Events with quotes for ``symbols`` as they change.
+
+        Sends a comment every ``heartbeat`` seconds while idle so proxies
+        keep the connection open, and ends after ``max_seconds``; the
+        browser's EventSource then reconnects, which also reclaims streams
+        whose client went away without the server noticing.
+        """
+        heartbeat = heartbeat or getattr(settings, 'QUOTE_STREAM_HEARTBEAT', 15)
+        max_seconds = max_seconds or getattr(settings, 'QUOTE_STREAM_MAX_SECONDS', 300)
+        deadline = time.monotonic() + max_seconds
+
+        subscriber = self.subscribe(symbols)
+        try:
+            yield f'retry: {RECONNECT_MS}\n\n'
+            while not subscriber.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), timeout=min(heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    if time.monotonic() < deadline:
+                        yield ': keepalive\n\n'
+                    continue
+
+                for symbol, quote in subscriber.drain().items():
+                    self.counters['delivered'] += 1
+                    yield format_event('quote', dict(quote, symbol=symbol))
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return dict(
+            self.counters,
+            symbols=len(self.pollers),
+            subscribers=len({sub for subs in self.subscribers.values() for sub in subs}),
+        )
+
+
+# One hub per event loop: pollers and events belong to the loop that created them
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_quote_hub():
+    """Return the hub of the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = QuoteHub()
+    return _hubs[loop]
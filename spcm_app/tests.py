@@ -0,0 +1,121 @@
+"""
+SPCM query regression tests: view query counts and index use of the hot queries
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Stock, StockPrice, Portfolio, PortfolioPosition
+from .queryplans import check_plan, hot_queries
+from .snapshots import refresh_snapshot
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'provider': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-provider'},
+    'views': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-views'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES, REFRESH_QUEUE_MODE='worker')
+class ViewQueryCountTests(TestCase):
+    """
+    Pages run a fixed number of queries however many portfolios, positions
+    or bars they show; an N+1 regression makes these counts grow.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('investor', password='secret-pass-123')
+        today = timezone.now().date()
+
+        cls.stocks = []
+        for index in range(12):
+            stock = Stock.objects.create(
+                symbol=f'TST{index}', name=f'Test {index}', sector='Technology',
+                market_cap=1_000_000 * (index + 1),
+            )
+            StockPrice.objects.bulk_create([
+                StockPrice(
+                    stock=stock, date=today - timedelta(days=day),
+                    open_price=Decimal('10.00'), high_price=Decimal('11.00'), low_price=Decimal('9.00'),
+                    close_price=Decimal(10 + index + day % 3), volume=1000 + day,
+                    adjusted_close=Decimal(10 + index + day % 3),
+                )
+                for day in range(40)
+            ])
+            refresh_snapshot(stock)
+            cls.stocks.append(stock)
+
+        for number in range(6):
+            portfolio = Portfolio.objects.create(user=cls.user, name=f'Portfolio {number}')
+            PortfolioPosition.objects.bulk_create([
+                PortfolioPosition(
+                    portfolio=portfolio, stock=stock, shares=Decimal('5'),
+                    average_price=Decimal('9.50'), purchase_date=today - timedelta(days=30),
+                )
+                for stock in cls.stocks
+            ])
+        cls.portfolio = Portfolio.objects.filter(user=cls.user).first()
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.client.force_login(self.user)
+
+    def test_dashboard(self):
+        # Three shared fragments, session, user, portfolios and one query for all their positions
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+        # Fragments are served from the cache once built
+        with self.assertNumQueries(4):
+            self.client.get(reverse('dashboard'))
+
+    def test_stock_analysis(self):
+        # Stock with its snapshot, active refresh job, latest rows, portfolio check, news and history
+        with self.assertNumQueries(11):
+            response = self.client.get(reverse('stock_analysis', args=['TST0']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['price_history']), 30)
+
+    def test_portfolio_list(self):
+        # Session, user, portfolios and one query for all their positions with latest closes
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('portfolio_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['portfolios']), 6)
+
+    def test_portfolio_detail(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('portfolio_detail', args=[self.portfolio.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['positions']), len(self.stocks))
+
+
+class HotQueryPlanTests(TestCase):
+    """The latest-N-per-stock queries read through their index in index order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stock = Stock.objects.create(symbol='PLAN', name='Plan Test')
+        today = timezone.now().date()
+        StockPrice.objects.bulk_create([
+            StockPrice(
+                stock=cls.stock, date=today - timedelta(days=day),
+                open_price=Decimal('10.00'), high_price=Decimal('11.00'), low_price=Decimal('9.00'),
+                close_price=Decimal('10.50'), volume=1000, adjusted_close=Decimal('10.50'),
+            )
+            for day in range(5)
+        ])
+
+    def test_hot_queries_use_their_index(self):
+        for label, queryset, expected in hot_queries(self.stock):
+            with self.subTest(label):
+                index, problem, plan = check_plan(queryset, expected)
+                self.assertIsNone(problem, f'{label}: {problem}\n{plan}')
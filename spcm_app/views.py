@@ -8,12 +8,18 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.db.models import Q, Avg
 from django.utils import timezone
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.views.generic import CreateView
 from datetime import datetime, timedelta
+import hashlib
 import json
 from django.shortcuts import render, get_object_or_404
 from .models import Stock
@@ -26,32 +32,35 @@ from .forms import (
     StockSearchForm, PortfolioForm, PositionForm, CustomUserCreationForm,
     CustomAuthenticationForm, UserProfileForm, UserUpdateForm
 )
-from .services import StockDataService, SentimentAnalysisService, RecommendationService, NewsService
+from .services import (
+    StockDataService, SentimentAnalysisService, RecommendationService, NewsService,
+    StockRefreshService, PortfolioValuationService, QuoteService
+)
+from .refresh import enqueue_refresh, active_refresh_job, latest_refresh_job
+from .leases import lease_active, lease_key
+from .streaming import get_quote_hub
+from .providers import response_cache
+from . import fragments
 from django.db import models
 
 def dashboard(request):
     """Main dashboard view"""
-    # Get popular stocks
-    popular_stocks = Stock.objects.filter(is_active=True).order_by('-market_cap')[:10]
-    
-    # Get recent recommendations
-    recent_recommendations = StockRecommendation.objects.select_related('stock')[:5]
-    
-    # Get market sentiment overview
-    today = timezone.now().date()
-    sentiment_data = SentimentData.objects.filter(date=today).aggregate(
-        avg_sentiment=Avg('overall_sentiment')
-    )
+    # Shared fragments, cached until the rows behind them change
+    popular_stocks = fragments.top_stocks()[:10]
+    recent_recommendations = fragments.recent_recommendations()
+    market = fragments.market_aggregate()
     
     # Get user-specific data if authenticated
     user_portfolios = None
     if request.user.is_authenticated:
-        user_portfolios = Portfolio.objects.filter(user=request.user, is_active=True)[:3]
+        user_portfolios = PortfolioValuationService().value_portfolios(
+            Portfolio.objects.filter(user=request.user, is_active=True)[:3]
+        )
     
     context = {
         'popular_stocks': popular_stocks,
         'recent_recommendations': recent_recommendations,
-        'market_sentiment': sentiment_data.get('avg_sentiment', 0) or 0,
+        'market_sentiment': (market.avg_sentiment if market else 0) or 0,
         'search_form': StockSearchForm(),
         'user_portfolios': user_portfolios,
     }
@@ -62,30 +71,16 @@ def stock_analysis(request, symbol):
     """Detailed stock analysis view with enhanced error handling"""
     symbol = symbol.upper()
     
-    # Try to get existing stock or fetch new data
+    # Render from stored rows; stale or missing data is refreshed in the background
+    refresh_job = None
     try:
-        stock = Stock.objects.get(symbol=symbol)
+        stock = Stock.objects.select_related('snapshot').get(symbol=symbol)
         # Check if we have recent data
-        latest_price = stock.prices.first()
-        if not latest_price or (timezone.now().date() - latest_price.date).days > 7:
-            # Data is stale, try to refresh
-            try:
-                stock_service = StockDataService()
-                stock_service.fetch_historical_data(symbol)
-                stock_service.calculate_technical_indicators(symbol)
-                
-                news_service = NewsService()
-                news_service.fetch_stock_news(symbol)
-                
-                sentiment_service = SentimentAnalysisService()
-                sentiment_service.calculate_daily_sentiment(symbol)
-                
-                recommendation_service = RecommendationService()
-                recommendation_service.generate_recommendation(symbol)
-                
-                messages.info(request, f'Data refreshed for {symbol}')
-            except Exception as e:
-                messages.warning(request, f'Using cached data for {symbol} - refresh may be limited')
+        snapshot = getattr(stock, 'snapshot', None)
+        if not snapshot or not snapshot.price_date or (timezone.now().date() - snapshot.price_date).days > 7:
+            refresh_job = enqueue_refresh(symbol)
+        else:
+            refresh_job = active_refresh_job(symbol)
                 
     except Stock.DoesNotExist:
         # Fetch stock data from API or create demo data
@@ -96,30 +91,9 @@ def stock_analysis(request, symbol):
             messages.error(request, f'Stock {symbol} not found. Please check the symbol and try again.')
             return redirect('dashboard')
         
-        # Fetch additional data
-        try:
-            stock_service.fetch_historical_data(symbol)
-            stock_service.calculate_technical_indicators(symbol)
-            
-            # Fetch news and calculate sentiment
-            news_service = NewsService()
-            news_service.fetch_stock_news(symbol)
-            
-            sentiment_service = SentimentAnalysisService()
-            sentiment_service.calculate_daily_sentiment(symbol)
-            
-            # Generate recommendation
-            recommendation_service = RecommendationService()
-            recommendation_service.generate_recommendation(symbol)
-            
-            # Determine data source
-            if stock_service.use_api or news_service.use_api:
-                messages.success(request, f'Successfully loaded data for {symbol}')
-            else:
-                messages.info(request, f'Loaded demo data for {symbol} - add API keys for real-time data')
-            
-        except Exception as e:
-            messages.warning(request, f'Some data may be limited: {str(e)}')
+        refresh_job = enqueue_refresh(symbol)
+        if not stock_service.use_api:
+            messages.info(request, f'Loading demo data for {symbol} - add API keys for real-time data')
     #Developed By RAJ SHARMA
     # Get latest data
     latest_price = stock.prices.first()
@@ -129,10 +103,6 @@ def stock_analysis(request, symbol):
     recent_news = stock.news_articles.all()[:5]
     price_history = stock.prices.all()[:30]
     
-    # Get real-time quote if available
-    stock_service = StockDataService()
-    realtime_quote = stock_service.fetch_realtime_quote(symbol)
-    
     # Check if user has this stock in any portfolio
     user_has_stock = False
     if request.user.is_authenticated:
@@ -149,8 +119,11 @@ def stock_analysis(request, symbol):
         'latest_recommendation': latest_recommendation,
         'recent_news': recent_news,
         'price_history': price_history,
-        'realtime_quote': realtime_quote,
         'user_has_stock': user_has_stock,
+        'refreshing': refresh_job is not None and refresh_job.is_active,
+        # The SSE stream only runs under ASGI; WSGI pages poll the quotes API instead
+        'quote_stream_enabled': getattr(settings, 'SERVER_INTERFACE', 'wsgi') == 'asgi',
+        'quote_poll_seconds': getattr(settings, 'QUOTE_POLL_INTERVAL', 30),
     }
     
     return render(request, 'spcm_app/stock_analysis.html', context)
@@ -271,7 +244,9 @@ def change_password_view(request):
 @login_required
 def portfolio_list(request):
     """List user portfolios"""
-    portfolios = Portfolio.objects.filter(user=request.user, is_active=True)
+    portfolios = PortfolioValuationService().value_portfolios(
+        Portfolio.objects.filter(user=request.user, is_active=True)
+    )
     
     context = {
         'portfolios': portfolios,
@@ -283,9 +258,10 @@ def portfolio_list(request):
 def portfolio_detail(request, portfolio_id):
     """Portfolio detail view"""
     portfolio = get_object_or_404(Portfolio, id=portfolio_id, user=request.user)
-    positions = portfolio.positions.select_related('stock').all()
     
     # Calculate portfolio metrics
+    PortfolioValuationService().value_portfolios([portfolio])
+    positions = portfolio.valuation['positions']
     total_value = portfolio.total_value
     total_gain_loss = portfolio.total_gain_loss
     
@@ -374,29 +350,26 @@ def news_analysis(request, symbol):
     return render(request, 'spcm_app/news_analysis.html', context)
 
 
-def refresh_stock_data(request, symbol):
+async def refresh_stock_data(request, symbol):
     """API endpoint to refresh stock data"""
     if request.method == 'POST':
         try:
             symbol = symbol.upper()
             
-            # Initialize services
-            stock_service = StockDataService()
-            news_service = NewsService()
-            sentiment_service = SentimentAnalysisService()
-            recommendation_service = RecommendationService()
-            
             # Fetch fresh data
-            stock = stock_service.fetch_stock_info(symbol)
+            stock = await sync_to_async(StockDataService().fetch_stock_info)(symbol)
             if not stock:
                 return JsonResponse({'error': 'Stock not found'}, status=404)
             
-            # Update data
-            stock_service.fetch_historical_data(symbol)
-            stock_service.calculate_technical_indicators(symbol)
-            news_service.fetch_stock_news(symbol)
-            sentiment_service.calculate_daily_sentiment(symbol)
-            recommendation_service.generate_recommendation(symbol)
+            # Update data, sharing the result of a refresh already in flight
+            results = await StockRefreshService().arefresh(symbol, wait=settings.REFRESH_LEASE_WAIT)
+            if results is None and await sync_to_async(lease_active)(lease_key('refresh', symbol)):
+                return JsonResponse({
+                    'success': True,
+                    'pending': True,
+                    'message': f'Refresh already in progress for {symbol}',
+                    'timestamp': timezone.now().isoformat()
+                }, status=202)
             
             return JsonResponse({
                 'success': True,
@@ -409,25 +382,38 @@ def refresh_stock_data(request, symbol):
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
-def api_stock_data(request, symbol):
+def api_refresh_status(request, symbol):
+    """API endpoint reporting the background refresh status of a stock"""
+    job = latest_refresh_job(symbol.upper())
+    if job is None:
+        return JsonResponse({'symbol': symbol.upper(), 'status': None, 'refreshing': False})
+    
+    return JsonResponse({
+        'symbol': job.symbol,
+        'status': job.status,
+        'refreshing': job.is_active,
+        'requested_at': job.requested_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error,
+    })
+
+async def api_stock_data(request, symbol):
     """API endpoint for stock data"""
     try:
-        stock = Stock.objects.get(symbol=symbol.upper())
-        latest_price = stock.prices.first()
-        latest_sentiment = stock.sentiment_data.first()
-        latest_recommendation = stock.recommendations.first()
+        stock = await Stock.objects.select_related('snapshot').aget(symbol=symbol.upper())
+        snapshot = getattr(stock, 'snapshot', None)
         
         # Get real-time quote
         stock_service = StockDataService()
-        realtime_quote = stock_service.fetch_realtime_quote(symbol.upper())
+        realtime_quote = await stock_service.afetch_realtime_quote(symbol.upper())
         
         data = {
             'symbol': stock.symbol,
             'name': stock.name,
-            'price': float(latest_price.close_price) if latest_price else 0,
-            'sentiment': float(latest_sentiment.overall_sentiment) if latest_sentiment else 0,
-            'recommendation': latest_recommendation.recommendation if latest_recommendation else 'HOLD',
-            'confidence': float(latest_recommendation.confidence_score) if latest_recommendation else 0,
+            'price': float(snapshot.close_price) if snapshot and snapshot.close_price is not None else 0,
+            'sentiment': float(snapshot.overall_sentiment) if snapshot and snapshot.overall_sentiment is not None else 0,
+            'recommendation': snapshot.recommendation if snapshot and snapshot.recommendation else 'HOLD',
+            'confidence': float(snapshot.confidence_score) if snapshot and snapshot.confidence_score is not None else 0,
             'realtime_quote': realtime_quote,
         }
         
@@ -435,27 +421,89 @@ def api_stock_data(request, symbol):
     except Stock.DoesNotExist:
         return JsonResponse({'error': 'Stock not found'}, status=404)
 
+def _requested_symbols(request):
+    """Parse ``?symbols=AAPL,MSFT``; returns (symbols, None) or (None, error response)"""
+    symbols = list(dict.fromkeys(
+        symbol.strip().upper() for symbol in request.GET.get('symbols', '').split(',') if symbol.strip()
+    ))
+    if not symbols:
+        return None, JsonResponse({'error': 'Pass symbols=AAPL,MSFT,...'}, status=400)
+    if len(symbols) > settings.QUOTE_BATCH_MAX_SYMBOLS:
+        return None, JsonResponse(
+            {'error': f'At most {settings.QUOTE_BATCH_MAX_SYMBOLS} symbols per request'}, status=400
+        )
+    return symbols, None
+
+def api_quotes(request):
+    """API endpoint quoting many symbols in one request, e.g. ?symbols=AAPL,MSFT"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    symbols, error = _requested_symbols(request)
+    if error:
+        return error
+    
+    quotes, missing = QuoteService().get_quotes(symbols)
+    body = json.dumps({'quotes': quotes, 'missing': missing}, separators=(',', ':'))
+    
+    # Pollers send back the ETag and get an empty 304 while no quote changed
+    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+async def api_quote_stream(request):
+    """Server-Sent Events stream of live quotes, e.g. ?symbols=AAPL,MSFT (ASGI only)"""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Quote streaming requires the ASGI server'}, status=501)
+    
+    symbols, error = _requested_symbols(request)
+    if error:
+        return error
+    
+    known = set()
+    async for symbol in Stock.objects.filter(symbol__in=symbols).values_list('symbol', flat=True):
+        known.add(symbol)
+    symbols = [symbol for symbol in symbols if symbol in known]
+    if not symbols:
+        return JsonResponse({'error': 'No known symbols'}, status=404)
+    
+    response = StreamingHttpResponse(get_quote_hub().stream(symbols), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def api_cache_stats(request):
+    """API endpoint with this process's view fragment and provider response cache hit rates"""
+    return JsonResponse({
+        'fragments': fragments.fragment_cache.stats(),
+        'provider_responses': response_cache.stats(),
+    })
+
 def market_overview(request):
     """Market overview with sentiment analysis"""
-    # Get top stocks by market cap
-    top_stocks = Stock.objects.filter(is_active=True).order_by('-market_cap')[:20]
-    
-    # Get overall market sentiment
-    today = timezone.now().date()
-    market_sentiment = SentimentData.objects.filter(date=today).aggregate(
-        avg_sentiment=models.Avg('overall_sentiment'),
-        total_mentions=models.Sum('news_mentions')
-    )
-    
-    # Get recent recommendations summary
-    recommendations_summary = StockRecommendation.objects.filter(
-        date=today
-    ).values('recommendation').annotate(count=models.Count('recommendation'))
+    # Top stocks by market cap and the latest market aggregate row are the
+    # same for every user and come from the fragment cache
+    top_stocks = fragments.top_stocks()
+    market = fragments.market_aggregate()
+    
+    recommendations_summary = []
+    if market:
+        recommendations_summary = [
+            {'recommendation': label, 'count': count}
+            for label, count in (('BUY', market.buy_count), ('HOLD', market.hold_count), ('SELL', market.sell_count))
+            if count
+        ]
     
     context = {
         'top_stocks': top_stocks,
-        'market_sentiment': market_sentiment.get('avg_sentiment', 0) or 0,
-        'total_mentions': market_sentiment.get('total_mentions', 0) or 0,
+        'market': market,
+        'market_sentiment': (market.avg_sentiment if market else 0) or 0,
+        'weighted_sentiment': (market.weighted_sentiment if market else 0) or 0,
+        'total_mentions': (market.total_mentions if market else 0) or 0,
         'recommendations_summary': recommendations_summary,
     }
     
@@ -0,0 +1,15 @@
+"""
+ASGI config for spcm_project project.
+
+Serves the regular views plus the live quote stream, e.g.
+uvicorn spcm_project.asgi:application --host 0.0.0.0 --port 8000
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spcm_project.settings')
+os.environ.setdefault('SERVER_INTERFACE', 'asgi')
+
+application = get_asgi_application()